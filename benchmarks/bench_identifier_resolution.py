@@ -0,0 +1,74 @@
+"""
+Compares the identifier resolution of MultipleAuthenticationBackend against the
+previous OR-of-filters implementation.
+
+    python benchmarks/bench_identifier_resolution.py
+"""
+from utils import measure, report, test_database
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from dj_site_accounts.authentication.backends import MultipleAuthenticationBackend
+
+UserModel = get_user_model()
+
+
+class LegacyMultipleAuthenticationBackend(MultipleAuthenticationBackend):
+    """the OR + exists() + first() lookup the backend used before the identifier resolver"""
+
+    def authenticate(self, request, *args, **kwargs):
+        identifier = kwargs.pop('identifier', None)
+        password = kwargs.pop('password', None)
+
+        if not password or not identifier:
+            return
+
+        query = UserModel.objects.none()
+        try:
+            for field in UserModel.AUTHENTICATION_FIELDS:
+                query = query | UserModel.objects.filter(**{field: identifier})
+        except Exception:
+            pass
+        finally:
+            if not query.exists():
+                return
+
+        user = query.first()
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+def main(users=5000, iterations=500):
+    UserModel.objects.bulk_create([
+        UserModel(username='user{}'.format(i),
+                  email='user{}@example.com'.format(i),
+                  phone='+2010{:08d}'.format(i),
+                  key='KEY{}'.format(i))
+        for i in range(users)
+    ])
+    user = UserModel.objects.get(username='user{}'.format(users // 2))
+    user.set_password('secret')
+    user.save()
+
+    identifiers = {
+        "email": user.email,
+        "username": user.username,
+        "phone": str(user.phone),
+        "id": str(user.pk),
+        # misses the email lookup, then the username one
+        "unknown email": 'nobody@example.com',
+    }
+    for name, backend in (("legacy", LegacyMultipleAuthenticationBackend()),
+                          ("resolver", MultipleAuthenticationBackend())):
+        results = {}
+        for kind, identifier in identifiers.items():
+            results[kind] = measure(
+                lambda: backend.authenticate(None, identifier=identifier, password='secret'), iterations)
+        report("{} backend ({} users)".format(name, users), results)
+
+
+if __name__ == '__main__':
+    with test_database():
+        main()
@@ -0,0 +1,42 @@
+"""
+Compares tokens per second of issuing a user's JWT pair the way the API login endpoint
+does, through simplejwt's RefreshToken.for_user and through JWTTokenService in each
+JWT_OUTSTANDING_TOKEN_MODE.
+
+    python benchmarks/bench_jwt_issuance.py
+"""
+from utils import measure, test_database
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from dj_site_accounts.authentication.tokens import jwt_token_service
+
+UserModel = get_user_model()
+
+
+def simplejwt_tokens(user):
+    tokens = RefreshToken.for_user(user)
+    return {"access_token": str(tokens.access_token), "refresh_token": str(tokens)}
+
+
+def main(iterations=2000):
+    user = UserModel.objects.create(username='john.doe', email='john@example.com', phone='+201001234567', key='KEY')
+
+    results = {"RefreshToken.for_user": measure(lambda: simplejwt_tokens(user), iterations)}
+    for mode in ('immediate', 'deferred', 'disabled'):
+        with override_settings(JWT_OUTSTANDING_TOKEN_MODE=mode):
+            results["JWTTokenService, {}".format(mode)] = measure(
+                lambda: jwt_token_service.get_user_tokens(user), iterations)
+            jwt_token_service.flush()
+
+    print('{:<40} {:>8} {:>10} {:>10} {:>12}'.format('case', 'queries', 'mean ms', 'p99 ms', 'tokens/s'))
+    for name, result in results.items():
+        print('{:<40} {:>8} {:>10.3f} {:>10.3f} {:>12.0f}'.format(
+            name, result['queries'], result['mean'], result['p99'], 1000 / result['mean']))
+
+
+if __name__ == '__main__':
+    with test_database():
+        main()
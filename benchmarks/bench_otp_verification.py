@@ -0,0 +1,40 @@
+"""
+Compares the latency of checking a TOTP code with a drift window through pyotp and
+through the OTP engine, for a single retried check and for a batch of SMS replies.
+
+    python benchmarks/bench_otp_verification.py
+"""
+import time
+
+from utils import measure, report
+
+import pyotp
+
+from dj_site_accounts.authentication.verify_phone import OTPEngine
+
+
+def main(batch_size=1000, valid_window=1, iterations=2000):
+    key = pyotp.random_base32()
+    code = pyotp.TOTP(key).now()
+    engine = OTPEngine()
+
+    pairs = [(pyotp.random_base32(), '000000') for _ in range(batch_size // 10)] * 10
+
+    def engine_batch():
+        engine.clear()
+        return engine.verify_totp_many(pairs, 6, 30, valid_window)
+
+    report("single check, valid_window={}".format(valid_window), {
+        "pyotp TOTP.verify": measure(lambda: pyotp.TOTP(key).verify(code, valid_window=valid_window), iterations),
+        "OTPEngine.verify_totp, warm": measure(lambda: engine.verify_totp(key, code, 6, 30, valid_window),
+                                               iterations),
+    })
+    report("{} replies from {} keys".format(batch_size, batch_size // 10), {
+        "pyotp TOTP.verify": measure(lambda: [pyotp.TOTP(k).verify(c, time.time(), valid_window)
+                                              for k, c in pairs], 20),
+        "OTPEngine.verify_totp_many, cold": measure(engine_batch, 20),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Compares the latency of checking whether a refresh token was revoked through
+simplejwt's blacklist query and through the revocation index, for a revoked
+and a valid token with a few thousand blacklisted tokens.
+
+    python benchmarks/bench_revocation_index.py
+"""
+from datetime import timedelta
+from uuid import uuid4
+
+from utils import measure, report, test_database
+
+from django.contrib.auth import get_user_model
+from django.utils.timezone import now
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from dj_site_accounts.authentication.revocation import revocation_index
+
+UserModel = get_user_model()
+
+
+def blacklist_query(jti):
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def main(revoked=5000, iterations=2000):
+    user = UserModel.objects.create(username='john.doe', email='john@example.com', phone='+201001234567', key='KEY')
+    expires_at = now() + timedelta(days=1)
+    OutstandingToken.objects.bulk_create(
+        [OutstandingToken(user=user, jti=uuid4().hex, token='', expires_at=expires_at) for _ in range(revoked)])
+    BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in OutstandingToken.objects.all()])
+    revoked_jti = OutstandingToken.objects.values_list('jti', flat=True).first()
+    valid_jti = uuid4().hex
+    revocation_index.sync()
+
+    report("{} blacklisted tokens".format(revoked), {
+        "blacklist query, revoked": measure(lambda: blacklist_query(revoked_jti), iterations),
+        "blacklist query, valid": measure(lambda: blacklist_query(valid_jti), iterations),
+        "revocation index, revoked": measure(lambda: revocation_index.is_revoked(revoked_jti), iterations),
+        "revocation index, valid": measure(lambda: revocation_index.is_revoked(valid_jti), iterations),
+    })
+
+
+if __name__ == '__main__':
+    with test_database():
+        main()
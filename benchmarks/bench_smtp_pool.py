@@ -0,0 +1,92 @@
+"""
+Compares the verification email throughput of Django's SMTP backend, which opens a
+connection per email, with PooledSMTPEmailBackend.
+
+The emails go to a local debugging SMTP server started by the benchmark, --latency
+delays its greeting to stand in for the network and TLS handshake of a real server.
+Use --port to send to a server you started yourself instead, e.g.
+
+    python -m aiosmtpd -n -l localhost:1025
+    python benchmarks/bench_smtp_pool.py --port 1025
+"""
+import argparse
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import utils  # noqa: F401
+
+from django.test import override_settings
+
+from dj_site_accounts.authentication.emails import SynchronousEmailDelivery, smtp_connection_pools
+
+
+class DebuggingSMTPHandler(socketserver.StreamRequestHandler):
+    """Accepts every message and throws it away"""
+    latency = 0
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        time.sleep(self.latency)
+        self.reply('220 localhost debugging server')
+        for line in self.rfile:
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250 localhost')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                for data in self.rfile:
+                    if data in (b'.\r\n', b'.\n'):
+                        break
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('250 OK')
+
+
+class DebuggingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def run(emails, senders):
+    delivery = SynchronousEmailDelivery()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=senders) as executor:
+        list(executor.map(lambda i: delivery.deliver('Activate your account', 'body', ['user{}@example.com'.format(i)]),
+                          range(emails)))
+    return emails / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--latency', type=float, default=0.02, help="handshake latency of the started server")
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--senders', type=int, default=8, help="concurrent request threads")
+    args = parser.parse_args()
+
+    port = args.port
+    if port is None:
+        DebuggingSMTPHandler.latency = args.latency
+        server = DebuggingSMTPServer(('localhost', 0), DebuggingSMTPHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+
+    print('{:<62} {:>10}'.format('backend', 'emails/s'))
+    for backend in ('django.core.mail.backends.smtp.EmailBackend',
+                    'dj_site_accounts.authentication.emails.PooledSMTPEmailBackend'):
+        with override_settings(EMAIL_HOST='localhost', EMAIL_PORT=port, EMAIL_USE_TLS=False,
+                               EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_DELIVERY_BACKEND=backend,
+                               EMAIL_POOL_SIZE=args.senders):
+            print('{:<62} {:>10.1f}'.format(backend, run(args.emails, args.senders)))
+            smtp_connection_pools.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Shows that MultipleAuthenticationBackend takes the same time for known and
+unknown identifiers, with the default hasher.
+
+    python benchmarks/bench_timing_equalization.py
+"""
+from utils import measure, report, test_database
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from dj_site_accounts.authentication.backends import MultipleAuthenticationBackend
+
+UserModel = get_user_model()
+
+
+def main(iterations=50):
+    user = UserModel(username='john.doe', email='john@example.com', phone='+201001234567', key='KEY')
+    user.set_password('secret')
+    user.save()
+
+    backend = MultipleAuthenticationBackend()
+    cases = {
+        "known identifier, correct password": ('john.doe', 'secret'),
+        "known identifier, wrong password": ('john.doe', 'wrong'),
+        "unknown identifier": ('jane.doe', 'secret'),
+    }
+    for mode in ('dummy_hash', 'set_password'):
+        with override_settings(AUTHENTICATION_TIMING_EQUALIZATION=mode):
+            results = {}
+            for name, (identifier, password) in cases.items():
+                results[name] = measure(
+                    lambda: backend.authenticate(None, identifier=identifier, password=password), iterations)
+            report("AUTHENTICATION_TIMING_EQUALIZATION = {!r}".format(mode), results)
+
+
+if __name__ == '__main__':
+    with test_database():
+        main()
@@ -0,0 +1,56 @@
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'site_accounts.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment  # noqa: E402
+
+
+@contextmanager
+def test_database():
+    """creates a throwaway test database for the duration of the benchmark"""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, iterations=100):
+    """returns the queries per call and the latency stats (in ms) of calling func"""
+    with CaptureQueriesContext(connection) as context:
+        func()
+    queries = len(context.captured_queries)
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "queries": queries,
+        "mean": statistics.mean(timings),
+        "p50": statistics.median(timings),
+        "p99": sorted(timings)[int(len(timings) * 0.99) - 1],
+    }
+
+
+def report(title, results):
+    print(title)
+    print('{:<40} {:>8} {:>10} {:>10} {:>10}'.format('case', 'queries', 'mean ms', 'p50 ms', 'p99 ms'))
+    for name, result in results.items():
+        print('{:<40} {:>8} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+            name, result['queries'], result['mean'], result['p50'], result['p99']))
+    print()
@@ -4,3 +4,48 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dj_site_accounts.authentication'
+
+    def ready(self):
+        from django.apps import apps
+        from django.contrib.auth import get_user_model
+        from django.core.signals import setting_changed
+        from django.db.models.signals import post_delete, post_init, post_save
+
+        from .signals import (clear_dummy_password_hash_setting_changed_signal, clear_email_renderers_post_save_signal,
+                              clear_email_renderers_setting_changed_signal, clear_jwt_signing_key_setting_changed_signal,
+                              clear_resolved_settings_setting_changed_signal,
+                              clear_revocation_index_setting_changed_signal,
+                              close_smtp_connection_pools_setting_changed_signal, forget_revocation_post_delete_signal,
+                              invalidate_identifiers_post_delete_signal, invalidate_identifiers_post_save_signal,
+                              invalidate_phone_verification_status_post_delete_signal,
+                              invalidate_phone_verification_status_post_save_signal,
+                              invalidate_verification_status_post_delete_signal,
+                              invalidate_verification_status_post_save_signal,
+                              record_revocation_post_save_signal, reset_password_hashing_pool_setting_changed_signal,
+                              snapshot_identifiers_post_init_signal)
+        from ..common.settings import resolved_settings
+
+        user_model = get_user_model()
+        post_init.connect(snapshot_identifiers_post_init_signal, sender=user_model)
+        post_save.connect(invalidate_identifiers_post_save_signal, sender=user_model)
+        post_delete.connect(invalidate_identifiers_post_delete_signal, sender=user_model)
+        post_save.connect(invalidate_verification_status_post_save_signal, sender=user_model)
+        post_delete.connect(invalidate_verification_status_post_delete_signal, sender=user_model)
+        setting_changed.connect(clear_dummy_password_hash_setting_changed_signal)
+        setting_changed.connect(reset_password_hashing_pool_setting_changed_signal)
+        setting_changed.connect(clear_resolved_settings_setting_changed_signal)
+        setting_changed.connect(close_smtp_connection_pools_setting_changed_signal)
+        setting_changed.connect(clear_email_renderers_setting_changed_signal)
+        setting_changed.connect(clear_jwt_signing_key_setting_changed_signal)
+        setting_changed.connect(clear_revocation_index_setting_changed_signal)
+        for site_model in ('sites.Site', 'sites_profiles.SiteProfile'):
+            post_save.connect(clear_email_renderers_post_save_signal, sender=site_model)
+        if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+            post_save.connect(record_revocation_post_save_signal, sender='token_blacklist.BlacklistedToken')
+            post_delete.connect(forget_revocation_post_delete_signal, sender='token_blacklist.BlacklistedToken')
+
+        resolved_settings.load()
+        phone_model = resolved_settings.get_user_phone_model()
+        if phone_model:
+            post_save.connect(invalidate_phone_verification_status_post_save_signal, sender=phone_model)
+            post_delete.connect(invalidate_phone_verification_status_post_delete_signal, sender=phone_model)
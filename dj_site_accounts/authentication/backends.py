@@ -1,10 +1,35 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password
+
+from .hashers import check_dummy_password, get_password_hashing_pool, password_rehasher
+from .identifiers import IdentifierResolver
+from .throttling import login_throttle
+from ..common.utils import get_settings_value
 
 UserModel = get_user_model()
 
 
 class MultipleAuthenticationBackend(ModelBackend):
+    resolver_class = IdentifierResolver
+
+    def get_resolver(self):
+        return self.resolver_class(UserModel)
+
+    def run_default_password_hasher(self, password):
+        """
+        Run the default password hasher once to reduce the timing
+        difference between an existing and a nonexistent user (#20760).
+
+        AUTHENTICATION_TIMING_EQUALIZATION = 'dummy_hash' (default) checks the password
+        against a hash computed once per process, 'set_password' hashes it from scratch.
+        """
+        if get_settings_value('AUTHENTICATION_TIMING_EQUALIZATION', 'dummy_hash') == 'set_password':
+            UserModel().set_password(password)
+        else:
+            check_dummy_password(password)
+
     def authenticate(self, request, *args, **kwargs):
         identifier = kwargs.pop('identifier', None)
         password = kwargs.pop('password', None)
@@ -12,22 +37,42 @@ class MultipleAuthenticationBackend(ModelBackend):
         if not password or not identifier:
             return
 
-        query = UserModel.objects.none()
-        try:
-            for field in UserModel.AUTHENTICATION_FIELDS:
-                query = query | UserModel.objects.filter(**{field: identifier})
-        except Exception as e:
-            pass
-        finally:
-            if not query.exists():
-                return
-
-        try:
-            user = query.first()
-        except UserModel.DoesNotExist:
-            # Run the default password hasher once to reduce the timing
-            # difference between an existing and a nonexistent user (#20760).
-            UserModel().set_password(password)
-        else:
-            if user.check_password(password) and self.user_can_authenticate(user):
+        login_throttle.check(request, identifier)
+
+        user = self.get_resolver().resolve(identifier)
+        if user is None or not user.has_usable_password():
+            self.run_default_password_hasher(password)
+        elif check_password(password, user.password):
+            password_rehasher.rehash(user, password)
+            if self.user_can_authenticate(user):
+                login_throttle.reset(request, identifier)
                 return user
+
+        login_throttle.register_failure(request, identifier)
+
+    async def aauthenticate(self, request, *args, **kwargs):
+        """
+        async variant of authenticate for ASGI deployments, the user lookup runs through
+        sync_to_async and every password hash runs on the bounded password hashing pool,
+        raises PasswordHashingPoolFull when the pool can not take one more hash
+        and LoginThrottled when the identifier or client ip is locked out
+        """
+        identifier = kwargs.pop('identifier', None)
+        password = kwargs.pop('password', None)
+
+        if not password or not identifier:
+            return
+
+        await sync_to_async(login_throttle.check)(request, identifier)
+
+        pool = get_password_hashing_pool()
+        user = await sync_to_async(self.get_resolver().resolve)(identifier)
+        if user is None or not user.has_usable_password():
+            await pool.run(self.run_default_password_hasher, password)
+        elif await pool.run(check_password, password, user.password):
+            await password_rehasher.arehash(user, password, pool)
+            if self.user_can_authenticate(user):
+                await sync_to_async(login_throttle.reset)(request, identifier)
+                return user
+
+        await sync_to_async(login_throttle.register_failure)(request, identifier)
@@ -0,0 +1,219 @@
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+
+from ..common.settings import resolved_settings
+from ..common.utils import get_settings_value
+
+
+class IdentifierCache:
+    """
+    Maps an (authentication field, identifier) pair to the pk of the user owning it.
+
+    Misses are stored too, with a shorter timeout, so repeated lookups of unknown
+    identifiers stay off the database. Entries are dropped by the user model
+    post_save/post_delete signals whenever one of its AUTHENTICATION_FIELDS changes.
+
+    Only the negative lookups and the existence checks skip the database: a login still
+    loads the user of a cached pk, since its password hash is never cached, but with a
+    primary key query instead of the lookup over the candidate fields.
+    """
+    key_prefix = 'dj_site_accounts:identifier'
+    snapshot_attribute = '_identifier_cache_values'
+
+    @property
+    def user_model(self):
+        return get_user_model()
+
+    @property
+    def enabled(self):
+        return get_settings_value('IDENTIFIER_CACHE_ENABLED', False)
+
+    @property
+    def cache(self):
+        return caches[get_settings_value('IDENTIFIER_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return get_settings_value('IDENTIFIER_CACHE_TIMEOUT', 300)
+
+    @property
+    def negative_timeout(self):
+        return get_settings_value('IDENTIFIER_CACHE_NEGATIVE_TIMEOUT', 30)
+
+    def get_authentication_fields(self):
+        return list(getattr(self.user_model, 'AUTHENTICATION_FIELDS', [self.user_model.USERNAME_FIELD]))
+
+    def normalize(self, field_name, value):
+        """returns the value the database compares against, e.g. E.164 for phone fields"""
+        field = self.user_model._meta.get_field(field_name)
+        try:
+            return str(field.get_prep_value(field.to_python(value)))
+        except (ValidationError, TypeError, ValueError):
+            return str(value)
+
+    def make_key(self, field_name, value):
+        digest = hashlib.md5(self.normalize(field_name, value).encode()).hexdigest()
+        return '{}:{}:{}'.format(self.key_prefix, field_name, digest)
+
+    def get_many(self, field_names, value):
+        """
+        returns {field_name: pk} for the cached fields, a pk of False means the
+        identifier is known not to exist on that field
+        """
+        keys = {self.make_key(field_name, value): field_name for field_name in field_names}
+        return {keys[key]: pk for key, pk in self.cache.get_many(list(keys)).items()}
+
+    def get(self, field_name, value):
+        return self.get_many([field_name], value).get(field_name)
+
+    def set(self, field_name, value, pk):
+        self.cache.set(self.make_key(field_name, value), pk, self.timeout)
+
+    def set_missing(self, field_names, value):
+        self.cache.set_many({self.make_key(field_name, value): False for field_name in field_names},
+                            self.negative_timeout)
+
+    def matches(self, user, field_name, value):
+        return self.normalize(field_name, getattr(user, field_name)) == self.normalize(field_name, value)
+
+    def store(self, field_names, value, user):
+        """caches the result of resolving value against field_names"""
+        if user is None:
+            self.set_missing(field_names, value)
+            return
+
+        for field_name in field_names:
+            if self.matches(user, field_name, value):
+                self.set(field_name, value, user.pk)
+
+    def exists(self, field_name, value):
+        """cached equivalent of UserModel.objects.filter(field=value).exists()"""
+        queryset = self.user_model._default_manager.filter(**{field_name: value})
+        if not self.enabled:
+            return queryset.exists()
+
+        pk = self.get(field_name, value)
+        if pk is None:
+            pk = queryset.values_list('pk', flat=True).first()
+            if pk is None:
+                self.set_missing([field_name], value)
+            else:
+                self.set(field_name, value, pk)
+        return pk is not None and pk is not False
+
+    def get_values(self, user):
+        values = {}
+        for field_name in self.get_authentication_fields():
+            field = user._meta.get_field(field_name)
+            # read from __dict__ so deferred fields are not loaded
+            value = user.__dict__.get(field.attname)
+            if value not in (None, ''):
+                values[field_name] = value
+        return values
+
+    def snapshot(self, user):
+        """remembers the loaded identifier values so their entries can be dropped once changed"""
+        setattr(user, self.snapshot_attribute, self.get_values(user))
+
+    def invalidate(self, user):
+        keys = set()
+        for values in (getattr(user, self.snapshot_attribute, {}), self.get_values(user)):
+            keys.update(self.make_key(field_name, value) for field_name, value in values.items())
+        if keys:
+            self.cache.delete_many(list(keys))
+        self.snapshot(user)
+
+
+identifier_cache = IdentifierCache()
+
+
+class VerificationStatus(int):
+    """A bitmap of the verified channels of a user"""
+    EMAIL = 1
+    PHONE = 2
+    ALL = EMAIL | PHONE
+
+    def has(self, flags):
+        return self & flags == flags
+
+    @property
+    def email_verified(self):
+        return self.has(self.EMAIL)
+
+    @property
+    def phone_verified(self):
+        return self.has(self.PHONE)
+
+    @property
+    def is_verified(self):
+        return self.has(self.ALL)
+
+
+class VerificationStatusCache:
+    """
+    Keeps the VerificationStatus of every user, so gating on verification costs a cache
+    read instead of loading the user and its USER_PHONE_MODEL rows.
+
+    A user's phone is verified once its own phone or any of its USER_PHONE_MODEL phones is.
+    Entries are dropped by the user and phone model post_save/post_delete signals and by
+    the verification flows which update the user with a queryset.
+    """
+    key_prefix = 'dj_site_accounts:verification-status'
+    verified_at_fields = {'email_verified_at': VerificationStatus.EMAIL, 'phone_verified_at': VerificationStatus.PHONE}
+
+    @property
+    def user_model(self):
+        return get_user_model()
+
+    @property
+    def cache(self):
+        return caches[get_settings_value('VERIFICATION_STATUS_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return get_settings_value('VERIFICATION_STATUS_CACHE_TIMEOUT', 3600)
+
+    def make_key(self, pk):
+        return '{}:{}'.format(self.key_prefix, pk)
+
+    def get_verified_at_fields(self):
+        field_names = {field.name for field in self.user_model._meta.concrete_fields}
+        return [name for name in self.verified_at_fields if name in field_names]
+
+    def compute(self, user):
+        """returns the status from the loaded user, or from one query when only its pk is known, e.g. a TokenUser"""
+        fields = self.get_verified_at_fields()
+        if isinstance(user, self.user_model):
+            values = {name: getattr(user, name) for name in fields}
+        else:
+            values = self.user_model._default_manager.filter(pk=user.pk).values(*fields).first() or {}
+
+        status = 0
+        for name, flag in self.verified_at_fields.items():
+            if values.get(name):
+                status |= flag
+
+        phone_model = resolved_settings.get_user_phone_model()
+        if phone_model and not status & VerificationStatus.PHONE:
+            if phone_model.objects.filter(user_id=user.pk, phone_verified_at__isnull=False).exists():
+                status |= VerificationStatus.PHONE
+        return VerificationStatus(status)
+
+    def get(self, user):
+        if user is None or not user.is_authenticated:
+            return VerificationStatus(0)
+        key = self.make_key(user.pk)
+        status = self.cache.get(key)
+        if status is None:
+            status = self.compute(user)
+            self.cache.set(key, int(status), self.timeout)
+        return VerificationStatus(status)
+
+    def invalidate(self, pk):
+        self.cache.delete(self.make_key(pk))
+
+
+verification_status_cache = VerificationStatusCache()
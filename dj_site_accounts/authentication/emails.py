@@ -0,0 +1,269 @@
+import os
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+
+from .models import OutgoingEmail
+from .outbox import BaseOutboxSender
+from ..common.settings import resolved_settings
+from ..common.utils import get_settings_value
+
+
+def build_email(subject, body, to, html_body=None, from_email=None, connection=None):
+    message = EmailMultiAlternatives(subject=subject or '', body=body, to=to, connection=connection,
+                                     from_email=from_email or settings.DEFAULT_FROM_EMAIL)
+    if html_body:
+        message.attach_alternative(html_body, 'text/html')
+    return message
+
+
+def get_delivery_connection():
+    """returns a connection of EMAIL_DELIVERY_BACKEND, Django's EMAIL_BACKEND by default"""
+    return get_connection(get_settings_value('EMAIL_DELIVERY_BACKEND', None))
+
+
+class SynchronousEmailDelivery:
+    """Sends the email within the request"""
+
+    def deliver(self, subject, body, to, html_body=None, from_email=None):
+        return build_email(subject, body, to, html_body=html_body, from_email=from_email,
+                           connection=get_delivery_connection()).send()
+
+
+class OutboxEmailDelivery:
+    """Stores the email in the outbox, the send_queued_emails command sends it"""
+
+    def deliver(self, subject, body, to, html_body=None, from_email=None):
+        return OutgoingEmail.objects.create(subject=subject or '', body=body, html_body=html_body or '', to=list(to),
+                                            from_email=from_email or settings.DEFAULT_FROM_EMAIL or '')
+
+
+def get_email_delivery():
+    """returns the EMAIL_DELIVERY class instance, emails are sent within the request by default"""
+    return resolved_settings.get('EMAIL_DELIVERY', 'dj_site_accounts.authentication.emails.SynchronousEmailDelivery')()
+
+
+class OutboxSender(BaseOutboxSender):
+    """
+    Sends the pending outbox emails in batches over a single connection, see BaseOutboxSender
+    for the EMAIL_OUTBOX_* retry, dead-letter and lease settings.
+    """
+    model = OutgoingEmail
+    settings_prefix = 'EMAIL_OUTBOX'
+
+    def __init__(self, batch_size=None, max_attempts=None, retry_delay=None, lease=None, backend=None):
+        super(OutboxSender, self).__init__(batch_size=batch_size, max_attempts=max_attempts,
+                                           retry_delay=retry_delay, lease=lease)
+        self.backend = backend or get_settings_value('EMAIL_OUTBOX_BACKEND', None) or get_settings_value(
+            'EMAIL_DELIVERY_BACKEND', None)
+
+    def send_batch(self, emails):
+        """sends the emails over one connection, returns (sent, failed)"""
+        sent, failed = [], []
+        connection = get_connection(self.backend)
+        try:
+            connection.open()
+            for email in emails:
+                message = build_email(email.subject, email.body, email.to, html_body=email.html_body,
+                                      from_email=email.from_email, connection=connection)
+                try:
+                    message.send()
+                except Exception as e:
+                    self.fail(email, e)
+                    failed.append(email)
+                else:
+                    sent.append(email)
+        except Exception as e:
+            for email in emails:
+                if email not in sent and email not in failed:
+                    self.fail(email, e)
+                    failed.append(email)
+        finally:
+            connection.close()
+
+        self.mark_sent([email.pk for email in sent])
+        return len(sent), len(failed)
+
+
+class SMTPConnectionPoolTimeout(smtplib.SMTPException):
+    """Raised when no pooled SMTP connection frees up within EMAIL_POOL_TIMEOUT seconds"""
+
+
+class PooledSMTPConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.sent = 0
+        self.broken = False
+        self.last_used_at = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    A bounded pool of open SMTP connections to one server, shared by the threads of a process.
+
+    At most EMAIL_POOL_SIZE connections are open at once, further senders wait up to
+    EMAIL_POOL_TIMEOUT seconds for one to be released. Idle connections are kept alive for
+    EMAIL_POOL_IDLE_TIMEOUT seconds, checked with a NOOP once idle for more than
+    EMAIL_POOL_HEALTH_CHECK_INTERVAL seconds and recycled after EMAIL_POOL_MAX_MESSAGES messages.
+    """
+
+    def __init__(self, size=None, timeout=None, idle_timeout=None, health_check_interval=None, max_messages=None):
+        self.size = size or get_settings_value('EMAIL_POOL_SIZE', 4)
+        self.timeout = timeout or get_settings_value('EMAIL_POOL_TIMEOUT', 30)
+        self.idle_timeout = idle_timeout or get_settings_value('EMAIL_POOL_IDLE_TIMEOUT', 60)
+        self.health_check_interval = health_check_interval or get_settings_value('EMAIL_POOL_HEALTH_CHECK_INTERVAL', 10)
+        self.max_messages = max_messages or get_settings_value('EMAIL_POOL_MAX_MESSAGES', 100)
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.size)
+
+    def acquire(self):
+        """takes a slot and returns an idle healthy connection, None when the caller has to open one"""
+        if not self.slots.acquire(timeout=self.timeout):
+            raise SMTPConnectionPoolTimeout("All {} pooled SMTP connections are busy".format(self.size))
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                pooled = self.idle.pop()
+            if self.is_usable(pooled):
+                return pooled
+            self.quit(pooled)
+
+    def is_usable(self, pooled):
+        idle = time.monotonic() - pooled.last_used_at
+        if idle > self.idle_timeout:
+            return False
+        if idle > self.health_check_interval:
+            try:
+                return pooled.connection.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                return False
+        return True
+
+    def release(self, pooled=None):
+        """gives the slot back, keeping the connection open for the next sender when it is reusable"""
+        try:
+            if pooled is not None:
+                pooled.last_used_at = time.monotonic()
+                if pooled.broken or pooled.sent >= self.max_messages:
+                    self.quit(pooled)
+                else:
+                    with self.lock:
+                        self.idle.append(pooled)
+        finally:
+            self.slots.release()
+
+    def quit(self, pooled):
+        try:
+            pooled.connection.quit()
+        except (smtplib.SMTPException, OSError):
+            pooled.connection.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for pooled in idle:
+            self.quit(pooled)
+
+
+class SMTPConnectionPools:
+    """The SMTP connection pools of the process, one per server and account"""
+
+    def __init__(self):
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def get(self, *key):
+        # connections are sockets, a forked process must not reuse the pools of its parent
+        key = (os.getpid(),) + key
+        with self.lock:
+            if key not in self.pools:
+                self.pools[key] = SMTPConnectionPool()
+            return self.pools[key]
+
+    def close(self):
+        with self.lock:
+            pools, self.pools = list(self.pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+
+smtp_connection_pools = SMTPConnectionPools()
+
+
+class PooledSMTPEmailBackend(SMTPEmailBackend):
+    """
+    Django's SMTP email backend borrowing its connections from an SMTPConnectionPool,
+    closing the backend returns the connection to the pool instead of quitting it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(PooledSMTPEmailBackend, self).__init__(*args, **kwargs)
+        self.pooled = None
+
+    @property
+    def pool(self):
+        return smtp_connection_pools.get(self.host, self.port, self.username, self.use_ssl, self.use_tls)
+
+    def open(self):
+        if self.connection:
+            return False
+        pool = self.pool
+        try:
+            self.pooled = pool.acquire()
+        except SMTPConnectionPoolTimeout:
+            if not self.fail_silently:
+                raise
+            return None
+
+        if self.pooled is None:
+            try:
+                opened = super(PooledSMTPEmailBackend, self).open()
+            except Exception:
+                pool.release()
+                raise
+            if not self.connection:
+                pool.release()
+                return opened
+            self.pooled = PooledSMTPConnection(self.connection)
+        self.connection = self.pooled.connection
+        return True
+
+    def close(self):
+        if self.connection is None:
+            return
+        pooled, self.pooled, self.connection = self.pooled, None, None
+        self.pool.release(pooled)
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        with self._lock:
+            new_conn_created = self.open()
+            if not self.connection or new_conn_created is None:
+                return 0
+            num_sent = 0
+            try:
+                for message in email_messages:
+                    if self._send(message):
+                        num_sent += 1
+            finally:
+                if new_conn_created or self.pooled.broken:
+                    self.close()
+        return num_sent
+
+    def _send(self, email_message):
+        try:
+            sent = super(PooledSMTPEmailBackend, self)._send(email_message)
+        finally:
+            # smtplib drops the socket once the server disconnects
+            if getattr(self.connection, 'sock', None) is None:
+                self.pooled.broken = True
+        if sent:
+            self.pooled.sent += 1
+        return sent
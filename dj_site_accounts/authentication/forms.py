@@ -6,9 +6,11 @@ from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from translation.forms import TranslatableModelForm
 
-from .models import SiteProfile
+from .caches import identifier_cache
 from .templatetags.auth import get_authentication_field_placeholder
+from .throttling import LoginThrottled, login_throttle
 from .verify_phone import VerifyPhone
+from ..sites_profiles.models import SiteProfile
 
 UserModel = get_user_model()
 
@@ -38,6 +40,7 @@ class MultipleLoginForm(forms.ModelForm):
         ),
         'inactive': _("This account is inactive."),
         "invalid_credentials": _("Please enter a correct credentials"),
+        'throttled': _("Too many failed login attempts, please try again in %(wait)s seconds."),
     }
 
     class Meta:
@@ -64,6 +67,11 @@ class MultipleLoginForm(forms.ModelForm):
             if not password:
                 self.add_error('password', ValidationError(self.error_messages['required'], code='required'))
         else:
+            try:
+                login_throttle.check(self.request, identifier)
+            except LoginThrottled as e:
+                raise ValidationError(self.error_messages['throttled'], code='throttled', params={'wait': e.wait})
+
             credentials = {"password": password, 'identifier': identifier}
 
             self.user_cache = authenticate(request=self.request, **credentials)
@@ -176,13 +184,13 @@ class RegisterForm(UserCreationForm):
 
     def clean_phone(self):
         phone = self.cleaned_data['phone']
-        if UserModel.objects.filter(phone=phone).exists():
+        if identifier_cache.exists('phone', phone):
             raise ValidationError("Phone already exists", code="unique")
         return phone
 
     def clean_email(self):
         email = self.cleaned_data['email']
-        if UserModel.objects.filter(email=email).exists():
+        if identifier_cache.exists('email', email):
             raise ValidationError("Email already exists", code="unique")
         return email
 
@@ -197,8 +205,12 @@ class VerifyPhoneForm(forms.Form):
     def clean(self):
         code = self.cleaned_data.get('code')
 
-        success = VerifyPhone(self.user, self.user.phone).check(code)
-        if not success:
+        verify_phone = VerifyPhone(self.user, self.user.phone)
+        success = verify_phone.check(code)
+        if not success and verify_phone.is_locked():
+            self.add_error('code', ValidationError(_("Too many invalid codes, please request a new code later"),
+                                                   code='too_many_attempts'))
+        elif not success:
             self.add_error('code', ValidationError(_("The provided code is invalid"), code='invalid_code'))
 
         return self.cleaned_data
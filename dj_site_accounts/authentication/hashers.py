@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import threading
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.db.models import Case, F, Value, When
+from django.utils.crypto import get_random_string
+
+from .writers import BatchWriter
+from ..common.settings import resolved_settings
+from ..common.utils import get_settings_value
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache()
+def get_dummy_password_hash():
+    """
+    returns the hash of a random password made with the default hasher, it is
+    computed once per process and checked against for users that do not exist
+    """
+    return make_password(get_random_string(32))
+
+
+def check_dummy_password(password):
+    """costs exactly one password hash, like checking the password of an existing user"""
+    check_password(password, get_dummy_password_hash())
+    return False
+
+
+def must_update_password(encoded):
+    """whether the encoded password was made with another hasher or outdated parameters"""
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class PasswordHashingPoolFull(Exception):
+    """Raised when the password hashing pool can not queue one more hash"""
+
+
+class PasswordHashingPool:
+    """
+    Runs password hashes off the event loop on a bounded executor.
+
+    At most max_workers hashes run at once and queue_limit more may wait, any
+    hash beyond that is rejected with PasswordHashingPoolFull instead of queueing.
+    """
+
+    def __init__(self, max_workers=None, queue_limit=None, executor_class=None):
+        self.max_workers = max_workers or get_settings_value('PASSWORD_HASHING_POOL_SIZE', os.cpu_count() or 1)
+        self.queue_limit = queue_limit if queue_limit is not None else get_settings_value(
+            'PASSWORD_HASHING_QUEUE_LIMIT', self.max_workers * 4)
+        self.executor_class = executor_class or resolved_settings.get('PASSWORD_HASHING_POOL_EXECUTOR')
+        self.executor = self.executor_class(max_workers=self.max_workers)
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.pending >= self.max_workers + self.queue_limit:
+                raise PasswordHashingPoolFull(
+                    "Password hashing pool is full ({} running, {} queued)".format(self.max_workers, self.queue_limit))
+            self.pending += 1
+
+    def release(self):
+        with self.lock:
+            self.pending -= 1
+
+    async def run(self, func, *args):
+        self.acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.release()
+
+    def submit(self, func, *args):
+        """queues func without waiting for it and returns its future, for sync callers"""
+        self.acquire()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda future: self.release())
+        return future
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+@lru_cache()
+def get_password_hashing_pool():
+    return PasswordHashingPool()
+
+
+class PasswordRehasher(BatchWriter):
+    """
+    Upgrades the outdated password hashes found at login.
+
+    PASSWORD_REHASH_MODE selects how:
+    - 'immediate' (default) hashes in the request and writes only the password column
+    - 'deferred' hashes on the password hashing pool, off the request, and queues the
+      (pk, outdated hash, new hash future) rows for the BatchWriter thread. The raw password
+      only waits in the bounded pool, a rehash is skipped until the next login when the pool
+      or the PASSWORD_REHASH_QUEUE_LIMIT rows queue is full
+    - 'disabled' never rehashes
+
+    Writes are conditional on the password column still holding the outdated hash, so
+    a password changed in the meantime is never overwritten.
+    """
+    settings_prefix = 'PASSWORD_REHASH'
+    noun = 'rehashed passwords'
+    thread_name = 'password-rehasher'
+    default_flush_interval = 5
+
+    def needs_rehash(self, user):
+        return self.mode != 'disabled' and must_update_password(user.password)
+
+    def rehash(self, user, password):
+        if not self.needs_rehash(user):
+            return
+        if self.mode == 'deferred':
+            self.enqueue(user, password, get_password_hashing_pool())
+        else:
+            self.save(user, make_password(password))
+
+    async def arehash(self, user, password, pool):
+        if not self.needs_rehash(user):
+            return
+        if self.mode == 'deferred':
+            self.enqueue(user, password, pool)
+        else:
+            await sync_to_async(self.save)(user, await pool.run(make_password, password))
+
+    def save(self, user, encoded):
+        self.update([(user.pk, user.password, encoded)])
+        user.password = encoded
+
+    def update(self, rows):
+        """writes [(pk, outdated hash, new hash)] with a single UPDATE of the password column"""
+        if not rows:
+            return 0
+        user_model = get_user_model()
+        return user_model._default_manager.filter(pk__in=[pk for pk, _, _ in rows]).update(password=Case(
+            *[When(pk=pk, password=outdated, then=Value(encoded)) for pk, outdated, encoded in rows],
+            default=F('password'),
+        ))
+
+    def enqueue(self, user, password, pool):
+        if self.is_full():
+            return
+        try:
+            future = pool.submit(make_password, password)
+        except PasswordHashingPoolFull:
+            return
+        self.put((user.pk, user.password, future))
+
+    def write_batch(self, batch):
+        rows = {}
+        for pk, outdated, future in batch:
+            try:
+                rows[pk] = (pk, outdated, future.result())
+            except Exception:
+                logger.exception("Failed to rehash the password of user %s", pk)
+        return self.update(list(rows.values()))
+
+
+password_rehasher = PasswordRehasher()
@@ -0,0 +1,177 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import models
+from django.db.models import Q
+
+from .caches import identifier_cache
+
+EMAIL = 'email'
+PHONE = 'phone'
+INTEGER = 'integer'
+USERNAME = 'username'
+
+
+class IdentifierResolver:
+    """
+    Resolves a login identifier to a user with a single query.
+
+    The identifier is classified first (email shape, E.164 phone, integer, username)
+    and looked up on the one AUTHENTICATION_FIELDS entry of that kind; an OR over the
+    candidate fields is only issued for bare numbers, which may be a primary key, a phone
+    or a username. An email or phone shaped identifier the username validators accept too
+    is looked up on the username fields by a second query, only when the first one misses.
+    """
+    phone_regex = re.compile(r'^\+[1-9]\d{1,14}$')
+    phone_separators_regex = re.compile(r'[\s\-().]')
+    integer_regex = re.compile(r'^\d+$')
+
+    def __init__(self, user_model=None):
+        self.user_model = user_model or get_user_model()
+
+    def get_authentication_fields(self):
+        return list(getattr(self.user_model, 'AUTHENTICATION_FIELDS', [self.user_model.USERNAME_FIELD]))
+
+    def get_field_kind(self, field_name):
+        from phonenumber_field.modelfields import PhoneNumberField
+
+        field = self.user_model._meta.get_field(field_name)
+        if isinstance(field, models.EmailField):
+            return EMAIL
+        if isinstance(field, PhoneNumberField) or field_name == 'phone':
+            return PHONE
+        if isinstance(field, (models.AutoField, models.IntegerField)):
+            return INTEGER
+        return USERNAME
+
+    def get_fields_by_kind(self):
+        fields = {}
+        for field_name in self.get_authentication_fields():
+            fields.setdefault(self.get_field_kind(field_name), []).append(field_name)
+        return fields
+
+    def is_email(self, identifier):
+        if '@' not in identifier:
+            return False
+        try:
+            validate_email(identifier)
+        except ValidationError:
+            return False
+        return True
+
+    def is_phone(self, identifier):
+        return bool(self.phone_regex.match(self.phone_separators_regex.sub('', identifier)))
+
+    def is_integer(self, identifier):
+        return bool(self.integer_regex.match(identifier))
+
+    def get_accepting_fields(self, field_names, identifier):
+        """returns the fields whose validators accept the identifier"""
+        accepting = []
+        for field_name in field_names:
+            try:
+                self.user_model._meta.get_field(field_name).run_validators(identifier)
+            except ValidationError:
+                continue
+            accepting.append(field_name)
+        return accepting
+
+    def classify(self, identifier):
+        """
+        returns the list of fields the identifier is looked up on first, a single field
+        means the lookup is unambiguous
+        """
+        fields = self.get_fields_by_kind()
+
+        if self.is_email(identifier) and fields.get(EMAIL):
+            return fields[EMAIL]
+
+        if self.is_phone(identifier) and fields.get(PHONE):
+            return fields[PHONE]
+
+        if self.is_integer(identifier):
+            # a bare number may be a primary key, a national phone number or a numeric username
+            return fields.get(INTEGER, []) + fields.get(PHONE, []) + fields.get(USERNAME, [])
+
+        if fields.get(USERNAME):
+            return fields[USERNAME]
+
+        return self.get_authentication_fields()
+
+    def get_fallback_fields(self, identifier):
+        """
+        returns the username fields an email or phone shaped identifier is looked up on once
+        the classified lookup misses, usernames may contain "@" and "+"
+        """
+        fields = self.get_fields_by_kind()
+        if (self.is_email(identifier) and fields.get(EMAIL)) or (self.is_phone(identifier) and fields.get(PHONE)):
+            return self.get_valid_fields(self.get_accepting_fields(fields.get(USERNAME, []), identifier), identifier)
+        return []
+
+    def get_valid_fields(self, field_names, identifier):
+        """returns the fields whose type accepts the identifier"""
+        fields = []
+        for field_name in field_names:
+            try:
+                self.user_model._meta.get_field(field_name).to_python(identifier)
+            except ValidationError:
+                continue
+            fields.append(field_name)
+        return fields
+
+    def get_candidate_fields(self, identifier):
+        """returns the classified fields whose type accepts the identifier"""
+        return self.get_valid_fields(self.classify(identifier), identifier)
+
+    def get_lookup(self, identifier, fields):
+        lookup = Q()
+        for field_name in fields:
+            lookup |= Q(**{field_name: identifier})
+        return lookup
+
+    def query(self, identifier, fields):
+        queryset = self.user_model._default_manager.filter(self.get_lookup(identifier, fields))
+        if len(fields) == 1:
+            try:
+                return queryset.get()
+            except (self.user_model.DoesNotExist, self.user_model.MultipleObjectsReturned):
+                return None
+        return queryset.first()
+
+    def query_cached(self, identifier, fields):
+        """
+        known misses return without a query, a cached pk still loads the user by primary key
+        so authentication gets a fresh password hash and the identifier is checked again
+        """
+        cached = identifier_cache.get_many(fields, identifier)
+        for field_name in fields:
+            pk = cached.get(field_name)
+            if pk:
+                user = self.user_model._default_manager.filter(pk=pk).first()
+                if user is not None and identifier_cache.matches(user, field_name, identifier):
+                    return user
+                break
+        else:
+            if len(cached) == len(fields):
+                return None
+
+        user = self.query(identifier, fields)
+        identifier_cache.store(fields, identifier, user)
+        return user
+
+    def resolve(self, identifier):
+        """returns the user matching the identifier or None"""
+        if not identifier:
+            return None
+
+        identifier = str(identifier).strip()
+        lookup = self.query_cached if identifier_cache.enabled else self.query
+        fields = self.get_candidate_fields(identifier)
+        user = lookup(identifier, fields) if fields else None
+        if user is None:
+            fallback_fields = self.get_fallback_fields(identifier)
+            if fallback_fields:
+                user = lookup(identifier, fallback_fields)
+        return user
@@ -0,0 +1,171 @@
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from phonenumber_field.phonenumber import to_python
+
+from ....common.utils import generate_keys
+
+
+class Command(BaseCommand):
+    help = "Imports users from a CSV or JSONL file, use '-' to read from stdin"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help="input format, guessed from the file extension by default")
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="number of users validated and inserted together")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="password hashing processes, 0 hashes in this process")
+        parser.add_argument('--on-conflict', choices=['skip', 'fail'], default='skip',
+                            help="what to do with users whose unique fields already exist")
+
+    def handle(self, *args, **options):
+        self.user_model = get_user_model()
+        self.on_conflict = options['on_conflict']
+        self.field_names = {field.name for field in self.user_model._meta.concrete_fields if not field.primary_key}
+        self.unique_fields = [field.name for field in self.user_model._meta.concrete_fields
+                              if field.unique and not field.primary_key and field.name != 'key']
+        self.required_fields = [self.user_model.USERNAME_FIELD] + list(self.user_model.REQUIRED_FIELDS)
+        self.has_key = 'key' in self.field_names
+        self.stats = {'imported': 0, 'invalid': 0, 'conflicts': 0}
+
+        self.workers = options['workers'] if options['workers'] is not None else os.cpu_count() or 1
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup) if self.workers else None
+        try:
+            rows = self.read_rows(options['path'], options['format'])
+            for chunk in iter(lambda: list(islice(rows, options['chunk_size'])), []):
+                self.import_chunk(chunk, executor)
+                self.stdout.write("Imported {imported} users, skipped {invalid} invalid "
+                                  "and {conflicts} conflicting rows".format(**self.stats))
+        finally:
+            if executor:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS("Imported {imported} users".format(**self.stats)))
+
+    def read_rows(self, path, file_format):
+        """yields (line number, row) pairs without loading the whole file"""
+        file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        file = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            if file_format == 'csv':
+                for line, row in enumerate(csv.DictReader(file), start=2):
+                    yield line, row
+            else:
+                for line, content in enumerate(file, start=1):
+                    if content.strip():
+                        yield line, json.loads(content)
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+    def clean_row(self, row):
+        """returns the model field values of the row, raises ValidationError for invalid rows"""
+        values = {name: value for name, value in row.items() if name in self.field_names and value not in (None, '')}
+        for name in self.required_fields:
+            if not values.get(name):
+                raise ValidationError("{} is required".format(name))
+
+        if 'email' in values:
+            values['email'] = self.user_model.objects.normalize_email(values['email'].strip())
+            validate_email(values['email'])
+
+        if 'phone' in values:
+            phone = to_python(str(values['phone']).strip())
+            if not phone or not phone.is_valid():
+                raise ValidationError("{} is not a valid phone number".format(values['phone']))
+            values['phone'] = phone.as_e164
+
+        return values
+
+    def report(self, line, message):
+        self.stderr.write("line {}: {}".format(line, message))
+
+    def validate_chunk(self, chunk):
+        valid = []
+        for line, row in chunk:
+            try:
+                valid.append((line, self.clean_row(row)))
+            except ValidationError as e:
+                self.stats['invalid'] += 1
+                self.report(line, '; '.join(e.messages))
+        return valid
+
+    def remove_conflicts(self, rows):
+        """drops rows whose unique fields exist in the database or earlier in the chunk, one query per field"""
+        taken = {}
+        for name in self.unique_fields:
+            column = [values[name] for _, values in rows if name in values]
+            existing = self.user_model._default_manager.filter(**{'{}__in'.format(name): column}) \
+                .values_list(name, flat=True) if column else []
+            taken[name] = {str(value) for value in existing}
+
+        accepted = []
+        for line, values in rows:
+            conflicts = [name for name in self.unique_fields if str(values.get(name)) in taken[name]]
+            if conflicts:
+                if self.on_conflict == 'fail':
+                    raise CommandError("line {}: {} already exists".format(line, ', '.join(conflicts)))
+                self.stats['conflicts'] += 1
+                self.report(line, "{} already exists".format(', '.join(conflicts)))
+                continue
+            for name in self.unique_fields:
+                if name in values:
+                    taken[name].add(str(values[name]))
+            accepted.append((line, values))
+        return accepted
+
+    def hash_passwords(self, rows, executor):
+        passwords = [values.pop('password', None) for _, values in rows]
+        if executor:
+            chunksize = max(1, len(passwords) // (self.workers * 4))
+            return list(executor.map(make_password, passwords, chunksize=chunksize))
+        return [make_password(password) for password in passwords]
+
+    def import_chunk(self, chunk, executor):
+        rows = self.remove_conflicts(self.validate_chunk(chunk))
+        if not rows:
+            return
+
+        passwords = self.hash_passwords(rows, executor)
+        keys = generate_keys(len(rows)) if self.has_key else [None] * len(rows)
+
+        users = []
+        for (line, values), password, key in zip(rows, passwords, keys):
+            user = self.user_model(**values)
+            user.password = password
+            if key:
+                user.key = key
+            users.append((line, user))
+
+        try:
+            with transaction.atomic():
+                self.user_model._default_manager.bulk_create([user for _, user in users])
+            self.stats['imported'] += len(users)
+        except IntegrityError:
+            # a concurrent writer took one of the values, insert one by one to keep the others
+            for line, user in users:
+                self.insert(line, user)
+
+    def insert(self, line, user):
+        try:
+            with transaction.atomic():
+                self.user_model._default_manager.bulk_create([user])
+            self.stats['imported'] += 1
+        except IntegrityError as e:
+            if self.on_conflict == 'fail':
+                raise CommandError("line {}: {}".format(line, e))
+            self.stats['conflicts'] += 1
+            self.report(line, str(e))
@@ -0,0 +1,22 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...tokens import ExpiredTokenPruner
+
+
+class Command(BaseCommand):
+    help = "Deletes the expired JWT outstanding tokens and their blacklist entries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="primary keys deleted per transaction, JWT_PRUNE_BATCH_SIZE by default")
+        parser.add_argument('--pause', type=float, default=None,
+                            help="seconds to wait between batches, JWT_PRUNE_PAUSE by default")
+
+    def handle(self, *args, **options):
+        if not apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+            raise CommandError("rest_framework_simplejwt.token_blacklist is not installed")
+        pruner = ExpiredTokenPruner(batch_size=options['batch_size'], pause=options['pause'])
+        outstanding, blacklisted = pruner.prune()
+        self.stdout.write(self.style.SUCCESS(
+            "Deleted {} expired outstanding tokens and {} blacklisted tokens".format(outstanding, blacklisted)))
@@ -0,0 +1,8 @@
+from ...emails import OutboxSender
+from ...outbox import BaseOutboxCommand
+
+
+class Command(BaseOutboxCommand):
+    help = "Sends the emails queued in the outbox by OutboxEmailDelivery"
+    sender_class = OutboxSender
+    noun = 'emails'
@@ -0,0 +1,8 @@
+from ...outbox import BaseOutboxCommand
+from ...sms import SMSSender
+
+
+class Command(BaseOutboxCommand):
+    help = "Sends the text messages queued by QueuedVerifyPhoneService through the SMS_PROVIDERS"
+    sender_class = SMSSender
+    default_interval = 1
@@ -0,0 +1,131 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand, CommandError
+
+from ...emails import get_email_delivery
+from ...renderers import verification_email_renderer
+from ...verify_phone import VerifyPhone
+from ....common.utils import get_settings_value
+
+
+class RateLimiter:
+    """spaces calls to wait() so that at most rate calls happen per second, 0 disables it"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(self.next_at, now) + self.interval
+
+
+class Command(BaseCommand):
+    help = "Sends the email or phone verification to every user who has not verified it yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('channel', choices=['email', 'phone'])
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="users loaded, rendered and sent together")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="concurrent sending threads, 0 sends in this thread")
+        parser.add_argument('--rate', type=float, default=0,
+                            help="maximum messages per second, unlimited by default")
+        parser.add_argument('--checkpoint', default=None,
+                            help="file recording the progress, an interrupted run resumes from it")
+        parser.add_argument('--site', type=int, default=None, help="id of the site the emails link to")
+        parser.add_argument('--protocol', choices=['http', 'https'], default='https')
+        parser.add_argument('--dry-run', action='store_true', help="only count the users who would be sent to")
+
+    def handle(self, *args, **options):
+        self.channel = options['channel']
+        self.checkpoint = options['checkpoint']
+        progress = self.read_checkpoint()
+        users = self.get_queryset().filter(pk__gt=progress['last_pk']).order_by('pk')
+
+        if options['dry_run']:
+            count = users.count()
+            estimate = " in about {:.0f} seconds".format(count / options['rate']) if options['rate'] else ""
+            self.stdout.write("Would send {} {} verifications{}, resuming after user {}".format(
+                count, self.channel, estimate, progress['last_pk']))
+            return
+
+        self.site = Site.objects.get(pk=options['site']) if options['site'] else Site.objects.get_current()
+        self.protocol = options['protocol']
+        self.delivery = get_email_delivery()
+        self.limiter = RateLimiter(options['rate'])
+        executor = ThreadPoolExecutor(max_workers=options['workers']) if options['workers'] else None
+        try:
+            rows = users.iterator(chunk_size=options['chunk_size'])
+            for chunk in iter(lambda: list(islice(rows, options['chunk_size'])), []):
+                sent, failed = self.send_chunk(chunk, executor)
+                progress['sent'] += sent
+                progress['failed'] += failed
+                progress['last_pk'] = chunk[-1].pk
+                self.write_checkpoint(progress)
+                self.stdout.write("Sent {sent} verifications, {failed} failed, up to user {last_pk}".format(**progress))
+        finally:
+            if executor:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS("Sent {sent} {channel} verifications, {failed} failed".format(**progress)))
+
+    def get_queryset(self):
+        return get_user_model()._default_manager.filter(is_active=True, **{
+            '{}_verified_at__isnull'.format(self.channel): True,
+            '{}__isnull'.format(self.channel): False,
+        }).exclude(**{self.channel: ''})
+
+    def read_checkpoint(self):
+        progress = {'channel': self.channel, 'last_pk': 0, 'sent': 0, 'failed': 0}
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as file:
+                progress.update(json.load(file))
+            if progress['channel'] != self.channel:
+                raise CommandError("{} is a checkpoint of a {} run".format(self.checkpoint, progress['channel']))
+        return progress
+
+    def write_checkpoint(self, progress):
+        if not self.checkpoint:
+            return
+        # replaced at once so an interrupted write never leaves a broken checkpoint
+        with open(self.checkpoint + '.tmp', 'w') as file:
+            json.dump(progress, file)
+        os.replace(self.checkpoint + '.tmp', self.checkpoint)
+
+    def get_messages(self, users):
+        """returns (user, callable sending the verification) for every user"""
+        if self.channel == 'phone':
+            return [(user, VerifyPhone(user, user.phone).send) for user in users]
+
+        subject = get_settings_value('EMAIL_CONFIRMATION_SUBJECT', None)
+        return [(user, partial(self.delivery.deliver, subject=subject, body=message, html_body=message, to=[user.email]))
+                for user, message in verification_email_renderer.render_many(users, self.site, self.protocol)]
+
+    def send(self, user, send):
+        try:
+            send()
+            return True
+        except Exception as e:
+            self.stderr.write("user {}: {}".format(user.pk, e))
+            return False
+
+    def send_chunk(self, users, executor):
+        """sends the verifications of the chunk, waiting for all of them so the checkpoint stays exact"""
+        results = []
+        for user, send in self.get_messages(users):
+            self.limiter.wait()
+            results.append(executor.submit(self.send, user, send) if executor else self.send(user, send))
+        sent = len([result for result in results if (result.result() if executor else result)])
+        return sent, len(results) - sent
@@ -0,0 +1,36 @@
+from django.http import HttpResponseBadRequest
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext as _
+
+from .caches import verification_status_cache
+from ..common.utils import get_settings_value, signed_email_verification_token
+
+
+class SignedTokenMiddleware(MiddlewareMixin):
+    """
+    Rejects the requests to the email verification views of SIGNED_TOKEN_URL_NAMES whose
+    token is expired or tampered with, before the view runs and without any database access.
+    Does nothing unless EMAIL_VERIFICATION_TOKEN = 'signed', the 'hmac' tokens are left to the view.
+    """
+    token_kwarg = 'token'
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if get_settings_value('EMAIL_VERIFICATION_TOKEN', 'hmac') != 'signed':
+            return None
+        url_names = get_settings_value('SIGNED_TOKEN_URL_NAMES', ['verify-email'])
+        if request.resolver_match is None or request.resolver_match.url_name not in url_names:
+            return None
+        if signed_email_verification_token.read(view_kwargs.get(self.token_kwarg)) is None:
+            return HttpResponseBadRequest(_("This link is invalid or has expired."))
+        return None
+
+
+class VerificationStatusMiddleware(MiddlewareMixin):
+    """
+    Sets request.verification_status, the VerificationStatus of request.user read from the
+    verification status cache on first access. Must come after AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        request.verification_status = SimpleLazyObject(lambda: verification_status_cache.get(request.user))
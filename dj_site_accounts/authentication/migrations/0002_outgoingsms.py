@@ -0,0 +1,37 @@
+# Generated by Django 3.2 on 2026-10-17 19:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingSMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=32, verbose_name='Phone')),
+                ('message', models.TextField(blank=True, default='', verbose_name='Message')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('provider', models.CharField(blank=True, default='', max_length=255, verbose_name='Provider')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Last Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next Attempt At')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent At')),
+            ],
+            options={
+                'verbose_name': 'Outgoing SMS',
+                'verbose_name_plural': 'Outgoing SMS',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outgoingsms',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='authenticat_status_f616ec_idx'),
+        ),
+    ]
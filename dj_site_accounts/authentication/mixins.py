@@ -1,22 +1,22 @@
-import sys
-import traceback
+import logging
 
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.cache import cache
-from django.core.exceptions import ObjectDoesNotExist
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.encoding import force_bytes, force_text
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.utils.encoding import force_text
+from django.utils.http import urlsafe_base64_decode
 from django.utils.timezone import now
 
+from .caches import verification_status_cache
+from .emails import get_email_delivery
 from .forms import MultipleLoginForm, VerifyPhoneForm
-from .verify_phone import VerifyPhone
-from ..utils import get_settings_value, get_class_from_settings, account_activation_token
+from .renderers import verification_email_renderer
+from .verify_phone import VerifyPhone, otp_state_store
+from ..common.settings import resolved_settings
+from ..common.utils import get_email_verification_token_generator, get_settings_value
 
 UserModel = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class LoginGetFormClassMixin:
@@ -30,36 +30,27 @@ class LoginGetFormClassMixin:
         """
         if get_settings_value('MULTIPLE_AUTHENTICATION_ACTIVE', False):
             return MultipleLoginForm
-        return get_class_from_settings('LOGIN_FORM', 'django.contrib.auth.forms.AuthenticationForm')
+        return resolved_settings.get_login_form()
 
 
 class SendEmailVerificationMixin:
     def send_email_verification(self, request, user):
         try:
-            html_message = render_to_string('dj_accounts/emails/email_confirmation.html', {
-                'user': user,
-                'site': get_current_site(request),
-                'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-                'token': account_activation_token.make_token(user),
-                'protocol': 'https' if request.is_secure() else 'http'
-            })
-            send_mail(
+            html_message = verification_email_renderer.render(
+                user, get_current_site(request), protocol='https' if request.is_secure() else 'http')
+            get_email_delivery().deliver(
                 subject=get_settings_value('EMAIL_CONFIRMATION_SUBJECT', None),
-                html_message=html_message,
-                message=html_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email]
+                body=html_message,
+                html_body=html_message,
+                to=[user.email]
             )
-        except Exception as e:
-            parts = ["Traceback (most recent call last):\n"]
-            parts.extend(traceback.format_stack(limit=25)[:-2])
-            parts.extend(traceback.format_exception(*sys.exc_info())[1:])
-            print("".join(parts))
+        except Exception:
+            logger.exception("Failed to send the email verification of user %s", user.pk)
 
 
 class ViewCallbackMixin:
     def get_callback(self, key, user):
-        callback = get_class_from_settings(key)
+        callback = resolved_settings.get_callback(key)
         if callback:
             callback(user)
 
@@ -68,34 +59,40 @@ class SendPhoneVerificationMixin:
     def send_phone_verification(self, user):
         try:
             VerifyPhone(user, user.phone).send()
-        except Exception as e:
-            parts = ["Traceback (most recent call last):\n"]
-            parts.extend(traceback.format_stack(limit=25)[:-2])
-            parts.extend(traceback.format_exception(*sys.exc_info())[1:])
-            print("".join(parts))
+        except Exception:
+            logger.exception("Failed to send the phone verification of user %s", user.pk)
 
 
 class RegisterMixin(ViewCallbackMixin, SendEmailVerificationMixin, SendPhoneVerificationMixin):
     def get_form_class(self):
-        return get_class_from_settings('REGISTER_FORM', 'dj_accounts.authentication.forms.UserCreationForm')
+        return resolved_settings.get_register_form()
 
 
 class VerifyEmailMixin:
     def verify(self, uidb64, token):
+        """
+        rejects malformed and expired tokens before querying, loads only the columns the
+        token depends on and marks the email as verified with a single conditional update
+        """
         user = None
-        try:
-            uid = force_text(urlsafe_base64_decode(uidb64))
-            user = UserModel.objects.get(pk=uid)
-
-        except(TypeError, ValueError, OverflowError, UserModel.DoesNotExist):
-            pass
-        finally:
-            success = account_activation_token.check_token(user, token)
-            if user is not None and success:
-                user.email_verified_at = now()
-                user.save()
-
-            return success, user
+        token_generator = get_email_verification_token_generator()
+        if token_generator.get_timestamp(token) is not None:
+            try:
+                uid = force_text(urlsafe_base64_decode(uidb64))
+                fields = ('pk', 'email_verified_at') + token_generator.user_fields
+                user = UserModel._default_manager.only(*fields).get(pk=uid)
+            except (TypeError, ValueError, OverflowError, ValidationError, UserModel.DoesNotExist):
+                pass
+
+        success = token_generator.check_token(user, token)
+        if success and user.email_verified_at is None:
+            verified_at = now()
+            if UserModel._default_manager.filter(pk=user.pk, email_verified_at__isnull=True).update(
+                    email_verified_at=verified_at):
+                user.email_verified_at = verified_at
+                verification_status_cache.invalidate(user.pk)
+
+        return success, user
 
 
 class VerifyPhoneMixin:
@@ -109,13 +106,13 @@ class VerifyPhoneMixin:
         self.is_verified = False
 
     def get_phone(self):
-        phone_model = get_class_from_settings("USER_PHONE_MODEL")
+        phone_model = resolved_settings.get_user_phone_model()
         phone_object = self.request.user
         if phone_model and self.kwargs.get("phone_id", None):
-            phone_object = phone_model.objects.filter(user=self.request.user, id=self.kwargs.get('phone_id'))
-            if not phone_object.exists():
+            phone_object = phone_model._default_manager.filter(
+                user=self.request.user, id=self.kwargs.get('phone_id')).first()
+            if phone_object is None:
                 raise ObjectDoesNotExist("Phone Not Found!")
-            phone_object = phone_object.first()
 
         self.phone = str(phone_object.phone)
         self.is_verified = phone_object.phone_verified_at is not None
@@ -131,5 +128,5 @@ class VerifyPhoneMixin:
             "otp_length": otp_length,
             "otp_range": range(otp_length),
             "form": self.form,
-            "otp_expiry": cache.get("{}-otp-cache-expiry-timestamp".format(self.request.user.id))
+            "otp_expiry": otp_state_store.get(self.request.user, self.phone)['expires_at']
         }
@@ -1,9 +1,11 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Prefetch
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
 
-from dj_site_accounts.common.utils import get_settings_value
+from dj_site_accounts.common.utils import get_settings_value, generate_key
 
 
 class HasPhone(models.Model):
@@ -17,7 +19,42 @@ class HasPhone(models.Model):
 
     def verify_phone(self):
         self.phone_verified_at = now()
-        self.save()
+        self.save(update_fields=['phone_verified_at'])
+
+
+class UserPhoneQuerySet(models.QuerySet):
+    def get_primary(self, user):
+        """returns the primary phone of the user, None when it has none, in a single query"""
+        return self.filter(user=user, is_primary=True).first()
+
+    def get_for_user(self, user, pk):
+        """returns the phone pk of the user, None when the user has no such phone, in a single query"""
+        return self.filter(user=user, pk=pk).first()
+
+    def prefetch_for(self, users, to_attr=None):
+        """prefetches the phones of a users queryset, primary first, with one query for all of them"""
+        accessor = self.model._meta.get_field('user').remote_field.get_accessor_name()
+        return users.prefetch_related(Prefetch(accessor, queryset=self.order_by('-is_primary', 'pk'), to_attr=to_attr))
+
+
+class AbstractUserPhone(HasPhone):
+    """
+    A phone of a user with several of them, the USER_PHONE_MODEL base.
+
+    The (user, is_primary) index serves both the primary phone lookup and listing
+    the phones of a user. The reverse accessor is Django's default one of the concrete
+    model, e.g. user.userphone_set, which prefetch_for() finds by itself.
+    """
+
+    class Meta:
+        abstract = True
+        indexes = [models.Index(fields=['user', 'is_primary'], name='%(app_label)s_%(class)s_primary')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    is_primary = models.BooleanField(default=False)
+    under_verification = models.BooleanField(default=False)
+
+    objects = UserPhoneQuerySet.as_manager()
 
 
 class HasOTPVerification(HasPhone):
@@ -25,6 +62,86 @@ class HasOTPVerification(HasPhone):
         abstract = True
 
     key = models.CharField(max_length=100, unique=True, blank=True)
+    key_generation_attempts = 3
 
     if get_settings_value('OTP_VERIFICATION_TYPE') == 'HOTP':
         otp_counter = models.IntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        """
+        Generates the otp key without checking it first and relies on the unique
+        constraint instead, a colliding key is regenerated and the save retried.
+        Every attempt runs in its own savepoint, so a collision inside an atomic
+        block only rolls the attempt back.
+        """
+        update_fields = kwargs.get('update_fields')
+        if self.key or (update_fields is not None and 'key' not in update_fields):
+            return super(HasOTPVerification, self).save(*args, **kwargs)
+
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        for attempt in range(self.key_generation_attempts):
+            self.key = generate_key()
+            try:
+                with transaction.atomic(using=using):
+                    return super(HasOTPVerification, self).save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == self.key_generation_attempts - 1:
+                    raise
+                if not type(self)._default_manager.using(using).filter(key=self.key).exists():
+                    raise
+
+
+class OutboxMessage(models.Model):
+    """A message waiting in an outbox for its BaseOutboxSender worker"""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _("Pending")),
+        (STATUS_SENT, _("Sent")),
+        (STATUS_FAILED, _("Failed")),
+    )
+
+    class Meta:
+        abstract = True
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name=_("Status"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    last_error = models.TextField(blank=True, default='', verbose_name=_("Last Error"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
+    next_attempt_at = models.DateTimeField(default=now, verbose_name=_("Next Attempt At"))
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Sent At"))
+
+
+class OutgoingEmail(OutboxMessage):
+    """An email waiting in the outbox for the send_queued_emails worker"""
+
+    class Meta:
+        verbose_name = _("Outgoing Email")
+        verbose_name_plural = _("Outgoing Emails")
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    subject = models.CharField(max_length=255, verbose_name=_("Subject"))
+    body = models.TextField(verbose_name=_("Body"))
+    html_body = models.TextField(blank=True, default='', verbose_name=_("HTML Body"))
+    from_email = models.CharField(max_length=254, blank=True, default='', verbose_name=_("From"))
+    to = models.JSONField(default=list, verbose_name=_("To"))
+
+    def __str__(self):
+        return self.subject
+
+
+class OutgoingSMS(OutboxMessage):
+    """A text message waiting in the queue for the send_queued_sms worker"""
+
+    class Meta:
+        verbose_name = _("Outgoing SMS")
+        verbose_name_plural = _("Outgoing SMS")
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    phone = models.CharField(max_length=32, verbose_name=_("Phone"))
+    message = models.TextField(blank=True, default='', verbose_name=_("Message"))
+    provider = models.CharField(max_length=255, blank=True, default='', verbose_name=_("Provider"))
+
+    def __str__(self):
+        return self.phone
@@ -0,0 +1,111 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from ..common.utils import get_settings_value
+
+
+class BaseOutboxSender:
+    """
+    Sends the pending messages of an OutboxMessage model in batches.
+
+    A failed message is retried after <settings_prefix>_RETRY_DELAY seconds, doubled on every
+    further failure, and dead-lettered as failed after <settings_prefix>_MAX_ATTEMPTS attempts.
+    Claimed messages are leased for <settings_prefix>_LEASE seconds so several workers can run
+    side by side without sending the same message twice. The secret_fields, e.g. a text
+    message holding a verification code, are cleared once the message is sent or dead-lettered.
+    """
+    model = None
+    settings_prefix = None
+    default_retry_delay = 60
+    secret_fields = ()
+
+    def __init__(self, batch_size=None, max_attempts=None, retry_delay=None, lease=None):
+        self.batch_size = batch_size or self.get_setting('BATCH_SIZE', 100)
+        self.max_attempts = max_attempts or self.get_setting('MAX_ATTEMPTS', 5)
+        self.retry_delay = retry_delay or self.get_setting('RETRY_DELAY', self.default_retry_delay)
+        self.lease = lease or self.get_setting('LEASE', 300)
+
+    def get_setting(self, name, default):
+        return get_settings_value('{}_{}'.format(self.settings_prefix, name), default)
+
+    def claim(self):
+        """returns the next batch of due messages, leased to this worker"""
+        with transaction.atomic():
+            due = self.model.objects.select_for_update(skip_locked=True).filter(
+                status=self.model.STATUS_PENDING, next_attempt_at__lte=now()).order_by('next_attempt_at', 'pk')
+            messages = list(due[:self.batch_size])
+            self.model.objects.filter(pk__in=[message.pk for message in messages]).update(
+                next_attempt_at=now() + timedelta(seconds=self.lease))
+        return messages
+
+    def get_retry_delay(self, attempts):
+        return timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+
+    def fail(self, message, error):
+        message.attempts += 1
+        message.last_error = str(error)
+        update_fields = ['attempts', 'last_error', 'status', 'next_attempt_at']
+        if message.attempts >= self.max_attempts:
+            message.status = self.model.STATUS_FAILED
+            for field_name in self.secret_fields:
+                setattr(message, field_name, '')
+            update_fields += list(self.secret_fields)
+        else:
+            message.next_attempt_at = now() + self.get_retry_delay(message.attempts)
+        message.save(update_fields=update_fields)
+
+    def mark_sent(self, pks, **values):
+        values.update({field_name: '' for field_name in self.secret_fields})
+        self.model.objects.filter(pk__in=pks).update(status=self.model.STATUS_SENT, sent_at=now(),
+                                                     attempts=F('attempts') + 1, **values)
+
+    def send_batch(self, messages):
+        """sends the messages, returns (sent, failed)"""
+        raise NotImplementedError('subclasses of BaseOutboxSender must provide a send_batch() method')
+
+    def send(self):
+        """sends every due message, returns (sent, failed)"""
+        total_sent, total_failed = 0, 0
+        messages = self.claim()
+        while messages:
+            sent, failed = self.send_batch(messages)
+            total_sent, total_failed = total_sent + sent, total_failed + failed
+            messages = self.claim()
+        return total_sent, total_failed
+
+
+class BaseOutboxCommand(BaseCommand):
+    """Runs a BaseOutboxSender once, or keeps polling the outbox with --loop"""
+    sender_class = None
+    noun = 'messages'
+    default_interval = 5
+
+    def add_arguments(self, parser):
+        prefix = self.sender_class.settings_prefix
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="{} claimed at once, {}_BATCH_SIZE by default".format(self.noun, prefix))
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help="attempts before a message is marked as failed, {}_MAX_ATTEMPTS by default".format(
+                                prefix))
+        parser.add_argument('--loop', action='store_true',
+                            help="keep running and poll the outbox every --interval seconds")
+        parser.add_argument('--interval', type=float, default=self.default_interval,
+                            help="seconds to wait between polls when --loop is given")
+
+    def get_sender(self, options):
+        return self.sender_class(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+
+    def handle(self, *args, **options):
+        sender = self.get_sender(options)
+        while True:
+            sent, failed = sender.send()
+            if sent or failed or not options['loop']:
+                self.stdout.write("Sent {} {}, {} failed".format(sent, self.noun, failed))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
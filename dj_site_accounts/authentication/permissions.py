@@ -0,0 +1,28 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import BasePermission
+
+from .caches import VerificationStatus, verification_status_cache
+
+
+class HasVerificationStatus(BasePermission):
+    """Allows the authenticated users whose verification status has every flag of status"""
+    status = VerificationStatus.ALL
+    message = _("Verify your email address and phone number first.")
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated
+                    and verification_status_cache.get(request.user).has(self.status))
+
+
+class IsEmailVerified(HasVerificationStatus):
+    status = VerificationStatus.EMAIL
+    message = _("Verify your email address first.")
+
+
+class IsPhoneVerified(HasVerificationStatus):
+    status = VerificationStatus.PHONE
+    message = _("Verify your phone number first.")
+
+
+class IsVerified(HasVerificationStatus):
+    pass
@@ -0,0 +1,169 @@
+import hashlib
+import re
+import time
+
+from django.core.cache import caches
+from django.template.loader import select_template
+from django.utils import translation
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from ..common.utils import get_email_verification_token_generator, get_settings_value
+
+
+class UnsupportedPlaceholder(Exception):
+    """Raised when a template reads a user attribute the placeholders do not cover"""
+
+
+class PlaceholderUser:
+    """
+    Stands in for the user while the site-wide part of an email is rendered.
+
+    Any user attribute other than the username raises UnsupportedPlaceholder, rather than
+    AttributeError which the template engine would silently render as an empty string.
+    """
+
+    def __init__(self, username):
+        self.username = username
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        raise UnsupportedPlaceholder(name)
+
+    def get_username(self):
+        return self.username
+
+    def __str__(self):
+        return self.username
+
+
+class AccountEmailRenderer:
+    """
+    Renders account emails without going through the template engine for every message.
+
+    The template is compiled once per (EMAIL_THEME, language) and rendered once per site,
+    language and protocol with placeholders in place of the uid, token and username of the
+    user, every message then only substitutes the placeholders. Templates reading any other
+    user attribute are rendered in full for every message instead.
+
+    The rendered emails are kept in the EMAIL_RENDERER_CACHE_ALIAS cache for
+    EMAIL_RENDERER_CACHE_TIMEOUT seconds under a version the site and profile post_save
+    signals bump, so every process sharing the cache stops using them once a site changes.
+    """
+    placeholders = {
+        'uid': 'DJSITEACCOUNTSUIDPLACEHOLDER',
+        'token': 'DJSITEACCOUNTSTOKENPLACEHOLDER',
+        'username': 'DJSITEACCOUNTSUSERNAMEPLACEHOLDER',
+    }
+
+    key_prefix = 'dj_site_accounts:email'
+
+    def __init__(self, template_name):
+        self.template_name = template_name
+        self.templates = {}
+        self.pattern = re.compile('|'.join(self.placeholders.values()))
+
+    def get_template_names(self, theme, language):
+        return [
+            'dj_site_accounts/emails/{}/{}/{}'.format(theme, language, self.template_name),
+            'dj_site_accounts/emails/{}/{}'.format(theme, self.template_name),
+            'dj_site_accounts/emails/{}'.format(self.template_name),
+        ]
+
+    def get_template(self, theme, language):
+        key = (theme, language)
+        if key not in self.templates:
+            self.templates[key] = select_template(self.get_template_names(theme, language))
+        return self.templates[key]
+
+    @property
+    def cache(self):
+        return caches[get_settings_value('EMAIL_RENDERER_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return get_settings_value('EMAIL_RENDERER_CACHE_TIMEOUT', 3600)
+
+    @property
+    def version_key(self):
+        return '{}:{}:version'.format(self.key_prefix, self.template_name)
+
+    def get_version(self):
+        # a timestamp rather than 1, so an evicted version never revives older emails
+        self.cache.add(self.version_key, int(time.time() * 1000), None)
+        return self.cache.get(self.version_key)
+
+    def make_key(self, *parts):
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        return '{}:{}:{}'.format(self.key_prefix, self.template_name, digest)
+
+    def render_template(self, site, protocol, language, user, uid, token):
+        theme = get_settings_value('EMAIL_THEME', 'default')
+        with translation.override(language):
+            return self.get_template(theme, language).render({
+                'site': site,
+                'domain': site.domain,
+                'protocol': protocol,
+                'user': user,
+                'uid': uid,
+                'token': token,
+            })
+
+    def get_skeleton(self, site, protocol, language):
+        """
+        returns the email rendered with placeholders for the per-user values, or False when
+        the template reads user attributes the placeholders do not cover
+        """
+        theme = get_settings_value('EMAIL_THEME', 'default')
+        key = self.make_key(site.domain, theme, language, protocol)
+        version = self.get_version()
+        skeleton = self.cache.get(key, version=version)
+        if skeleton is None:
+            try:
+                skeleton = self.render_template(site, protocol, language, PlaceholderUser(self.placeholders['username']),
+                                                self.placeholders['uid'], self.placeholders['token'])
+            except UnsupportedPlaceholder:
+                skeleton = False
+            self.cache.set(key, skeleton, self.timeout, version=version)
+        return skeleton
+
+    def get_values(self, user, token=None):
+        values = {
+            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': token or get_email_verification_token_generator().make_token(user),
+            'username': user.get_username(),
+        }
+        return {self.placeholders[name]: value for name, value in values.items()}
+
+    def fill(self, skeleton, user, token=None):
+        values = self.get_values(user, token)
+        return self.pattern.sub(lambda match: values[match.group()], skeleton)
+
+    def render_user(self, skeleton, user, site, protocol, language, token=None):
+        if skeleton is False:
+            return self.render_template(site, protocol, language, user, urlsafe_base64_encode(force_bytes(user.pk)),
+                                        token or get_email_verification_token_generator().make_token(user))
+        return self.fill(skeleton, user, token)
+
+    def render(self, user, site, protocol='https', language=None):
+        language = language or translation.get_language()
+        return self.render_user(self.get_skeleton(site, protocol, language), user, site, protocol, language)
+
+    def render_many(self, users, site, protocol='https', language=None):
+        """yields (user, message) for every user, rendering the template once"""
+        language = language or translation.get_language()
+        skeleton = self.get_skeleton(site, protocol, language)
+        users = list(users)
+        for user, token in zip(users, get_email_verification_token_generator().make_tokens(users)):
+            yield user, self.render_user(skeleton, user, site, protocol, language, token)
+
+    def clear(self):
+        """forgets the compiled templates and, in every process, the rendered emails"""
+        self.templates.clear()
+        try:
+            self.cache.incr(self.version_key)
+        except ValueError:
+            self.cache.set(self.version_key, int(time.time() * 1000), None)
+
+verification_email_renderer = AccountEmailRenderer('email_confirmation.html')
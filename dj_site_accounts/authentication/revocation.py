@@ -0,0 +1,158 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.apps import apps
+from django.core.cache import caches
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..common.utils import get_settings_value
+
+
+class BloomFilter:
+    """A set of strings answering "maybe" or "no", error_rate of the "maybe" answers are wrong"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def get_positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self.get_positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.get_positions(value))
+
+
+class RevocationIndex:
+    """
+    Tells whether a JWT id was revoked without a query for the tokens which were not.
+
+    Every process keeps a Bloom filter of the revoked, unexpired JTIs, loaded from the
+    token_blacklist tables by the first is_revoked() call rather than at startup, so app
+    loading and migrate never query them, and rebuilt every REVOCATION_INDEX_REBUILD_INTERVAL
+    seconds, which drops the expired ones. Each revocation is kept in the
+    REVOCATION_INDEX_CACHE_ALIAS cache until the token expires and appended to a journal
+    the other processes replay into their filter on their next check, so that cache has
+    to be shared by all of them. A JTI passing the filter is confirmed from the cache,
+    then from the database, only the filter's false positives reach the database.
+    """
+    key_prefix = 'dj_site_accounts:revocations'
+
+    def __init__(self):
+        self.filter = None
+        self.sequence = 0
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[get_settings_value('REVOCATION_INDEX_CACHE_ALIAS', 'default')]
+
+    @property
+    def capacity(self):
+        return get_settings_value('REVOCATION_INDEX_CAPACITY', 100000)
+
+    @property
+    def error_rate(self):
+        return get_settings_value('REVOCATION_INDEX_ERROR_RATE', 0.001)
+
+    @property
+    def rebuild_interval(self):
+        return get_settings_value('REVOCATION_INDEX_REBUILD_INTERVAL', 3600)
+
+    @property
+    def journal_timeout(self):
+        return get_settings_value('REVOCATION_INDEX_JOURNAL_TIMEOUT', 3600)
+
+    def make_key(self, *parts):
+        return ':'.join((self.key_prefix,) + tuple(str(part) for part in parts))
+
+    def get_revoked(self):
+        """returns the JTIs of the blacklisted tokens which have not expired yet"""
+        blacklisted_token = apps.get_model('token_blacklist', 'BlacklistedToken')
+        return blacklisted_token.objects.filter(token__expires_at__gt=now()).values_list('token__jti', flat=True)
+
+    def rebuild(self):
+        # read before loading, the revocations committed meanwhile are then replayed by the next sync
+        sequence = self.cache.get(self.make_key('sequence'), 0)
+        revoked = self.get_revoked()
+        bloom = BloomFilter(max(self.capacity, revoked.count() * 2), self.error_rate)
+        for jti in revoked.iterator():
+            bloom.add(jti)
+        with self.lock:
+            self.filter, self.sequence, self.built_at = bloom, sequence, time.monotonic()
+
+    def sync(self):
+        """brings the filter up to date with the revocations of every process"""
+        if self.filter is None or time.monotonic() - self.built_at > self.rebuild_interval \
+                or self.filter.count > self.filter.capacity:
+            return self.rebuild()
+
+        sequence = self.cache.get(self.make_key('sequence'), 0)
+        if sequence == self.sequence:
+            return
+        keys = [self.make_key('journal', number) for number in range(self.sequence + 1, sequence + 1)]
+        entries = self.cache.get_many(keys) if 0 < len(keys) <= 1000 else {}
+        if len(entries) < len(keys) or sequence < self.sequence:
+            # the cache was cleared or the journal expired before this process replayed it
+            return self.rebuild()
+        with self.lock:
+            for jti in entries.values():
+                self.filter.add(jti)
+            self.sequence = max(self.sequence, sequence)
+
+    def revoke(self, jti, expires_at):
+        """records a revocation, call it once the blacklisted token is committed"""
+        timeout = int((expires_at - now()).total_seconds())
+        if timeout <= 0:
+            return
+        self.cache.set(self.make_key('jti', jti), True, timeout)
+        self.cache.add(self.make_key('sequence'), 0, None)
+        sequence = self.cache.incr(self.make_key('sequence'))
+        self.cache.set(self.make_key('journal', sequence), jti, self.journal_timeout)
+        if self.filter is not None:
+            with self.lock:
+                self.filter.add(jti)
+
+    def forget(self, jti):
+        """drops the cached revocation, the filter keeps answering "maybe" and the database decides"""
+        self.cache.delete(self.make_key('jti', jti))
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self.filter:
+            return False
+        if self.cache.get(self.make_key('jti', jti)):
+            return True
+        blacklisted_token = apps.get_model('token_blacklist', 'BlacklistedToken')
+        return blacklisted_token.objects.filter(token__jti=jti).exists()
+
+    def clear(self):
+        with self.lock:
+            self.filter, self.sequence, self.built_at = None, 0, 0
+
+
+revocation_index = RevocationIndex()
+
+
+class IndexedRefreshToken(RefreshToken):
+    """A refresh token checking the revocation index instead of querying the blacklist"""
+
+    def check_blacklist(self):
+        if revocation_index.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import update_last_login
+from rest_framework.exceptions import AuthenticationFailed, Throttled, ValidationError
+from rest_framework_simplejwt.serializers import TokenBlacklistSerializer, TokenObtainPairSerializer, \
+    TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from .revocation import IndexedRefreshToken, revocation_index
+from .throttling import LoginThrottled, login_throttle
+
+
+class ThrottledTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    SIMPLE_JWT['TOKEN_OBTAIN_SERIALIZER'] authenticating the USERNAME_FIELD value as an identifier
+    through MultipleAuthenticationBackend, which counts and resets the login failures like the
+    login form does; locked out identifiers and client ips get a 429 response
+    """
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        identifier = attrs[self.username_field]
+        try:
+            login_throttle.check(request, identifier)
+        except LoginThrottled as e:
+            raise Throttled(e.wait)
+
+        self.user = authenticate(request=request, identifier=identifier, password=attrs['password'])
+        if not api_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        refresh = self.get_token(self.user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+
+class IndexedTokenRefreshSerializer(TokenRefreshSerializer):
+    """SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'] checking revocations through the revocation index"""
+    token_class = IndexedRefreshToken
+
+
+class IndexedTokenBlacklistSerializer(TokenBlacklistSerializer):
+    """SIMPLE_JWT['TOKEN_BLACKLIST_SERIALIZER'] checking revocations through the revocation index"""
+    token_class = IndexedRefreshToken
+
+
+class IndexedTokenVerifySerializer(TokenVerifySerializer):
+    """SIMPLE_JWT['TOKEN_VERIFY_SERIALIZER'] checking revocations through the revocation index"""
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+        if api_settings.BLACKLIST_AFTER_ROTATION and apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+            if revocation_index.is_revoked(token.get(api_settings.JTI_CLAIM)):
+                raise ValidationError("Token is blacklisted")
+        return {}
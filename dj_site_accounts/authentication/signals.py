@@ -0,0 +1,115 @@
+from django.db import transaction
+
+from .caches import identifier_cache, verification_status_cache
+from .emails import smtp_connection_pools
+from .renderers import verification_email_renderer
+from .revocation import revocation_index
+from .tokens import jwt_token_service
+from ..common.settings import resolved_settings
+from .hashers import get_dummy_password_hash, get_password_hashing_pool
+
+
+def snapshot_identifiers_post_init_signal(sender, instance, **kwargs):
+    """Remembers the loaded identifiers of the user so changing them invalidates the old entries"""
+    if identifier_cache.enabled:
+        identifier_cache.snapshot(instance)
+
+
+def invalidate_identifiers_post_save_signal(sender, instance, update_fields=None, **kwargs):
+    """Drops the cached identifier lookups of the saved user"""
+    if not identifier_cache.enabled:
+        return
+
+    if update_fields and not set(update_fields) & set(identifier_cache.get_authentication_fields()):
+        return
+
+    identifier_cache.invalidate(instance)
+
+
+def invalidate_identifiers_post_delete_signal(sender, instance, **kwargs):
+    """Drops the cached identifier lookups of the deleted user"""
+    if identifier_cache.enabled:
+        identifier_cache.invalidate(instance)
+
+
+def clear_dummy_password_hash_setting_changed_signal(sender, setting, **kwargs):
+    """Recomputes the dummy password hash with the new hasher once PASSWORD_HASHERS changes"""
+    if setting == 'PASSWORD_HASHERS':
+        get_dummy_password_hash.cache_clear()
+
+
+def reset_password_hashing_pool_setting_changed_signal(sender, setting, **kwargs):
+    """Rebuilds the password hashing pool once one of its settings changes"""
+    if setting in ('PASSWORD_HASHING_POOL_SIZE', 'PASSWORD_HASHING_QUEUE_LIMIT', 'PASSWORD_HASHING_POOL_EXECUTOR'):
+        if get_password_hashing_pool.cache_info().currsize:
+            get_password_hashing_pool().shutdown()
+        get_password_hashing_pool.cache_clear()
+
+
+def clear_resolved_settings_setting_changed_signal(sender, setting, **kwargs):
+    """Forgets the resolved dotted path settings once any setting changes"""
+    resolved_settings.clear()
+
+
+def close_smtp_connection_pools_setting_changed_signal(sender, setting, **kwargs):
+    """Closes the pooled SMTP connections once the pool or email server settings change"""
+    if setting.startswith('EMAIL_'):
+        smtp_connection_pools.close()
+
+
+def clear_email_renderers_post_save_signal(sender, instance, **kwargs):
+    """Forgets the rendered account emails once a site or its profile changes"""
+    verification_email_renderer.clear()
+
+
+def clear_email_renderers_setting_changed_signal(sender, setting, **kwargs):
+    """Forgets the compiled and rendered account emails once any setting changes"""
+    verification_email_renderer.clear()
+
+
+def clear_jwt_signing_key_setting_changed_signal(sender, setting, **kwargs):
+    """Reloads the JWT signing key once the simplejwt settings or the key file change"""
+    if setting in ('SIMPLE_JWT', 'JWT_SIGNING_KEY_FILE'):
+        jwt_token_service.clear()
+
+
+def record_revocation_post_save_signal(sender, instance, created, **kwargs):
+    """Adds the blacklisted token to the revocation index once the blacklisting is committed"""
+    if created:
+        jti, expires_at = instance.token.jti, instance.token.expires_at
+        transaction.on_commit(lambda: revocation_index.revoke(jti, expires_at))
+
+
+def forget_revocation_post_delete_signal(sender, instance, **kwargs):
+    """Drops the cached revocation of a token taken off the blacklist"""
+    revocation_index.forget(instance.token.jti)
+
+
+def clear_revocation_index_setting_changed_signal(sender, setting, **kwargs):
+    """Rebuilds the revocation index once one of its settings changes"""
+    if setting.startswith('REVOCATION_INDEX_'):
+        revocation_index.clear()
+
+
+def invalidate_verification_status_post_save_signal(sender, instance, update_fields=None, **kwargs):
+    """Drops the cached verification status of the saved user"""
+    if update_fields and not set(update_fields) & set(verification_status_cache.verified_at_fields):
+        return
+    verification_status_cache.invalidate(instance.pk)
+
+
+def invalidate_verification_status_post_delete_signal(sender, instance, **kwargs):
+    """Drops the cached verification status of the deleted user"""
+    verification_status_cache.invalidate(instance.pk)
+
+
+def invalidate_phone_verification_status_post_save_signal(sender, instance, update_fields=None, **kwargs):
+    """Drops the cached verification status of the owner of the saved phone"""
+    if update_fields and 'phone_verified_at' not in update_fields:
+        return
+    verification_status_cache.invalidate(instance.user_id)
+
+
+def invalidate_phone_verification_status_post_delete_signal(sender, instance, **kwargs):
+    """Drops the cached verification status of the owner of the deleted phone"""
+    verification_status_cache.invalidate(instance.user_id)
@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import gettext as _
+
+from .models import OutgoingSMS
+from .outbox import BaseOutboxSender
+from .verify_phone import BaseVerifyPhoneService
+from ..common.settings import resolved_settings
+from ..common.utils import get_settings_value
+
+# the messages sent through LocMemSMSProvider, like django.core.mail.outbox
+outbox = []
+
+
+class BaseSMSProvider:
+    """
+    Sends text messages through an SMS gateway.
+
+    max_concurrency limits the requests one worker makes to the provider at the same time,
+    providers accepting several messages per request set batch_size and implement send_batch().
+    """
+    max_concurrency = 1
+    batch_size = 1
+
+    @property
+    def name(self):
+        return '{}.{}'.format(self.__class__.__module__, self.__class__.__name__)
+
+    def send(self, phone, message):
+        raise NotImplementedError('subclasses of BaseSMSProvider must provide a send() method')
+
+    def send_batch(self, messages):
+        """sends [(phone, message)] and returns the error of every message, None for the sent ones"""
+        raise NotImplementedError('subclasses of BaseSMSProvider with a batch_size must provide a send_batch() method')
+
+
+class LocMemSMSProvider(BaseSMSProvider):
+    """Keeps the messages in dj_site_accounts.authentication.sms.outbox, for tests and development"""
+    batch_size = 100
+
+    def send(self, phone, message):
+        outbox.append((phone, message))
+
+    def send_batch(self, messages):
+        outbox.extend(messages)
+        return [None] * len(messages)
+
+
+def enqueue_sms(phone, message):
+    return OutgoingSMS.objects.create(phone=str(phone), message=message)
+
+
+class QueuedVerifyPhoneService(BaseVerifyPhoneService):
+    """Generates the code within the request and queues the message for the send_queued_sms worker"""
+
+    def get_message(self, code):
+        return get_settings_value('PHONE_VERIFICATION_MESSAGE', _("Your verification code is {code}")).format(code=code)
+
+    def send(self):
+        return enqueue_sms(self.phone, self.get_message(self.otp.get()))
+
+    def check(self, code):
+        return self.otp.authenticate(code)
+
+
+class SMSSender(BaseOutboxSender):
+    """
+    Sends the queued text messages through the SMS_PROVIDERS.
+
+    Messages a provider fails to send fail over to the next provider, the ones no provider
+    could send are retried as set by the SMS_QUEUE_* settings, see BaseOutboxSender. The
+    message holds the verification code, it is cleared once sent or dead-lettered.
+    """
+    model = OutgoingSMS
+    settings_prefix = 'SMS_QUEUE'
+    default_retry_delay = 30
+    secret_fields = ('message',)
+
+    def __init__(self, providers=None, batch_size=None, max_attempts=None, retry_delay=None, lease=None):
+        self.providers = providers if providers is not None else \
+            [provider() for provider in resolved_settings.get_sms_providers()]
+        if not self.providers:
+            raise ImproperlyConfigured("SMS_PROVIDERS must list at least one SMS provider")
+        super(SMSSender, self).__init__(batch_size=batch_size, max_attempts=max_attempts,
+                                        retry_delay=retry_delay, lease=lease)
+
+    def send_chunk(self, provider, chunk):
+        """returns the error of every message of the chunk, None for the sent ones"""
+        if provider.batch_size > 1:
+            try:
+                return provider.send_batch([(sms.phone, sms.message) for sms in chunk])
+            except Exception as e:
+                return [e] * len(chunk)
+
+        errors = []
+        for sms in chunk:
+            try:
+                provider.send(sms.phone, sms.message)
+            except Exception as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        return errors
+
+    def dispatch(self, provider, messages):
+        """sends the messages through the provider, at most max_concurrency chunks at a time"""
+        size = max(provider.batch_size, 1)
+        chunks = [messages[i:i + size] for i in range(0, len(messages), size)]
+        with ThreadPoolExecutor(max_workers=max(provider.max_concurrency, 1)) as executor:
+            results = executor.map(self.send_chunk, repeat(provider), chunks)
+            return [error for errors in results for error in errors]
+
+    def send_batch(self, messages):
+        """sends the messages failing over across the providers, returns (sent, failed)"""
+        pending, errors, sent = messages, {}, {}
+        for provider in self.providers:
+            if not pending:
+                break
+            remaining = []
+            for sms, error in zip(pending, self.dispatch(provider, pending)):
+                if error is None:
+                    sent.setdefault(provider.name, []).append(sms.pk)
+                else:
+                    errors[sms.pk] = '{}: {}'.format(provider.name, error)
+                    remaining.append(sms)
+            pending = remaining
+
+        for sms in pending:
+            self.fail(sms, errors[sms.pk])
+        for name, pks in sent.items():
+            self.mark_sent(pks, provider=name)
+        return len(messages) - len(pending), len(pending)
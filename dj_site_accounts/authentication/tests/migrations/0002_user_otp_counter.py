@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-17 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='otp_counter',
+            field=models.IntegerField(default=0),
+        ),
+    ]
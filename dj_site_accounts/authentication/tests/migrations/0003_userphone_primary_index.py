@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0002_user_otp_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userphone',
+            index=models.Index(fields=['user', 'is_primary'], name='tests_userphone_primary'),
+        ),
+    ]
@@ -1,4 +1,7 @@
+import smtplib
+
 from ..verify_phone import BaseVerifyPhoneService
+from ..sms import BaseSMSProvider, LocMemSMSProvider
 
 
 class MockVerifyService(BaseVerifyPhoneService):
@@ -11,3 +14,47 @@ class MockVerifyService(BaseVerifyPhoneService):
 
 def register_callback(user):
     pass
+
+
+class FailingSMSProvider(BaseSMSProvider):
+    def send(self, phone, message):
+        raise ConnectionError('gateway unavailable')
+
+
+class RecordingSMSProvider(LocMemSMSProvider):
+    max_concurrency = 2
+    batch_size = 2
+
+    def __init__(self):
+        self.batches = []
+
+    def send_batch(self, messages):
+        self.batches.append(messages)
+        return super(RecordingSMSProvider, self).send_batch(messages)
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP, recording the connections opened and the messages sent"""
+    connections = []
+
+    def __init__(self, host, port, **kwargs):
+        self.sock = object()
+        self.messages = []
+        self.noop_code = 250
+        self.disconnect = False
+        FakeSMTP.connections.append(self)
+
+    def sendmail(self, from_email, recipients, message):
+        if self.disconnect:
+            self.sock = None
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.messages.append(message)
+
+    def noop(self):
+        return self.noop_code, b'OK'
+
+    def quit(self):
+        self.sock = None
+
+    def close(self):
+        self.sock = None
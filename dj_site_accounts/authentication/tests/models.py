@@ -6,7 +6,7 @@ from django.db import models
 from django.db.models.signals import post_save, pre_save
 from django.utils.translation import gettext_lazy as _
 
-from dj_site_accounts.authentication.models import HasOTPVerification, HasPhone
+from dj_site_accounts.authentication.models import AbstractUserPhone, HasOTPVerification
 from dj_site_accounts.sites_profiles.signals import create_key_pre_save_signal
 
 
@@ -57,6 +57,7 @@ class User(AbstractUser, HasOTPVerification):
     email = models.EmailField(validators=[email_validator],
                               unique=True, blank=False, null=False)
     email_verified_at = models.DateField(blank=True, null=True)
+    otp_counter = models.IntegerField(default=0)
 
     username = models.CharField(max_length=150,
 
@@ -144,8 +145,6 @@ class NoAuthenticationFieldsUser(models.Model):
         self.email = self.email.lower()
 
 
-class UserPhone(HasPhone):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    is_primary = models.BooleanField(default=False)
-    under_verification = models.BooleanField(default=False)
+class UserPhone(AbstractUserPhone):
+    pass
 
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from .factories import UserFactory
+from ..backends import MultipleAuthenticationBackend
+from ..hashers import PasswordHashingPool, PasswordHashingPoolFull
+
+UserModel = get_user_model()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class MultipleAuthenticationBackendTestCase(TestCase):
+    def setUp(self):
+        self.backend = MultipleAuthenticationBackend()
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+
+    def test_it_authenticates_email_shaped_usernames(self):
+        user = UserFactory(username='bob@corp.example', email='bob@example.com')
+        self.assertEquals(self.backend.authenticate(None, identifier='bob@corp.example', password='secret'), user)
+
+    def test_it_authenticates_user_by_identifier(self):
+        for identifier in ['john@example.com', 'john.doe', '+201001234567', str(self.user.pk)]:
+            self.assertEquals(self.backend.authenticate(None, identifier=identifier, password='secret'), self.user)
+
+    def test_it_returns_none_for_wrong_password(self):
+        self.assertIsNone(self.backend.authenticate(None, identifier='john.doe', password='wrong'))
+
+    def test_it_returns_none_for_unknown_identifier(self):
+        self.assertIsNone(self.backend.authenticate(None, identifier='jane.doe', password='secret'))
+
+    def test_it_returns_none_for_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.authenticate(None, identifier='john.doe', password='secret'))
+
+    def test_it_returns_none_if_identifier_or_password_is_missing(self):
+        self.assertIsNone(self.backend.authenticate(None, identifier='john.doe'))
+        self.assertIsNone(self.backend.authenticate(None, password='secret'))
+
+    def test_it_resolves_the_user_with_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.backend.authenticate(None, identifier='john@example.com', password='secret')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class MultipleAuthenticationBackendAsyncTestCase(TestCase):
+    def setUp(self):
+        self.backend = MultipleAuthenticationBackend()
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+
+    def authenticate(self, **credentials):
+        return async_to_sync(self.backend.aauthenticate)(None, **credentials)
+
+    def test_it_authenticates_user_by_identifier(self):
+        self.assertEquals(self.authenticate(identifier='john@example.com', password='secret'), self.user)
+
+    def test_it_returns_none_for_wrong_password(self):
+        self.assertIsNone(self.authenticate(identifier='john.doe', password='wrong'))
+
+    def test_it_returns_none_for_unknown_identifier(self):
+        self.assertIsNone(self.authenticate(identifier='jane.doe', password='secret'))
+
+    def test_it_upgrades_outdated_password_hashes(self):
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.SHA1PasswordHasher',
+                                                 'django.contrib.auth.hashers.MD5PasswordHasher']):
+            self.authenticate(identifier='john.doe', password='secret')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('sha1$'))
+
+    def test_it_sheds_load_when_the_hashing_pool_is_full(self):
+        pool = PasswordHashingPool(max_workers=1, queue_limit=0)
+        pool.acquire()
+        with mock.patch('dj_site_accounts.authentication.backends.get_password_hashing_pool', return_value=pool):
+            with self.assertRaises(PasswordHashingPoolFull):
+                self.authenticate(identifier='john.doe', password='secret')
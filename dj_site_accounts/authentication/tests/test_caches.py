@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .factories import UserFactory
+from ..caches import identifier_cache
+from ..forms import RegisterForm
+from ..identifiers import IdentifierResolver
+
+UserModel = get_user_model()
+
+
+@override_settings(IDENTIFIER_CACHE_ENABLED=True)
+class IdentifierCacheResolveTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resolver = IdentifierResolver(UserModel)
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+
+    def test_it_serves_known_identifiers_by_primary_key(self):
+        self.resolver.resolve('john@example.com')
+        self.assertEquals(identifier_cache.get('email', 'john@example.com'), self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEquals(self.resolver.resolve('john@example.com'), self.user)
+
+    def test_it_caches_unknown_identifiers(self):
+        self.assertIsNone(self.resolver.resolve('jane@example.com'))
+        self.assertIs(identifier_cache.get('email', 'jane@example.com'), False)
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.resolver.resolve('jane@example.com'))
+
+    def test_it_normalizes_phone_identifiers(self):
+        self.resolver.resolve('+201001234567')
+        self.assertEquals(identifier_cache.get('phone', '+20 100 123 4567'), self.user.pk)
+
+    def test_it_invalidates_negative_entries_when_a_user_is_created(self):
+        self.resolver.resolve('jane@example.com')
+        jane = UserFactory(username='jane.doe', email='jane@example.com', phone='+201001234568')
+        self.assertIsNone(identifier_cache.get('email', 'jane@example.com'))
+        self.assertEquals(self.resolver.resolve('jane@example.com'), jane)
+
+    def test_it_invalidates_old_and_new_values_when_an_identifier_changes(self):
+        self.resolver.resolve('john@example.com')
+        self.resolver.resolve('johnny@example.com')
+        user = UserModel.objects.get(pk=self.user.pk)
+        user.email = 'johnny@example.com'
+        user.save()
+        self.assertIsNone(identifier_cache.get('email', 'john@example.com'))
+        self.assertIsNone(identifier_cache.get('email', 'johnny@example.com'))
+        self.assertEquals(self.resolver.resolve('johnny@example.com'), user)
+
+    def test_it_keeps_entries_when_saved_fields_are_not_identifiers(self):
+        self.resolver.resolve('john@example.com')
+        self.user.save(update_fields=['first_name'])
+        self.assertEquals(identifier_cache.get('email', 'john@example.com'), self.user.pk)
+
+    def test_it_invalidates_entries_when_a_user_is_deleted(self):
+        self.resolver.resolve('john@example.com')
+        self.user.delete()
+        self.assertIsNone(identifier_cache.get('email', 'john@example.com'))
+        self.assertIsNone(self.resolver.resolve('john@example.com'))
+
+
+class IdentifierCacheExistsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+
+    def test_it_queries_the_database_when_disabled(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(identifier_cache.exists('email', 'john@example.com'))
+        self.assertIsNone(identifier_cache.get('email', 'john@example.com'))
+
+    @override_settings(IDENTIFIER_CACHE_ENABLED=True)
+    def test_it_caches_existence_checks_when_enabled(self):
+        self.assertTrue(identifier_cache.exists('email', 'john@example.com'))
+        self.assertFalse(identifier_cache.exists('phone', '+201001234568'))
+        with self.assertNumQueries(0):
+            self.assertTrue(identifier_cache.exists('email', 'john@example.com'))
+            self.assertFalse(identifier_cache.exists('phone', '+201001234568'))
+
+    @override_settings(IDENTIFIER_CACHE_ENABLED=True)
+    def test_register_form_rejects_cached_email_and_phone(self):
+        identifier_cache.exists('email', 'john@example.com')
+        identifier_cache.exists('phone', '+201001234567')
+        form = RegisterForm(data={'email': 'john@example.com', 'phone': '+201001234567'})
+        form.is_valid()
+        self.assertIn('email', form.errors)
+        self.assertIn('phone', form.errors)
@@ -0,0 +1,168 @@
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.timezone import now
+
+from .factories import UserFactory
+from .mocks import FakeSMTP
+from ..emails import (OutboxEmailDelivery, OutboxSender, SMTPConnectionPool, SMTPConnectionPoolTimeout,
+                      SynchronousEmailDelivery, get_email_delivery, smtp_connection_pools)
+from ..mixins import SendEmailVerificationMixin
+from ..models import OutgoingEmail
+
+
+class EmailDeliveryTestCase(TestCase):
+    def test_it_sends_within_the_request_by_default(self):
+        self.assertIsInstance(get_email_delivery(), SynchronousEmailDelivery)
+        get_email_delivery().deliver('Subject', 'body', ['john@example.com'], html_body='<p>body</p>')
+        self.assertEquals(len(mail.outbox), 1)
+        self.assertEquals(mail.outbox[0].alternatives, [('<p>body</p>', 'text/html')])
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    @override_settings(EMAIL_DELIVERY='dj_site_accounts.authentication.emails.OutboxEmailDelivery')
+    def test_outbox_delivery_queues_the_email_without_sending_it(self):
+        self.assertIsInstance(get_email_delivery(), OutboxEmailDelivery)
+        get_email_delivery().deliver('Subject', 'body', ['john@example.com'])
+        self.assertEquals(len(mail.outbox), 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEquals(email.to, ['john@example.com'])
+        self.assertEquals(email.status, OutgoingEmail.STATUS_PENDING)
+
+
+class SendEmailVerificationMixinTestCase(TestCase):
+    def test_delivery_failures_are_logged(self):
+        user = UserFactory()
+        with patch('dj_site_accounts.authentication.mixins.get_email_delivery', side_effect=ConnectionError('down')):
+            with self.assertLogs('dj_site_accounts.authentication.mixins', 'ERROR') as logs:
+                SendEmailVerificationMixin().send_email_verification(RequestFactory().get('/'), user)
+        self.assertIn('user {}'.format(user.pk), logs.output[0])
+
+
+class OutboxSenderTestCase(TestCase):
+    def queue(self, count=1):
+        delivery = OutboxEmailDelivery()
+        return [delivery.deliver('Subject {}'.format(i), 'body', ['user{}@example.com'.format(i)])
+                for i in range(count)]
+
+    def test_it_sends_pending_emails_in_batches_over_one_connection(self):
+        self.queue(5)
+        with patch.object(EmailBackend, 'open', autospec=True, side_effect=EmailBackend.open) as open_connection:
+            sent, failed = OutboxSender(batch_size=2).send()
+
+        self.assertEquals((sent, failed), (5, 0))
+        self.assertEquals(open_connection.call_count, 3)
+        self.assertEquals(len(mail.outbox), 5)
+        self.assertEquals(OutgoingEmail.objects.filter(status=OutgoingEmail.STATUS_SENT, attempts=1).count(), 5)
+
+    def test_it_does_not_send_emails_before_their_next_attempt(self):
+        email, = self.queue()
+        OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=now() + timedelta(minutes=1))
+        self.assertEquals(OutboxSender().send(), (0, 0))
+        self.assertEquals(len(mail.outbox), 0)
+
+    def test_it_retries_failed_emails_with_backoff(self):
+        email, = self.queue()
+        sender = OutboxSender(retry_delay=10, max_attempts=3)
+        with patch.object(EmailBackend, 'send_messages', side_effect=ConnectionError('refused')):
+            self.assertEquals(sender.send(), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEquals(email.status, OutgoingEmail.STATUS_PENDING)
+        self.assertEquals(email.attempts, 1)
+        self.assertEquals(email.last_error, 'refused')
+        self.assertGreater(email.next_attempt_at, now() + timedelta(seconds=5))
+        self.assertEquals(sender.get_retry_delay(2), timedelta(seconds=20))
+
+    def test_it_marks_the_email_as_failed_after_the_last_attempt(self):
+        email, = self.queue()
+        OutgoingEmail.objects.filter(pk=email.pk).update(attempts=2)
+        with patch.object(EmailBackend, 'send_messages', side_effect=ConnectionError('refused')):
+            OutboxSender(max_attempts=3).send()
+
+        email.refresh_from_db()
+        self.assertEquals(email.status, OutgoingEmail.STATUS_FAILED)
+        self.assertEquals(email.attempts, 3)
+
+    def test_it_fails_the_whole_batch_when_the_connection_cannot_be_opened(self):
+        self.queue(2)
+        with patch.object(EmailBackend, 'open', side_effect=ConnectionError('refused')):
+            self.assertEquals(OutboxSender().send(), (0, 2))
+        self.assertEquals(OutgoingEmail.objects.filter(attempts=1, status=OutgoingEmail.STATUS_PENDING).count(), 2)
+
+    def test_send_queued_emails_command(self):
+        self.queue(2)
+        stdout = StringIO()
+        call_command('send_queued_emails', stdout=stdout)
+        self.assertIn("Sent 2 emails, 0 failed", stdout.getvalue())
+        self.assertEquals(len(mail.outbox), 2)
+
+
+@override_settings(EMAIL_DELIVERY_BACKEND='dj_site_accounts.authentication.emails.PooledSMTPEmailBackend')
+@patch('smtplib.SMTP', FakeSMTP)
+class PooledSMTPEmailBackendTestCase(TestCase):
+    def setUp(self):
+        FakeSMTP.connections = []
+        self.addCleanup(smtp_connection_pools.close)
+
+    def deliver(self, count=1):
+        for i in range(count):
+            SynchronousEmailDelivery().deliver('Subject', 'body', ['user{}@example.com'.format(i)])
+
+    def test_it_reuses_the_connection_across_deliveries(self):
+        self.deliver(3)
+        self.assertEquals(len(FakeSMTP.connections), 1)
+        self.assertEquals(len(FakeSMTP.connections[0].messages), 3)
+
+    @override_settings(EMAIL_POOL_MAX_MESSAGES=2)
+    def test_it_recycles_connections_after_max_messages(self):
+        self.deliver(3)
+        self.assertEquals([len(connection.messages) for connection in FakeSMTP.connections], [2, 1])
+        self.assertIsNone(FakeSMTP.connections[0].sock)
+
+    def test_it_replaces_connections_failing_the_health_check(self):
+        self.deliver()
+        pool, = smtp_connection_pools.pools.values()
+        pool.idle[0].last_used_at -= pool.health_check_interval + 1
+        FakeSMTP.connections[0].noop_code = 421
+        self.deliver()
+        self.assertEquals(len(FakeSMTP.connections), 2)
+
+    def test_it_drops_idle_connections_after_the_idle_timeout(self):
+        self.deliver()
+        pool, = smtp_connection_pools.pools.values()
+        pool.idle[0].last_used_at -= pool.idle_timeout + 1
+        self.deliver()
+        self.assertEquals(len(FakeSMTP.connections), 2)
+
+    def test_it_drops_disconnected_connections(self):
+        self.deliver()
+        FakeSMTP.connections[0].disconnect = True
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            self.deliver()
+        pool, = smtp_connection_pools.pools.values()
+        self.assertEquals(pool.idle, [])
+        self.deliver()
+        self.assertEquals(len(FakeSMTP.connections), 2)
+
+    def test_outbox_sender_uses_the_delivery_backend(self):
+        delivery = OutboxEmailDelivery()
+        for i in range(3):
+            delivery.deliver('Subject', 'body', ['user{}@example.com'.format(i)])
+        self.assertEquals(OutboxSender().send(), (3, 0))
+        self.assertEquals(len(FakeSMTP.connections), 1)
+
+
+class SMTPConnectionPoolTestCase(TestCase):
+    def test_it_bounds_the_open_connections(self):
+        pool = SMTPConnectionPool(size=1, timeout=0.01)
+        self.assertIsNone(pool.acquire())
+        with self.assertRaises(SMTPConnectionPoolTimeout):
+            pool.acquire()
+        pool.release()
+        self.assertIsNone(pool.acquire())
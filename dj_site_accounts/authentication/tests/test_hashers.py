@@ -0,0 +1,180 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.db.models.signals import pre_save
+from django.test import TestCase, override_settings
+
+from .factories import UserFactory
+from ..backends import MultipleAuthenticationBackend
+from ..hashers import (PasswordHashingPool, PasswordHashingPoolFull, PasswordRehasher, check_dummy_password,
+                       get_dummy_password_hash, get_password_hashing_pool)
+
+
+class DummyPasswordHashTestCase(TestCase):
+    def test_it_is_computed_once(self):
+        self.assertEquals(get_dummy_password_hash(), get_dummy_password_hash())
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_it_uses_the_configured_hasher(self):
+        self.assertEquals(identify_hasher(get_dummy_password_hash()).algorithm, 'md5')
+
+    def test_check_dummy_password_never_succeeds(self):
+        self.assertFalse(check_dummy_password('secret'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class MultipleAuthenticationBackendTimingTestCase(TestCase):
+    def setUp(self):
+        self.backend = MultipleAuthenticationBackend()
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+
+    def test_it_checks_the_dummy_hash_for_unknown_identifiers(self):
+        with mock.patch('dj_site_accounts.authentication.backends.check_dummy_password') as check:
+            self.backend.authenticate(None, identifier='jane.doe', password='secret')
+        check.assert_called_once_with('secret')
+
+    def test_it_checks_the_dummy_hash_for_unusable_passwords(self):
+        self.user.set_unusable_password()
+        self.user.save()
+        with mock.patch('dj_site_accounts.authentication.backends.check_dummy_password') as check:
+            self.assertIsNone(self.backend.authenticate(None, identifier='john.doe', password='secret'))
+        check.assert_called_once_with('secret')
+
+    def test_it_does_not_check_the_dummy_hash_for_known_identifiers(self):
+        with mock.patch('dj_site_accounts.authentication.backends.check_dummy_password') as check:
+            self.backend.authenticate(None, identifier='john.doe', password='wrong')
+        check.assert_not_called()
+
+    @override_settings(AUTHENTICATION_TIMING_EQUALIZATION='set_password')
+    def test_it_can_hash_the_password_from_scratch(self):
+        with mock.patch('dj_site_accounts.authentication.backends.check_dummy_password') as check:
+            self.backend.authenticate(None, identifier='jane.doe', password='secret')
+        check.assert_not_called()
+
+
+class PasswordHashingPoolTestCase(TestCase):
+    def test_it_runs_functions_on_the_executor(self):
+        pool = PasswordHashingPool(max_workers=2, queue_limit=0)
+        self.assertEquals(async_to_sync(pool.run)(pow, 2, 10), 1024)
+        self.assertEquals(pool.pending, 0)
+
+    def test_it_rejects_hashes_beyond_the_queue_limit(self):
+        pool = PasswordHashingPool(max_workers=1, queue_limit=1)
+        pool.acquire()
+        pool.acquire()
+        with self.assertRaises(PasswordHashingPoolFull):
+            async_to_sync(pool.run)(pow, 2, 10)
+        pool.release()
+        self.assertEquals(async_to_sync(pool.run)(pow, 2, 10), 1024)
+
+    def test_it_submits_hashes_for_sync_callers(self):
+        pool = PasswordHashingPool(max_workers=1, queue_limit=0)
+        self.assertEquals(pool.submit(pow, 2, 10).result(), 1024)
+        pool.executor.shutdown(wait=True)
+        self.assertEquals(pool.pending, 0)
+
+    @override_settings(PASSWORD_HASHING_POOL_SIZE=3, PASSWORD_HASHING_QUEUE_LIMIT=5)
+    def test_it_reads_its_limits_from_settings(self):
+        pool = get_password_hashing_pool()
+        self.assertEquals((pool.max_workers, pool.queue_limit), (3, 5))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.SHA1PasswordHasher',
+                                     'django.contrib.auth.hashers.MD5PasswordHasher'])
+class PasswordRehasherTestCase(TestCase):
+    def setUp(self):
+        self.rehasher = PasswordRehasher()
+        self.user = self.create_user_with_outdated_hash(username='john.doe', email='john@example.com',
+                                                        phone='+201001234567')
+        self.outdated = self.user.password
+
+    def create_user_with_outdated_hash(self, **kwargs):
+        user = UserFactory(**kwargs)
+        get_user_model().objects.filter(pk=user.pk).update(password=make_password('secret', hasher='md5'))
+        user.refresh_from_db()
+        return user
+
+    def test_it_detects_outdated_hashes(self):
+        self.assertTrue(self.rehasher.needs_rehash(self.user))
+        self.user.set_password('secret')
+        self.assertFalse(self.rehasher.needs_rehash(self.user))
+
+    def test_it_writes_only_the_password_column_without_signals(self):
+        receiver = mock.Mock()
+        pre_save.connect(receiver, sender=get_user_model())
+        try:
+            with self.assertNumQueries(1):
+                self.rehasher.rehash(self.user, 'secret')
+        finally:
+            pre_save.disconnect(receiver, sender=get_user_model())
+        receiver.assert_not_called()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('sha1$'))
+
+    def test_it_does_not_overwrite_a_changed_password(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(password='changed')
+        self.rehasher.rehash(self.user, 'secret')
+        self.user.refresh_from_db()
+        self.assertEquals(self.user.password, 'changed')
+
+    @override_settings(PASSWORD_REHASH_MODE='disabled')
+    def test_it_can_be_disabled(self):
+        self.rehasher.rehash(self.user, 'secret')
+        self.user.refresh_from_db()
+        self.assertEquals(self.user.password, self.outdated)
+
+    @override_settings(PASSWORD_REHASH_MODE='deferred')
+    def test_it_defers_and_batches_writes(self):
+        other = self.create_user_with_outdated_hash(username='jane.doe', email='jane@example.com',
+                                                    phone='+201001234568')
+        with mock.patch.object(self.rehasher, 'start') as start:
+            with self.assertNumQueries(0):
+                self.rehasher.rehash(self.user, 'secret')
+                self.rehasher.rehash(other, 'secret')
+        start.assert_called()
+        with self.assertNumQueries(1):
+            self.assertEquals(self.rehasher.flush(), 2)
+        for user in (self.user, other):
+            user.refresh_from_db()
+            self.assertTrue(check_password('secret', user.password))
+            self.assertTrue(user.password.startswith('sha1$'))
+
+    @override_settings(PASSWORD_REHASH_MODE='deferred')
+    def test_it_queues_hashes_instead_of_passwords(self):
+        with mock.patch.object(self.rehasher, 'start'):
+            self.rehasher.rehash(self.user, 'secret')
+        pk, outdated, future = self.rehasher.queue.get_nowait()
+        self.assertEquals((pk, outdated), (self.user.pk, self.outdated))
+        self.assertTrue(check_password('secret', future.result()))
+
+    @override_settings(PASSWORD_REHASH_MODE='deferred', PASSWORD_REHASH_QUEUE_LIMIT=1)
+    def test_it_skips_rehashes_beyond_the_queue_limit(self):
+        other = self.create_user_with_outdated_hash(username='jane.doe', email='jane@example.com',
+                                                    phone='+201001234568')
+        with mock.patch.object(self.rehasher, 'start'):
+            self.rehasher.rehash(self.user, 'secret')
+            self.rehasher.rehash(other, 'secret')
+        self.assertEquals(self.rehasher.queue.qsize(), 1)
+
+    @override_settings(PASSWORD_REHASH_MODE='deferred')
+    def test_it_skips_rehashes_when_the_hashing_pool_is_full(self):
+        pool = mock.Mock(submit=mock.Mock(side_effect=PasswordHashingPoolFull))
+        with mock.patch('dj_site_accounts.authentication.hashers.get_password_hashing_pool', return_value=pool):
+            self.rehasher.rehash(self.user, 'secret')
+        self.assertTrue(self.rehasher.queue.empty())
+
+    @override_settings(PASSWORD_REHASH_MODE='deferred')
+    def test_it_flushes_at_exit(self):
+        with mock.patch('dj_site_accounts.authentication.writers.atexit.register') as register, \
+                mock.patch('dj_site_accounts.authentication.writers.threading.Thread'):
+            self.rehasher.rehash(self.user, 'secret')
+            self.rehasher.rehash(self.user, 'secret')
+        register.assert_called_once_with(self.rehasher.flush)
+        self.assertEquals(self.rehasher.flush(), 1)
+
+    def test_backend_rehashes_outdated_passwords_at_login(self):
+        MultipleAuthenticationBackend().authenticate(None, identifier='john.doe', password='secret')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('sha1$'))
@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.validators import RegexValidator
+from django.test import TestCase
+
+from .factories import UserFactory
+from ..identifiers import IdentifierResolver
+
+UserModel = get_user_model()
+
+
+class IdentifierResolverClassifyTestCase(TestCase):
+    def setUp(self):
+        self.resolver = IdentifierResolver(UserModel)
+
+    def restrict_usernames(self):
+        field = UserModel._meta.get_field('username')
+        return mock.patch.object(field, 'validators', [RegexValidator(r'^[\w.-]+\Z')])
+
+    def test_it_classifies_email_shaped_identifier_as_email(self):
+        self.assertEquals(self.resolver.classify('user@example.com'), ['email'])
+
+    def test_it_classifies_e164_identifier_as_phone(self):
+        self.assertEquals(self.resolver.classify('+201001234567'), ['phone'])
+
+    def test_email_shaped_identifier_falls_back_to_usernames_accepting_it(self):
+        self.assertEquals(self.resolver.get_fallback_fields('user@example.com'), ['username'])
+        with self.restrict_usernames():
+            self.assertEquals(self.resolver.get_fallback_fields('user@example.com'), [])
+
+    def test_e164_identifier_falls_back_to_usernames_accepting_it(self):
+        self.assertEquals(self.resolver.get_fallback_fields('+201001234567'), ['username'])
+        with self.restrict_usernames():
+            self.assertEquals(self.resolver.get_fallback_fields('+201001234567'), [])
+
+    def test_other_identifiers_have_no_fallback(self):
+        self.assertEquals(self.resolver.get_fallback_fields('john.doe'), [])
+        self.assertEquals(self.resolver.get_fallback_fields('12345'), [])
+
+    def test_it_ignores_separators_when_classifying_phone(self):
+        self.assertEquals(self.resolver.classify('+20 100 123-4567'), ['phone'])
+
+    def test_it_classifies_other_identifiers_as_username(self):
+        self.assertEquals(self.resolver.classify('john.doe'), ['username'])
+
+    def test_it_treats_bare_numbers_as_ambiguous(self):
+        self.assertEquals(self.resolver.classify('12345'), ['id', 'phone', 'username'])
+
+
+class IdentifierResolverResolveTestCase(TestCase):
+    def setUp(self):
+        self.resolver = IdentifierResolver(UserModel)
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+
+    def test_it_resolves_user_by_each_authentication_field(self):
+        for identifier in ['john@example.com', 'john.doe', '+201001234567', str(self.user.pk)]:
+            self.assertEquals(self.resolver.resolve(identifier), self.user)
+
+    def test_it_issues_a_single_query_for_unambiguous_identifiers(self):
+        for identifier in ['john@example.com', 'john.doe', '+201001234567']:
+            with self.assertNumQueries(1):
+                self.resolver.resolve(identifier)
+
+    def test_it_looks_up_email_and_phone_identifiers_on_their_field_alone(self):
+        for identifier, field in [('john@example.com', 'email'), ('+201001234567', 'phone')]:
+            with self.assertNumQueries(1) as queries:
+                self.assertEquals(self.resolver.resolve(identifier), self.user)
+            self.assertNotIn('OR', queries.captured_queries[0]['sql'])
+            self.assertIn('"{}" ='.format(field), queries.captured_queries[0]['sql'])
+
+    def test_it_resolves_email_shaped_usernames_with_a_second_query(self):
+        user = UserFactory(username='bob@corp.example', email='bob@example.com')
+        with self.assertNumQueries(2):
+            self.assertEquals(self.resolver.resolve('bob@corp.example'), user)
+
+    def test_email_addresses_win_over_email_shaped_usernames(self):
+        UserFactory(username='john@example.com', email='other@example.com')
+        with self.assertNumQueries(1):
+            self.assertEquals(self.resolver.resolve('john@example.com'), self.user)
+
+    def test_it_issues_a_single_query_for_ambiguous_identifiers(self):
+        with self.assertNumQueries(1):
+            self.assertEquals(self.resolver.resolve(str(self.user.pk)), self.user)
+
+    def test_it_returns_none_for_unknown_identifier(self):
+        self.assertIsNone(self.resolver.resolve('unknown@example.com'))
+
+    def test_it_returns_none_without_querying_for_empty_identifier(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.resolver.resolve(''))
@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+
+from .factories import UserFactory
+
+UserModel = get_user_model()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersCommandTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def call(self, path, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_users', path, workers=0, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_it_imports_users_from_csv(self):
+        path = self.write('users.csv', "username,email,phone,password\n"
+                                       "john.doe,john@example.com,+201001234567,secret\n"
+                                       "jane.doe,jane@EXAMPLE.com,+201001234568,secret\n")
+        stdout, _ = self.call(path)
+        self.assertIn("Imported 2 users", stdout)
+        jane = UserModel.objects.get(username='jane.doe')
+        self.assertEquals(jane.email, 'jane@example.com')
+        self.assertTrue(check_password('secret', jane.password))
+
+    def test_it_imports_users_from_jsonl(self):
+        path = self.write('users.jsonl', '\n'.join(json.dumps(row) for row in [
+            {"username": "john.doe", "email": "john@example.com", "phone": "+201001234567"},
+            {"username": "jane.doe", "email": "jane@example.com", "phone": "+201001234568"},
+        ]))
+        self.call(path)
+        self.assertEquals(UserModel.objects.filter(username__in=['john.doe', 'jane.doe']).count(), 2)
+        self.assertFalse(UserModel.objects.get(username='john.doe').has_usable_password())
+
+    def test_it_generates_unique_otp_keys(self):
+        path = self.write('users.csv', "username,email,phone\n" + ''.join(
+            "user{0},user{0}@example.com,+2010012345{0:02d}\n".format(i) for i in range(20)))
+        self.call(path, chunk_size=7)
+        keys = list(UserModel.objects.values_list('key', flat=True))
+        self.assertEquals(len(keys), 20)
+        self.assertTrue(all(keys))
+        self.assertEquals(len(set(keys)), 20)
+
+    def test_it_skips_invalid_rows(self):
+        path = self.write('users.csv', "username,email,phone\n"
+                                       "john.doe,not-an-email,+201001234567\n"
+                                       "jane.doe,jane@example.com,12\n"
+                                       ",nobody@example.com,+201001234569\n")
+        stdout, stderr = self.call(path)
+        self.assertIn("skipped 3 invalid", stdout)
+        self.assertIn("line 2", stderr)
+        self.assertFalse(UserModel.objects.exists())
+
+    def test_it_skips_conflicting_rows(self):
+        UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+        path = self.write('users.csv', "username,email,phone\n"
+                                       "johnny,john@example.com,+201001234560\n"
+                                       "jane.doe,jane@example.com,+201001234568\n"
+                                       "jane,jane@example.com,+201001234569\n")
+        stdout, _ = self.call(path)
+        self.assertIn("2 conflicting", stdout)
+        self.assertEquals(UserModel.objects.count(), 2)
+
+    def test_it_fails_on_conflicts_when_asked_to(self):
+        UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+        path = self.write('users.csv', "username,email,phone\njohnny,john@example.com,+201001234560\n")
+        with self.assertRaises(CommandError):
+            self.call(path, on_conflict='fail')
+
+    def test_it_inserts_each_chunk_with_one_insert(self):
+        path = self.write('users.csv', "username,email,phone\n" + ''.join(
+            "user{0},user{0}@example.com,+2010012345{0:02d}\n".format(i) for i in range(10)))
+        # one conflict check per unique field, one key check and one INSERT
+        with self.assertNumQueries(3 + 1 + 1 + 2):
+            self.call(path, chunk_size=10)
@@ -0,0 +1,107 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .factories import UserFactory
+from .. import tokens
+from ..tokens import JWTTokenService, jwt_token_service
+from ...common.utils import authenticate_api_user, get_user_tokens
+
+
+class JWTTokenServiceTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.addCleanup(jwt_token_service.flush)
+
+    def test_it_issues_tokens_simplejwt_accepts(self):
+        tokens = get_user_tokens(self.user)
+        self.assertEquals(RefreshToken(tokens['refresh_token'])['user_id'], self.user.pk)
+        self.assertEquals(AccessToken(tokens['access_token'])['user_id'], self.user.pk)
+
+    def test_it_records_the_outstanding_token_with_a_single_query(self):
+        with self.assertNumQueries(1):
+            tokens = get_user_tokens(self.user)
+        outstanding = OutstandingToken.objects.get()
+        self.assertEquals(outstanding.token, tokens['refresh_token'])
+        self.assertEquals(outstanding.user, self.user)
+
+    @override_settings(ROOT_URLCONF='dj_site_accounts.authentication.tests.urls')
+    def test_authenticate_api_user_authenticates_the_client(self):
+        self.assertEquals(APIClient().get('/api/me/').status_code, 401)
+        client = authenticate_api_user(APIClient(), self.user)
+        response = client.get('/api/me/')
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.data, {'pk': self.user.pk})
+
+    @override_settings(JWT_OUTSTANDING_TOKEN_MODE='deferred')
+    def test_deferred_mode_writes_outstanding_tokens_in_batches(self):
+        service = JWTTokenService()
+        service.start = lambda: None
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                service.get_user_tokens(self.user)
+        self.assertEquals(service.flush(), 3)
+        self.assertEquals(OutstandingToken.objects.filter(user=self.user).count(), 3)
+
+    @override_settings(JWT_OUTSTANDING_TOKEN_MODE='deferred')
+    def test_deferred_rows_of_already_blacklisted_tokens_are_skipped(self):
+        service = JWTTokenService()
+        service.start = lambda: None
+        tokens = service.get_user_tokens(self.user)
+        RefreshToken(tokens['refresh_token']).blacklist()
+        self.assertEquals(service.flush(), 0)
+        self.assertEquals(OutstandingToken.objects.count(), 1)
+
+    @override_settings(JWT_OUTSTANDING_TOKEN_MODE='deferred', JWT_OUTSTANDING_TOKEN_QUEUE_LIMIT=1)
+    def test_deferred_mode_inserts_within_the_request_once_the_queue_is_full(self):
+        service = JWTTokenService()
+        service.start = lambda: None
+        with self.assertNumQueries(0):
+            service.get_user_tokens(self.user)
+        with self.assertNumQueries(1):
+            service.get_user_tokens(self.user)
+        self.assertEquals(service.flush(), 1)
+        self.assertEquals(OutstandingToken.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(JWT_OUTSTANDING_TOKEN_MODE='disabled')
+    def test_disabled_mode_does_not_record_tokens(self):
+        with self.assertNumQueries(0):
+            get_user_tokens(self.user)
+        self.assertFalse(OutstandingToken.objects.exists())
+
+    def write_key_file(self, key):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'jwt.key')
+        with open(path, 'w') as file:
+            file.write(key)
+        return path
+
+    def test_it_loads_the_signing_key_once(self):
+        service = JWTTokenService()
+        with mock.patch.object(service, 'load_signing_key', wraps=service.load_signing_key) as load_signing_key:
+            service.get_user_tokens(self.user)
+            tokens = service.get_user_tokens(self.user)
+        load_signing_key.assert_called_once_with()
+        self.assertEquals(AccessToken(tokens['access_token'])['user_id'], self.user.pk)
+
+    def test_it_reads_the_key_file_of_asymmetric_algorithms(self):
+        path = self.write_key_file('private-key')
+        with mock.patch.object(tokens.api_settings, 'ALGORITHM', 'RS256'), \
+                mock.patch('jwt.PyJWS.get_algorithm_by_name') as get_algorithm_by_name, \
+                self.settings(JWT_SIGNING_KEY_FILE=path):
+            get_algorithm_by_name.return_value.prepare_key.side_effect = lambda key: key
+            self.assertEquals(JWTTokenService().load_signing_key(), 'private-key')
+        get_algorithm_by_name.assert_called_once_with('RS256')
+
+    def test_it_rejects_key_files_for_hmac_algorithms(self):
+        with self.settings(JWT_SIGNING_KEY_FILE=self.write_key_file('file-secret')):
+            with self.assertRaises(ImproperlyConfigured):
+                JWTTokenService().get_user_tokens(self.user)
+        self.assertIsNone(jwt_token_service.signing_key)
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from .factories import UserFactory
+from ...common.utils import generate_key, generate_keys
+
+UserModel = get_user_model()
+
+
+class HasOTPVerificationKeyTestCase(TestCase):
+    def test_it_generates_the_key_without_checking_it_first(self):
+        with CaptureQueriesContext(connection) as queries:
+            user = UserModel.objects.create(username='john.doe', email='john@example.com', phone='+201001234567')
+        # the insert runs in a savepoint of its own
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        self.assertEquals([statement for statement in statements if statement not in ('SAVEPOINT', 'RELEASE')],
+                          ['INSERT'])
+        self.assertTrue(user.key)
+
+    def test_it_keeps_existing_keys(self):
+        user = UserModel.objects.create(username='john.doe', email='john@example.com', phone='+201001234567',
+                                        key='EXISTINGKEY')
+        self.assertEquals(user.key, 'EXISTINGKEY')
+
+    def test_it_retries_collisions_inside_atomic_blocks(self):
+        existing = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+        with mock.patch('dj_site_accounts.authentication.models.generate_key', side_effect=[existing.key, 'NEWKEY']):
+            with transaction.atomic():
+                user = UserModel.objects.create(username='jane.doe', email='jane@example.com', phone='+201001234568')
+                self.assertEquals(UserModel.objects.count(), 2)
+        self.assertEquals(UserModel.objects.get(pk=user.pk).key, 'NEWKEY')
+
+    def test_it_raises_once_every_attempt_collides_inside_atomic_blocks(self):
+        existing = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+        with mock.patch('dj_site_accounts.authentication.models.generate_key', return_value=existing.key):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                UserModel.objects.create(username='jane.doe', email='jane@example.com', phone='+201001234568')
+
+
+class HasOTPVerificationKeyCollisionTestCase(TransactionTestCase):
+    def test_it_retries_the_insert_with_a_new_key_on_collision(self):
+        existing = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+        with mock.patch('dj_site_accounts.authentication.models.generate_key', side_effect=[existing.key, 'NEWKEY']):
+            user = UserModel.objects.create(username='jane.doe', email='jane@example.com', phone='+201001234568')
+        self.assertEquals(user.key, 'NEWKEY')
+        self.assertEquals(UserModel.objects.count(), 2)
+
+    def test_it_raises_other_integrity_errors(self):
+        UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+        with self.assertRaises(IntegrityError):
+            UserModel.objects.create(username='john.doe', email='jane@example.com', phone='+201001234568')
+
+
+class GenerateKeysTestCase(TestCase):
+    def test_generate_key_does_not_query(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(generate_key())
+
+    def test_generate_keys_checks_each_batch_once(self):
+        with self.assertNumQueries(1):
+            keys = generate_keys(50)
+        self.assertEquals(len(set(keys)), 50)
+
+    def test_generate_keys_replaces_existing_keys(self):
+        existing = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+        with mock.patch('dj_site_accounts.common.utils.generate_key', side_effect=[existing.key, 'NEWKEY']):
+            self.assertEquals(generate_keys(1), ['NEWKEY'])
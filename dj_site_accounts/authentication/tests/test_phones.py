@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.test import TestCase, override_settings
+from django.test.utils import isolate_apps
+from django.utils.timezone import now
+
+from .factories import UserFactory
+from .models import UserPhone
+from ..mixins import VerifyPhoneMixin
+from ..models import AbstractUserPhone
+
+UserModel = get_user_model()
+
+
+class UserPhoneQuerySetTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.other = UserPhone.objects.create(user=self.user, phone='+201001234501')
+        self.primary = UserPhone.objects.create(user=self.user, phone='+201001234502', is_primary=True)
+
+    def test_get_primary_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.assertEquals(UserPhone.objects.get_primary(self.user), self.primary)
+        self.assertIsNone(UserPhone.objects.get_primary(UserFactory()))
+
+    def test_get_for_user_only_returns_the_phones_of_the_user(self):
+        with self.assertNumQueries(1):
+            self.assertEquals(UserPhone.objects.get_for_user(self.user, self.other.pk), self.other)
+        self.assertIsNone(UserPhone.objects.get_for_user(UserFactory(), self.other.pk))
+
+    def test_prefetch_for_loads_the_phones_of_every_user_at_once(self):
+        for i in range(3):
+            UserPhone.objects.create(user=UserFactory(), phone='+20100123460{}'.format(i))
+        with self.assertNumQueries(2):
+            users = list(UserPhone.objects.prefetch_for(UserModel.objects.order_by('pk')))
+            phones = [[phone.pk for phone in user.userphone_set.all()] for user in users]
+        self.assertEquals(phones[0], [self.primary.pk, self.other.pk])
+        self.assertEquals(len(phones), 4)
+
+    def test_users_are_filtered_by_their_phones_with_the_default_query_name(self):
+        self.assertEquals(list(UserModel.objects.filter(userphone__phone='+201001234502')), [self.user])
+
+    @isolate_apps('dj_site_accounts.authentication.tests')
+    def test_several_subclasses_get_their_own_accessor(self):
+        class WorkPhone(AbstractUserPhone):
+            pass
+
+        class HomePhone(AbstractUserPhone):
+            pass
+
+        accessors = {model._meta.get_field('user').remote_field.get_accessor_name() for model in (WorkPhone, HomePhone)}
+        self.assertEquals(accessors, {'workphone_set', 'homephone_set'})
+
+    def test_prefetch_for_can_store_the_phones_in_an_attribute(self):
+        user = UserPhone.objects.prefetch_for(UserModel.objects.filter(pk=self.user.pk), to_attr='phone_list').get()
+        self.assertEquals(user.phone_list, [self.primary, self.other])
+
+
+@override_settings(USER_PHONE_MODEL='dj_site_accounts.authentication.tests.models.UserPhone')
+class VerifyPhoneMixinGetPhoneTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.phone = UserPhone.objects.create(user=self.user, phone='+201001234501', phone_verified_at=now())
+
+    def get_mixin(self, phone_id):
+        mixin = VerifyPhoneMixin()
+        mixin.request, mixin.kwargs = SimpleNamespace(user=self.user), {'phone_id': phone_id}
+        return mixin
+
+    def test_it_loads_the_phone_with_a_single_query(self):
+        mixin = self.get_mixin(self.phone.pk)
+        with self.assertNumQueries(1):
+            mixin.get_phone()
+        self.assertEquals(mixin.phone, '+201001234501')
+        self.assertTrue(mixin.is_verified)
+
+    def test_it_rejects_the_phones_of_other_users(self):
+        other = UserPhone.objects.create(user=UserFactory(), phone='+201001234502')
+        with self.assertRaises(ObjectDoesNotExist):
+            self.get_mixin(other.pk).get_phone()
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.timezone import now
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .factories import UserFactory
+from ..revocation import revocation_index
+from ..tokens import ExpiredTokenPruner
+
+
+class ExpiredTokenPrunerTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+
+    def create_tokens(self, count, expires_in, blacklisted=False):
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(user=self.user, jti=uuid4().hex, token='', expires_at=now() + expires_in)
+            for _ in range(count)])
+        tokens = OutstandingToken.objects.filter(jti__in=[token.jti for token in tokens])
+        if blacklisted:
+            BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens])
+        return tokens
+
+    def test_it_deletes_expired_tokens_and_their_blacklist_entries(self):
+        self.create_tokens(3, timedelta(days=-1), blacklisted=True)
+        self.create_tokens(2, timedelta(days=-1))
+        valid = self.create_tokens(2, timedelta(days=1), blacklisted=True)
+
+        self.assertEquals(ExpiredTokenPruner(batch_size=2).prune(), (5, 3))
+        self.assertEquals(set(OutstandingToken.objects.values_list('pk', flat=True)),
+                          set(valid.values_list('pk', flat=True)))
+        self.assertEquals(BlacklistedToken.objects.count(), 2)
+
+    def test_it_deletes_one_primary_key_range_per_batch(self):
+        self.create_tokens(6, timedelta(days=-1))
+        # per batch: savepoint, primary keys, blacklist entries, outstanding tokens, release
+        with self.assertNumQueries(1 + 3 * 5):
+            self.assertEquals(ExpiredTokenPruner(batch_size=2).prune(), (6, 0))
+
+    def test_it_deletes_blacklist_entries_without_a_query_per_row(self):
+        self.create_tokens(4, timedelta(days=-1), blacklisted=True)
+        with self.assertNumQueries(1 + 2 * 5):
+            self.assertEquals(ExpiredTokenPruner(batch_size=2).prune(), (4, 4))
+
+    def test_it_reconnects_the_revocation_receiver(self):
+        self.create_tokens(2, timedelta(days=-1), blacklisted=True)
+        ExpiredTokenPruner().prune()
+        valid = self.create_tokens(1, timedelta(days=1), blacklisted=True).get()
+        with mock.patch.object(revocation_index, 'forget') as forget:
+            BlacklistedToken.objects.get(token=valid).delete()
+        forget.assert_called_once_with(valid.jti)
+
+    def test_running_it_again_deletes_nothing(self):
+        self.create_tokens(3, timedelta(days=-1))
+        pruner = ExpiredTokenPruner()
+        pruner.prune()
+        with self.assertNumQueries(1):
+            self.assertEquals(pruner.prune(), (0, 0))
+
+    def test_it_leaves_tokens_expiring_after_the_cutoff(self):
+        self.create_tokens(2, timedelta(hours=-1))
+        self.assertEquals(ExpiredTokenPruner().prune(cutoff=now() - timedelta(days=1)), (0, 0))
+        self.assertEquals(OutstandingToken.objects.count(), 2)
+
+    def test_command_reports_the_deleted_tokens(self):
+        self.create_tokens(2, timedelta(days=-1), blacklisted=True)
+        out = StringIO()
+        call_command('prune_expired_tokens', '--batch-size', '10', stdout=out)
+        self.assertIn("Deleted 2 expired outstanding tokens and 2 blacklisted tokens", out.getvalue())
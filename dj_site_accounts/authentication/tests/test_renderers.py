@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .factories import UserFactory
+from ..renderers import AccountEmailRenderer, verification_email_renderer
+from ...common.utils import account_activation_token
+
+
+@override_settings(ROOT_URLCONF='dj_site_accounts.authentication.tests.urls')
+class AccountEmailRendererTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.renderer = AccountEmailRenderer('email_confirmation.html')
+        self.site = Site.objects.get_current()
+        self.user = UserFactory()
+
+    def render_to_string(self, user):
+        return render_to_string('dj_site_accounts/emails/email_confirmation.html', {
+            'user': user,
+            'site': self.site,
+            'domain': self.site.domain,
+            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': account_activation_token.make_token(user),
+            'protocol': 'https',
+        })
+
+    def test_it_renders_the_same_email_as_the_template(self):
+        self.assertEquals(self.renderer.render(self.user, self.site), self.render_to_string(self.user))
+
+    def test_it_renders_the_template_once_per_site(self):
+        self.renderer.render(self.user, self.site)
+        user = UserFactory()
+        with self.assertNumQueries(0):
+            message = self.renderer.render(user, self.site)
+        self.assertNotIn('PLACEHOLDER', message)
+
+    def test_it_renders_many_emails(self):
+        users = [self.user, UserFactory(), UserFactory()]
+        messages = dict(self.renderer.render_many(users, self.site))
+        for user in users:
+            self.assertEquals(messages[user], self.render_to_string(user))
+            self.assertIn(urlsafe_base64_encode(force_bytes(user.pk)), messages[user])
+
+    def test_it_keeps_emails_per_protocol_and_language(self):
+        self.renderer.render(self.user, self.site)
+        self.renderer.render(self.user, self.site, protocol='http')
+        self.renderer.render(self.user, self.site, language='ar')
+        self.assertIn('https://', self.renderer.get_skeleton(self.site, 'https', 'en-us'))
+        self.assertIn('http://', self.renderer.get_skeleton(self.site, 'http', 'en-us'))
+        self.assertEquals(len(self.renderer.templates), 2)
+
+    def test_it_forgets_rendered_emails_once_the_site_changes(self):
+        verification_email_renderer.render(self.user, self.site)
+        self.site.domain = 'accounts.example.com'
+        self.site.save()
+        self.assertIn('https://accounts.example.com/verify-email/',
+                      verification_email_renderer.render(self.user, self.site))
+
+    def test_it_forgets_rendered_emails_in_every_process(self):
+        other_process = AccountEmailRenderer('email_confirmation.html')
+        other_process.render(self.user, self.site)
+        self.renderer.clear()
+        with patch.object(other_process, 'render_template', wraps=other_process.render_template) as render_template:
+            other_process.render(self.user, self.site)
+            other_process.render(self.user, self.site)
+        self.assertEquals(render_template.call_count, 1)
+
+    def test_it_renders_every_email_of_templates_reading_other_user_attributes(self):
+        templates = [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {
+                'dj_site_accounts/emails/email_confirmation.html': '{{ user.email }} {{ user.get_username }} {{ uid }}',
+            })]},
+        }]
+        users = [self.user, UserFactory()]
+        with override_settings(TEMPLATES=templates):
+            self.assertIs(self.renderer.get_skeleton(self.site, 'https', 'en-us'), False)
+            messages = dict(self.renderer.render_many(users, self.site))
+        for user in users:
+            self.assertEquals(messages[user], '{} {} {}'.format(
+                user.email, user.get_username(), urlsafe_base64_encode(force_bytes(user.pk))))
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.timezone import now
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .factories import UserFactory
+from ..revocation import BloomFilter, RevocationIndex, revocation_index
+from .. import serializers
+from ..serializers import IndexedTokenRefreshSerializer, IndexedTokenVerifySerializer
+
+
+class BloomFilterTestCase(TestCase):
+    def test_it_contains_every_added_value(self):
+        bloom = BloomFilter(1000, 0.01)
+        values = ['jti-{}'.format(i) for i in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+
+    def test_false_positives_stay_close_to_the_error_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add('jti-{}'.format(i))
+        false_positives = len([i for i in range(10000) if 'other-{}'.format(i) in bloom])
+        self.assertLess(false_positives, 300)
+
+
+class RevocationIndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        self.addCleanup(revocation_index.clear)
+        self.user = UserFactory()
+
+    def blacklist(self):
+        token = RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        return token['jti']
+
+    def test_it_does_not_query_for_tokens_which_were_not_revoked(self):
+        revocation_index.sync()
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation_index.is_revoked('not-revoked'))
+
+    def test_revocations_are_answered_from_the_cache(self):
+        revocation_index.sync()
+        jti = self.blacklist()
+        with self.assertNumQueries(0):
+            self.assertTrue(revocation_index.is_revoked(jti))
+
+    def test_other_processes_replay_the_journal(self):
+        other = RevocationIndex()
+        other.sync()
+        jti = self.blacklist()
+        with self.assertNumQueries(0):
+            self.assertTrue(other.is_revoked(jti))
+
+    def test_it_rebuilds_from_the_tables_when_the_journal_is_gone(self):
+        other = RevocationIndex()
+        other.sync()
+        jti = self.blacklist()
+        cache.delete(revocation_index.make_key('journal', 1))
+        cache.delete(revocation_index.make_key('jti', jti))
+        self.assertTrue(other.is_revoked(jti))
+        self.assertEquals(other.sequence, 1)
+
+    def test_rebuilding_skips_expired_tokens(self):
+        jti = self.blacklist()
+        OutstandingToken.objects.filter(jti=jti).update(expires_at=now() - timedelta(minutes=1))
+        revocation_index.rebuild()
+        self.assertNotIn(jti, revocation_index.filter)
+
+    def test_it_is_rebuilt_on_schedule(self):
+        revocation_index.sync()
+        filter_ = revocation_index.filter
+        revocation_index.built_at -= revocation_index.rebuild_interval + 1
+        revocation_index.sync()
+        self.assertIsNot(revocation_index.filter, filter_)
+
+    def test_taking_a_token_off_the_blacklist_forgets_it(self):
+        jti = self.blacklist()
+        BlacklistedToken.objects.filter(token__jti=jti).delete()
+        self.assertFalse(revocation_index.is_revoked(jti))
+
+
+class IndexedSerializersTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_index.clear()
+        self.addCleanup(revocation_index.clear)
+
+    def test_refresh_rejects_blacklisted_tokens(self):
+        token = RefreshToken.for_user(UserFactory())
+        self.assertTrue(IndexedTokenRefreshSerializer(data={'refresh': str(token)}).is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        with self.assertRaises(TokenError):
+            IndexedTokenRefreshSerializer(data={'refresh': str(token)}).is_valid()
+
+    @patch.object(serializers.api_settings, 'BLACKLIST_AFTER_ROTATION', True)
+    def test_verify_rejects_blacklisted_tokens(self):
+        token = RefreshToken.for_user(UserFactory())
+        self.assertTrue(IndexedTokenVerifySerializer(data={'token': str(token)}).is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        self.assertFalse(IndexedTokenVerifySerializer(data={'token': str(token)}).is_valid())
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from .factories import UserFactory
+from ..models import OutgoingSMS
+from ..verify_phone import VerifyPhone
+
+
+@override_settings(ROOT_URLCONF='dj_site_accounts.authentication.tests.urls')
+class SendVerificationsCommandTestCase(TestCase):
+    def setUp(self):
+        self.unverified = [UserFactory() for _ in range(3)]
+        self.verified = UserFactory(email_verified_at=now(), phone_verified_at=now())
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def call(self, channel, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('send_verifications', channel, workers=0, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_it_sends_the_email_verification_to_unverified_users(self):
+        stdout, _ = self.call('email', chunk_size=2)
+        self.assertIn("Sent 3 email verifications, 0 failed", stdout)
+        self.assertEquals(sorted(message.to[0] for message in mail.outbox),
+                          sorted(user.email for user in self.unverified))
+        self.assertIn('/verify-email/', mail.outbox[0].body)
+
+    @override_settings(PHONE_VERIFY_SERVICE='dj_site_accounts.authentication.sms.QueuedVerifyPhoneService')
+    def test_it_sends_the_phone_verification_to_unverified_users(self):
+        self.call('phone')
+        self.assertEquals(sorted(OutgoingSMS.objects.values_list('phone', flat=True)),
+                          sorted(str(user.phone) for user in self.unverified))
+
+    def test_dry_run_only_counts(self):
+        stdout, _ = self.call('email', dry_run=True, rate=3)
+        self.assertIn("Would send 3 email verifications in about 1 seconds", stdout)
+        self.assertEquals(len(mail.outbox), 0)
+
+    def test_it_resumes_from_the_checkpoint(self):
+        checkpoint = os.path.join(self.directory.name, 'checkpoint.json')
+        self.call('email', chunk_size=1, checkpoint=checkpoint)
+        with open(checkpoint) as file:
+            self.assertEquals(json.load(file)['last_pk'], self.unverified[-1].pk)
+
+        mail.outbox = []
+        later = UserFactory()
+        self.call('email', checkpoint=checkpoint)
+        self.assertEquals([message.to for message in mail.outbox], [[later.email]])
+
+    def test_it_rejects_a_checkpoint_of_another_channel(self):
+        checkpoint = os.path.join(self.directory.name, 'checkpoint.json')
+        self.call('email', checkpoint=checkpoint)
+        with self.assertRaises(CommandError):
+            self.call('phone', checkpoint=checkpoint)
+
+    @override_settings(PHONE_VERIFY_SERVICE='dj_site_accounts.authentication.sms.QueuedVerifyPhoneService')
+    def test_it_reports_failures_and_carries_on(self):
+        with mock.patch.object(VerifyPhone, 'send', side_effect=[ConnectionError('gateway unavailable'), None, None]):
+            stdout, stderr = self.call('phone')
+        self.assertIn("Sent 2 phone verifications, 1 failed", stdout)
+        self.assertIn("gateway unavailable", stderr)
+
+    def test_it_sends_concurrently(self):
+        stdout = StringIO()
+        call_command('send_verifications', 'email', workers=2, stdout=stdout)
+        self.assertIn("Sent 3 email verifications, 0 failed", stdout.getvalue())
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.contrib.auth.forms import AuthenticationForm
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from .forms import TestLoginForm
+from .mocks import MockVerifyService, register_callback
+from .models import UserPhone
+from ..forms import UserCreationForm
+from ..mixins import LoginGetFormClassMixin, RegisterMixin, ViewCallbackMixin
+from ...common.settings import ResolvedSettings, resolved_settings
+
+
+class ResolvedSettingsTestCase(TestCase):
+    def setUp(self):
+        self.registry = ResolvedSettings()
+
+    def test_it_resolves_defaults(self):
+        self.assertEquals(self.registry.get_login_form(), AuthenticationForm)
+        self.assertEquals(self.registry.get_register_form(), UserCreationForm)
+        self.assertIsNone(self.registry.get_user_phone_model())
+
+    @override_settings(LOGIN_FORM='dj_site_accounts.authentication.tests.forms.TestLoginForm',
+                       USER_PHONE_MODEL='dj_site_accounts.authentication.tests.models.UserPhone',
+                       PHONE_VERIFY_SERVICE='dj_site_accounts.authentication.tests.mocks.MockVerifyService',
+                       REGISTER_CALLBACK='dj_site_accounts.authentication.tests.mocks.register_callback')
+    def test_it_resolves_configured_dotted_paths(self):
+        self.assertEquals(self.registry.get_login_form(), TestLoginForm)
+        self.assertEquals(self.registry.get_user_phone_model(), UserPhone)
+        self.assertEquals(self.registry.get_phone_verify_service(), MockVerifyService)
+        self.assertEquals(self.registry.get_callback('REGISTER_CALLBACK'), register_callback)
+
+    @override_settings(LOGIN_FORM='dj_site_accounts.authentication.tests.forms.TestLoginForm')
+    def test_it_imports_each_setting_once(self):
+        with mock.patch('dj_site_accounts.common.settings.import_class_or_function',
+                        return_value=TestLoginForm) as import_class:
+            self.registry.get_login_form()
+            self.registry.get_login_form()
+        import_class.assert_called_once()
+
+    @override_settings(REGISTER_CALLBACK='dj_site_accounts.authentication.tests.mocks.missing_callback')
+    def test_load_validates_configured_settings_and_callbacks(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.registry.load()
+
+    @override_settings(OAUTH_REDIRECT_CALLBACK='https://example.com/oauth/callback/')
+    def test_load_ignores_callback_settings_of_other_apps(self):
+        self.registry.load()
+
+    @override_settings(CUSTOM_CALLBACK='dj_site_accounts.authentication.tests.mocks.register_callback')
+    def test_other_callbacks_are_resolved_on_use(self):
+        self.assertEquals(self.registry.get_callback('CUSTOM_CALLBACK'), register_callback)
+
+    def test_it_is_cleared_when_settings_change(self):
+        self.assertEquals(resolved_settings.get_login_form(), AuthenticationForm)
+        with self.settings(LOGIN_FORM='dj_site_accounts.authentication.tests.forms.TestLoginForm'):
+            self.assertEquals(resolved_settings.get_login_form(), TestLoginForm)
+        self.assertEquals(resolved_settings.get_login_form(), AuthenticationForm)
+
+
+class ResolvedSettingsMixinsTestCase(TestCase):
+    @override_settings(LOGIN_FORM='dj_site_accounts.authentication.tests.forms.TestLoginForm')
+    def test_login_form_class(self):
+        self.assertEquals(LoginGetFormClassMixin().get_form_class(), TestLoginForm)
+
+    def test_register_form_class(self):
+        self.assertEquals(RegisterMixin().get_form_class(), UserCreationForm)
+
+    @override_settings(REGISTER_CALLBACK='dj_site_accounts.authentication.tests.mocks.register_callback')
+    def test_callback(self):
+        with mock.patch('dj_site_accounts.authentication.tests.mocks.register_callback') as callback:
+            resolved_settings.clear()
+            ViewCallbackMixin().get_callback('REGISTER_CALLBACK', 'user')
+        callback.assert_called_once_with('user')
@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .factories import UserFactory
+from .mocks import FailingSMSProvider, RecordingSMSProvider
+from .. import sms
+from ..models import OutgoingSMS
+from ..sms import LocMemSMSProvider, QueuedVerifyPhoneService, SMSSender, enqueue_sms
+from ..verify_phone import VerifyPhone
+
+
+class SMSTestCase(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        self.addCleanup(sms.outbox.clear)
+
+    def queue(self, count=1):
+        return [enqueue_sms('+2010012345{:02d}'.format(i), 'message {}'.format(i)) for i in range(count)]
+
+
+@override_settings(PHONE_VERIFY_SERVICE='dj_site_accounts.authentication.sms.QueuedVerifyPhoneService')
+class QueuedVerifyPhoneServiceTestCase(SMSTestCase):
+    def test_it_only_queues_the_message_within_the_request(self):
+        user = UserFactory()
+        VerifyPhone(user, user.phone).send()
+        self.assertEquals(sms.outbox, [])
+        message = OutgoingSMS.objects.get()
+        self.assertEquals(message.phone, str(user.phone))
+        self.assertIn('Your verification code is', message.message)
+
+    def test_the_queued_code_verifies(self):
+        user = UserFactory()
+        message = QueuedVerifyPhoneService(user, user.phone).send()
+        code = message.message.rsplit(' ', 1)[-1]
+        self.assertTrue(VerifyPhone(user, user.phone).check(code))
+
+
+class SMSSenderTestCase(SMSTestCase):
+    def test_it_requires_a_provider(self):
+        with self.assertRaises(ImproperlyConfigured):
+            SMSSender()
+
+    @override_settings(SMS_PROVIDERS=['dj_site_accounts.authentication.sms.LocMemSMSProvider'])
+    def test_it_sends_through_the_configured_providers(self):
+        self.queue(3)
+        self.assertEquals(SMSSender().send(), (3, 0))
+        self.assertEquals(len(sms.outbox), 3)
+        sent = OutgoingSMS.objects.filter(status=OutgoingSMS.STATUS_SENT, attempts=1)
+        self.assertEquals(sent.count(), 3)
+        self.assertEquals(set(sent.values_list('message', flat=True)), {''})
+        self.assertEquals(sent.first().provider, LocMemSMSProvider().name)
+
+    def test_it_batches_messages_for_batching_providers(self):
+        self.queue(5)
+        provider = RecordingSMSProvider()
+        self.assertEquals(SMSSender(providers=[provider]).send(), (5, 0))
+        self.assertEquals(sorted(len(batch) for batch in provider.batches), [1, 2, 2])
+
+    def test_it_fails_over_to_the_next_provider(self):
+        self.queue(2)
+        sender = SMSSender(providers=[FailingSMSProvider(), LocMemSMSProvider()])
+        self.assertEquals(sender.send(), (2, 0))
+        self.assertEquals(len(sms.outbox), 2)
+        self.assertEquals(OutgoingSMS.objects.filter(provider=LocMemSMSProvider().name).count(), 2)
+
+    def test_it_retries_when_every_provider_fails(self):
+        message, = self.queue()
+        sender = SMSSender(providers=[FailingSMSProvider()], max_attempts=2)
+        self.assertEquals(sender.send(), (0, 1))
+
+        message.refresh_from_db()
+        self.assertEquals(message.status, OutgoingSMS.STATUS_PENDING)
+        self.assertEquals(message.attempts, 1)
+        self.assertIn('gateway unavailable', message.last_error)
+        self.assertEquals(sender.send(), (0, 0))
+
+        OutgoingSMS.objects.update(next_attempt_at=message.created_at)
+        self.assertEquals(sender.send(), (0, 1))
+        message.refresh_from_db()
+        self.assertEquals(message.status, OutgoingSMS.STATUS_FAILED)
+        self.assertEquals(message.message, '')
+
+    @override_settings(SMS_PROVIDERS=['dj_site_accounts.authentication.sms.LocMemSMSProvider'])
+    def test_send_queued_sms_command(self):
+        self.queue(2)
+        stdout = StringIO()
+        call_command('send_queued_sms', stdout=stdout)
+        self.assertIn("Sent 2 messages, 0 failed", stdout.getvalue())
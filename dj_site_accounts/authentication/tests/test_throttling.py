@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+from rest_framework.test import APIClient
+
+from .factories import UserFactory
+from ..backends import MultipleAuthenticationBackend
+from ..forms import MultipleLoginForm
+from ..throttling import LoginThrottled, LoginRateThrottle, login_throttle
+
+
+@override_settings(LOGIN_THROTTLE_ENABLED=True,
+                   LOGIN_THROTTLE_IDENTIFIER_BUDGET=(3, 300),
+                   LOGIN_THROTTLE_IP_BUDGET=(5, 300),
+                   LOGIN_THROTTLE_LOCKOUT=(60, 3600))
+class LoginThrottleTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().post('/login/', REMOTE_ADDR='10.0.0.1')
+
+    def fail(self, identifier, times, request=None):
+        for _ in range(times):
+            login_throttle.register_failure(request or self.request, identifier)
+
+    def test_it_allows_attempts_within_budget(self):
+        self.fail('john.doe', 2)
+        login_throttle.check(self.request, 'john.doe')
+
+    def test_it_locks_out_the_identifier_once_the_budget_is_spent(self):
+        self.fail('john.doe', 3)
+        with self.assertRaises(LoginThrottled):
+            login_throttle.check(RequestFactory().post('/login/', REMOTE_ADDR='10.0.0.2'), 'John.Doe ')
+
+    def test_it_locks_out_the_client_ip_once_the_budget_is_spent(self):
+        for i in range(5):
+            self.fail('user{}'.format(i), 1)
+        with self.assertRaises(LoginThrottled):
+            login_throttle.check(self.request, 'jane.doe')
+
+    def test_it_doubles_repeated_lockouts(self):
+        self.fail('john.doe', 3)
+        with self.assertRaises(LoginThrottled) as first:
+            login_throttle.check(None, 'john.doe')
+        cache.delete('{}:locked'.format(login_throttle.make_key('identifier', 'john.doe')))
+        self.fail('john.doe', 1, request=RequestFactory().post('/login/', REMOTE_ADDR='10.0.0.2'))
+        with self.assertRaises(LoginThrottled) as second:
+            login_throttle.check(None, 'john.doe')
+        self.assertAlmostEqual(second.exception.wait, first.exception.wait * 2, delta=1)
+
+    def test_it_forgets_identifier_failures_on_reset(self):
+        self.fail('john.doe', 3)
+        login_throttle.reset(self.request, 'john.doe')
+        login_throttle.check(RequestFactory().post('/login/', REMOTE_ADDR='10.0.0.2'), 'john.doe')
+
+    @override_settings(LOGIN_THROTTLE_ENABLED=False)
+    def test_it_does_nothing_when_disabled(self):
+        self.fail('john.doe', 10)
+        login_throttle.check(self.request, 'john.doe')
+
+    @override_settings(LOGIN_THROTTLE_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_it_reads_the_client_ip_appended_by_the_trusted_proxy(self):
+        request = RequestFactory().post('/login/', HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.1')
+        self.assertEquals(login_throttle.get_client_ip(request), '10.0.0.1')
+
+    @override_settings(LOGIN_THROTTLE_IP_HEADER='HTTP_X_FORWARDED_FOR', LOGIN_THROTTLE_PROXY_COUNT=2)
+    def test_it_skips_the_addresses_appended_by_further_proxies(self):
+        request = RequestFactory().post('/login/', HTTP_X_FORWARDED_FOR='6.6.6.6, 1.2.3.4, 10.0.0.1')
+        self.assertEquals(login_throttle.get_client_ip(request), '1.2.3.4')
+
+    @override_settings(LOGIN_THROTTLE_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_spoofed_forwarded_addresses_share_the_ip_budget(self):
+        for i in range(5):
+            request = RequestFactory().post('/login/', HTTP_X_FORWARDED_FOR='1.2.3.{}, 10.0.0.9'.format(i))
+            login_throttle.register_failure(request, 'user{}'.format(i))
+        request = RequestFactory().post('/login/', HTTP_X_FORWARDED_FOR='1.2.3.99, 10.0.0.9')
+        with self.assertRaises(LoginThrottled):
+            login_throttle.check(request, 'someone.else')
+
+
+@override_settings(LOGIN_THROTTLE_ENABLED=True,
+                   LOGIN_THROTTLE_IDENTIFIER_BUDGET=(2, 300),
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleIntegrationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().post('/login/', REMOTE_ADDR='10.0.0.1')
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+        self.backend = MultipleAuthenticationBackend()
+        for _ in range(2):
+            self.backend.authenticate(self.request, identifier='john.doe', password='wrong')
+
+    def test_backend_rejects_locked_out_identifiers_before_hashing(self):
+        with mock.patch('dj_site_accounts.authentication.backends.check_password') as check:
+            with self.assertRaises(LoginThrottled):
+                self.backend.authenticate(self.request, identifier='john.doe', password='secret')
+        check.assert_not_called()
+
+    def test_form_reports_locked_out_identifiers(self):
+        form = MultipleLoginForm(request=self.request, data={'identifier': 'john.doe', 'password': 'secret'})
+        self.assertFalse(form.is_valid())
+        self.assertEquals(form.errors.as_data()['__all__'][0].code, 'throttled')
+
+    def test_api_throttle_rejects_locked_out_identifiers(self):
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.2'}, data={'username': 'john.doe'})
+        throttle = LoginRateThrottle()
+        self.assertFalse(throttle.allow_request(request, None))
+        self.assertGreater(throttle.wait(), 0)
+
+    @override_settings(LOGIN_THROTTLE_IDENTIFIER_FIELD='identifier')
+    def test_api_throttle_reads_the_configured_identifier_field(self):
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.2'}, data={'identifier': 'john.doe'})
+        self.assertFalse(LoginRateThrottle().allow_request(request, None))
+
+
+@override_settings(ROOT_URLCONF='dj_site_accounts.authentication.tests.urls',
+                   LOGIN_THROTTLE_ENABLED=True,
+                   LOGIN_THROTTLE_IDENTIFIER_BUDGET=(2, 300),
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ThrottledTokenObtainPairSerializerTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+
+    def obtain(self, password, identifier='john@example.com'):
+        return APIClient().post('/api/token/', {'username': identifier, 'password': password})
+
+    def test_it_issues_tokens_for_any_identifier(self):
+        for identifier in ['john@example.com', 'john.doe', '+201001234567']:
+            response = self.obtain('secret', identifier)
+            self.assertEquals(response.status_code, 200)
+            self.assertIn('access', response.data)
+
+    def test_it_locks_out_identifiers_after_failed_token_requests(self):
+        for _ in range(2):
+            self.assertEquals(self.obtain('wrong').status_code, 401)
+        response = self.obtain('secret')
+        self.assertEquals(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_a_token_request_resets_the_failures_of_its_identifier(self):
+        self.assertEquals(self.obtain('wrong').status_code, 401)
+        self.assertEquals(self.obtain('secret').status_code, 200)
+        self.assertEquals(self.obtain('wrong').status_code, 401)
+        self.assertEquals(self.obtain('secret').status_code, 200)
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .factories import UserFactory
+from ..mixins import VerifyEmailMixin
+from ...common.utils import SignedTokenGenerator, account_activation_token, get_email_verification_token_generator, \
+    signed_email_verification_token
+
+
+class SignedTokenGeneratorTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.token = signed_email_verification_token.make_token(self.user)
+
+    def test_it_checks_its_tokens(self):
+        self.assertTrue(signed_email_verification_token.check_token(self.user, self.token))
+        self.assertFalse(signed_email_verification_token.check_token(UserFactory(), self.token))
+
+    def test_it_reads_the_payload_without_queries(self):
+        with self.assertNumQueries(0):
+            payload = signed_email_verification_token.read(self.token)
+        self.assertEquals(payload['uid'], str(self.user.pk))
+        self.assertEquals(payload['expires_at'] - payload['issued_at'], 60 * 60 * 24 * 3)
+
+    def test_it_rejects_tampered_tokens(self):
+        tampered = self.token[:-1] + ('A' if self.token[-1] != 'A' else 'B')
+        self.assertIsNone(signed_email_verification_token.read(tampered))
+        self.assertIsNone(signed_email_verification_token.read('not-a-token'))
+        self.assertIsNone(signed_email_verification_token.read(None))
+
+    def test_it_rejects_tokens_of_another_purpose(self):
+        token = SignedTokenGenerator('password-reset').make_token(self.user)
+        self.assertIsNone(signed_email_verification_token.read(token))
+
+    @override_settings(EMAIL_VERIFICATION_TOKEN_MAX_AGE=60)
+    def test_it_rejects_expired_tokens(self):
+        token = signed_email_verification_token.make_token(self.user)
+        now = signed_email_verification_token._now()
+        with mock.patch.object(SignedTokenGenerator, '_now', return_value=now + 61):
+            self.assertIsNone(signed_email_verification_token.read(token))
+            self.assertFalse(signed_email_verification_token.check_token(self.user, token))
+
+    def test_changing_the_email_invalidates_the_token(self):
+        self.user.email = 'changed@example.com'
+        self.assertFalse(signed_email_verification_token.check_token(self.user, self.token))
+
+    def test_it_mints_tokens_from_values(self):
+        token = signed_email_verification_token.make_token_from_values(
+            self.user.pk, {'is_active': self.user.is_active, 'email': self.user.email})
+        self.assertTrue(signed_email_verification_token.check_token(self.user, token))
+
+
+@override_settings(EMAIL_VERIFICATION_TOKEN='signed')
+class SignedEmailVerificationTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+
+    def test_it_selects_the_signed_generator(self):
+        self.assertIs(get_email_verification_token_generator(), signed_email_verification_token)
+        with self.settings(EMAIL_VERIFICATION_TOKEN='hmac'):
+            self.assertIs(get_email_verification_token_generator(), account_activation_token)
+
+    def test_verify_email_with_signed_token(self):
+        token = signed_email_verification_token.make_token(self.user)
+        with self.assertNumQueries(2):
+            success, user = VerifyEmailMixin().verify(self.uid, token)
+        self.assertTrue(success)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.email_verified_at)
+
+    def test_verify_email_rejects_the_token_of_another_user(self):
+        token = signed_email_verification_token.make_token(UserFactory())
+        success, user = VerifyEmailMixin().verify(self.uid, token)
+        self.assertFalse(success)
+
+
+@override_settings(ROOT_URLCONF='dj_site_accounts.authentication.tests.urls', EMAIL_VERIFICATION_TOKEN='signed',
+                   MIDDLEWARE=['dj_site_accounts.authentication.middleware.SignedTokenMiddleware'])
+class SignedTokenMiddlewareTestCase(TestCase):
+    def test_it_lets_valid_tokens_through(self):
+        user = UserFactory()
+        token = signed_email_verification_token.make_token(user)
+        response = self.client.get('/verify-email/{}/{}/'.format(urlsafe_base64_encode(force_bytes(user.pk)), token))
+        self.assertEquals(response.status_code, 200)
+
+    def test_it_rejects_invalid_tokens_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/verify-email/MQ/invalid-token/')
+        self.assertEquals(response.status_code, 400)
+
+    @override_settings(EMAIL_VERIFICATION_TOKEN='hmac')
+    def test_it_lets_hmac_tokens_through(self):
+        user = UserFactory()
+        token = account_activation_token.make_token(user)
+        response = self.client.get('/verify-email/{}/{}/'.format(urlsafe_base64_encode(force_bytes(user.pk)), token))
+        self.assertEquals(response.status_code, 200)
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.test import TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .factories import UserFactory
+from ..forms import VerifyPhoneForm
+from ..mixins import VerifyEmailMixin
+from ..verify_phone import OTP
+from ...common.utils import account_activation_token
+from ...sites_profiles.signals import create_key_pre_save_signal
+
+UserModel = get_user_model()
+
+
+class VerificationQueryCountTestCase(TestCase):
+    """pins the number of queries of each verification flow"""
+
+    def setUp(self):
+        self.user = UserFactory(username='john.doe', email='john@example.com', phone='+201001234567')
+
+    def test_verify_phone_updates_a_single_column(self):
+        with self.assertNumQueries(1):
+            self.user.verify_phone()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.phone_verified_at)
+
+    def test_verify_email_loads_the_user_and_updates_a_single_column(self):
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        token = account_activation_token.make_token(self.user)
+        with self.assertNumQueries(2):
+            success, user = VerifyEmailMixin().verify(uid, token)
+        self.assertTrue(success)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.email_verified_at)
+
+    def test_verify_email_with_malformed_token_does_not_query(self):
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        with self.assertNumQueries(0):
+            success, user = VerifyEmailMixin().verify(uid, 'invalid-token')
+        self.assertFalse(success)
+
+    def test_verify_email_with_expired_token_does_not_query(self):
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        token = account_activation_token.make_token(self.user)
+        with override_settings(PASSWORD_RESET_TIMEOUT=-1), self.assertNumQueries(0):
+            success, user = VerifyEmailMixin().verify(uid, token)
+        self.assertFalse(success)
+
+    def test_verify_email_with_wrong_token_does_not_write(self):
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        token = account_activation_token.make_token(UserFactory())
+        with self.assertNumQueries(1):
+            success, user = VerifyEmailMixin().verify(uid, token)
+        self.assertFalse(success)
+
+    def test_verify_email_twice_is_idempotent(self):
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        token = account_activation_token.make_token(self.user)
+        VerifyEmailMixin().verify(uid, token)
+        self.user.refresh_from_db()
+        with self.assertNumQueries(1):
+            success, user = VerifyEmailMixin().verify(uid, token)
+        self.assertTrue(success)
+        self.assertEquals(user.email_verified_at, self.user.email_verified_at)
+
+    def test_verify_email_only_loads_the_token_columns(self):
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        token = account_activation_token.make_token(self.user)
+        with self.assertNumQueries(2) as context:
+            VerifyEmailMixin().verify(uid, token)
+        self.assertNotIn('password', context.captured_queries[0]['sql'])
+        self.assertIn('"email_verified_at" IS NULL', context.captured_queries[1]['sql'])
+
+    @override_settings(PHONE_VERIFY_SERVICE='dj_site_accounts.authentication.tests.mocks.MockVerifyService')
+    def test_verify_phone_form_does_not_query(self):
+        form = VerifyPhoneForm(user=self.user, data={'code': OTP(self.user).get()})
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+
+    def test_update_last_login_updates_a_single_column(self):
+        with self.assertNumQueries(1):
+            update_last_login(None, self.user)
+
+
+class CreateKeyPreSaveSignalTestCase(TestCase):
+    def test_it_short_circuits_when_update_fields_excludes_key(self):
+        user = UserModel(username='john.doe', email='john@example.com', phone='+201001234567')
+        with mock.patch('dj_site_accounts.common.utils.generate_key') as generate_key:
+            create_key_pre_save_signal(UserModel, user, update_fields=frozenset(['phone_verified_at']))
+        generate_key.assert_not_called()
+        self.assertEquals(user.key, '')
+
+    def test_it_generates_the_key_on_full_saves(self):
+        user = UserModel(username='john.doe', email='john@example.com', phone='+201001234567')
+        create_key_pre_save_signal(UserModel, user, update_fields=None)
+        self.assertTrue(user.key)
+
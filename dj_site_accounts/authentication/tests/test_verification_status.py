@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.utils.timezone import now
+from rest_framework_simplejwt.models import TokenUser
+
+from .factories import UserFactory
+from .models import UserPhone
+from ..caches import VerificationStatus, verification_status_cache
+from ..middleware import VerificationStatusMiddleware
+from ..mixins import VerifyEmailMixin
+from ..permissions import IsEmailVerified, IsPhoneVerified, IsVerified
+from ..signals import invalidate_phone_verification_status_post_save_signal
+from ...common.utils import account_activation_token
+
+
+class VerificationStatusCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+
+    def test_it_reads_the_status_of_a_loaded_user_without_queries(self):
+        self.user.email_verified_at = now()
+        with self.assertNumQueries(0):
+            status = verification_status_cache.get(self.user)
+        self.assertTrue(status.email_verified)
+        self.assertFalse(status.phone_verified)
+        self.assertFalse(status.is_verified)
+
+    def test_it_loads_the_status_of_a_token_user_once(self):
+        token_user = TokenUser({'user_id': self.user.pk})
+        with self.assertNumQueries(1):
+            verification_status_cache.get(token_user)
+        with self.assertNumQueries(0):
+            self.assertEquals(verification_status_cache.get(token_user), 0)
+
+    def test_anonymous_users_are_not_verified(self):
+        self.assertEquals(verification_status_cache.get(AnonymousUser()), 0)
+
+    def test_verifying_the_phone_invalidates_the_status(self):
+        verification_status_cache.get(self.user)
+        self.user.verify_phone()
+        self.assertTrue(verification_status_cache.get(self.user).phone_verified)
+
+    def test_verifying_the_email_invalidates_the_status(self):
+        verification_status_cache.get(self.user)
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        VerifyEmailMixin().verify(uid, account_activation_token.make_token(self.user))
+        self.assertTrue(verification_status_cache.get(TokenUser({'user_id': self.user.pk})).email_verified)
+
+    def test_unrelated_saves_keep_the_status(self):
+        verification_status_cache.get(self.user)
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            verification_status_cache.get(TokenUser({'user_id': self.user.pk}))
+
+    @override_settings(USER_PHONE_MODEL='dj_site_accounts.authentication.tests.models.UserPhone')
+    def test_a_verified_user_phone_verifies_the_phone(self):
+        phone = UserPhone.objects.create(user=self.user, phone='+201001234568')
+        self.assertFalse(verification_status_cache.get(self.user).phone_verified)
+        phone.verify_phone()
+        invalidate_phone_verification_status_post_save_signal(UserPhone, phone, update_fields=['phone_verified_at'])
+        self.assertTrue(verification_status_cache.get(self.user).phone_verified)
+
+
+class VerificationStatusMiddlewareTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_it_exposes_the_status_lazily(self):
+        user = UserFactory(email_verified_at=now(), phone_verified_at=now())
+        request = RequestFactory().get('/')
+        request.user = user
+        with self.assertNumQueries(0):
+            VerificationStatusMiddleware(lambda request: None).process_request(request)
+            self.assertTrue(request.verification_status.is_verified)
+
+
+class VerificationPermissionsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory(email_verified_at=now())
+
+    def has_permission(self, permission, user):
+        return permission().has_permission(SimpleNamespace(user=user), None)
+
+    def test_permissions_check_the_status_flags(self):
+        self.assertTrue(self.has_permission(IsEmailVerified, self.user))
+        self.assertFalse(self.has_permission(IsPhoneVerified, self.user))
+        self.assertFalse(self.has_permission(IsVerified, self.user))
+        self.assertFalse(self.has_permission(IsEmailVerified, AnonymousUser()))
+
+    def test_cached_status_costs_no_query(self):
+        token_user = TokenUser({'user_id': self.user.pk})
+        self.has_permission(IsEmailVerified, token_user)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.has_permission(IsEmailVerified, token_user))
+
+    def test_status_flags_combine(self):
+        status = VerificationStatus(VerificationStatus.EMAIL | VerificationStatus.PHONE)
+        self.assertTrue(status.has(VerificationStatus.ALL))
+        self.assertFalse(VerificationStatus(VerificationStatus.PHONE).has(VerificationStatus.ALL))
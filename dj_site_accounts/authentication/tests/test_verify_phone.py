@@ -0,0 +1,197 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pyotp
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .factories import UserFactory
+from .mocks import MockVerifyService
+from ..forms import VerifyPhoneForm
+from ..verify_phone import OTP, OTPEngine, VerifyPhone, otp_engine, otp_state_store
+
+
+@override_settings(PHONE_VERIFY_SERVICE='dj_site_accounts.authentication.tests.mocks.MockVerifyService',
+                   OTP_MAX_ATTEMPTS=3)
+class OTPStateStoreTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+
+    def test_sending_records_the_issue_time_expiry_and_resends(self):
+        VerifyPhone(self.user, self.user.phone).send()
+        VerifyPhone(self.user, self.user.phone).send()
+        state = otp_state_store.get(self.user, self.user.phone)
+        self.assertEquals(state['expires_at'] - state['issued_at'], 300)
+        self.assertEquals(state['resends'], 2)
+        self.assertEquals(state['attempts'], 0)
+
+    def test_states_are_kept_per_phone(self):
+        otp_state_store.register_attempt(self.user, '+201001234567')
+        self.assertEquals(otp_state_store.get(self.user, '+201001234567')['attempts'], 1)
+        self.assertEquals(otp_state_store.get(self.user, '+201007654321')['attempts'], 0)
+
+    def test_failed_attempts_are_counted(self):
+        verify_phone = VerifyPhone(self.user, self.user.phone)
+        self.assertFalse(verify_phone.check('000000'))
+        self.assertFalse(verify_phone.check('000000'))
+        self.assertEquals(verify_phone.get_state()['attempts'], 2)
+        self.assertFalse(verify_phone.is_locked())
+
+    def test_spent_attempts_skip_the_otp_verification(self):
+        verify_phone = VerifyPhone(self.user, self.user.phone)
+        for _ in range(3):
+            verify_phone.check('000000')
+        self.assertTrue(verify_phone.is_locked())
+        with mock.patch.object(MockVerifyService, 'check') as check:
+            self.assertFalse(verify_phone.check(OTP(self.user).get()))
+        check.assert_not_called()
+
+    def test_a_valid_code_resets_the_attempts(self):
+        verify_phone = VerifyPhone(self.user, self.user.phone)
+        verify_phone.check('000000')
+        self.assertTrue(verify_phone.check(OTP(self.user).get()))
+        self.assertEquals(verify_phone.get_state()['attempts'], 0)
+
+    def test_form_reports_spent_attempts(self):
+        for _ in range(3):
+            form = VerifyPhoneForm(user=self.user, data={'code': '000000'})
+            self.assertFalse(form.is_valid())
+        self.assertEquals(form.errors.as_data()['code'][0].code, 'too_many_attempts')
+
+    def test_clear_forgets_the_state(self):
+        VerifyPhone(self.user, self.user.phone).send()
+        otp_state_store.register_attempt(self.user, self.user.phone)
+        otp_state_store.clear(self.user, self.user.phone)
+        self.assertEquals(otp_state_store.get(self.user, self.user.phone),
+                          {'issued_at': None, 'expires_at': None, 'resends': 0, 'attempts': 0})
+
+
+@override_settings(OTP_VERIFICATION_TYPE='HOTP', OTP_HOTP_LOOK_AHEAD=2)
+class HOTPTestCase(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+
+    def test_every_code_moves_the_counter_forward(self):
+        OTP(self.user).get()
+        OTP(self.user).get()
+        self.user.refresh_from_db()
+        self.assertEquals(self.user.otp_counter, 2)
+
+    def test_codes_within_the_look_ahead_window_are_accepted(self):
+        stale = type(self.user).objects.get(pk=self.user.pk)
+        OTP(self.user).get()
+        code = OTP(self.user).get()
+        self.assertTrue(OTP(stale).authenticate(code))
+
+    def test_codes_beyond_the_look_ahead_window_are_rejected(self):
+        stale = type(self.user).objects.get(pk=self.user.pk)
+        for _ in range(3):
+            code = OTP(self.user).get()
+        self.assertFalse(OTP(stale).authenticate(code))
+
+    def test_used_counters_are_not_checked(self):
+        code = OTP(self.user).get()
+        OTP(self.user).get()
+        self.assertFalse(OTP(self.user).authenticate(code))
+
+
+@override_settings(OTP_VERIFICATION_TYPE='HOTP')
+class HOTPConcurrencyTestCase(TransactionTestCase):
+    def get_code(self, pk):
+        try:
+            while True:
+                try:
+                    user = type(self.user).objects.get(pk=pk)
+                    return OTP(user).get(), user.otp_counter
+                except OperationalError as e:
+                    # the in memory test database raises instead of waiting for the table lock
+                    if 'locked' not in str(e):
+                        raise
+        finally:
+            connection.close()
+
+    def test_concurrent_codes_are_neither_duplicated_nor_skipped(self):
+        self.user = UserFactory()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(self.get_code, [self.user.pk] * 64))
+
+        counters = sorted(counter for _, counter in results)
+        self.assertEquals(counters, list(range(1, 65)))
+        generator = OTP(self.user)
+        self.assertTrue(all(code == generator.get_generator().at(counter) for code, counter in results))
+        self.user.refresh_from_db()
+        self.assertEquals(self.user.otp_counter, 64)
+
+
+class OTPEngineTestCase(TestCase):
+    key = pyotp.random_base32()
+
+    def setUp(self):
+        self.engine = OTPEngine()
+
+    def test_it_accepts_the_codes_pyotp_accepts(self):
+        totp = pyotp.TOTP(self.key, interval=30)
+        for_time = time.time()
+        for offset in (-30, 0, 30):
+            code = totp.at(for_time + offset)
+            self.assertTrue(self.engine.verify_totp(self.key, code, 6, 30, valid_window=1, for_time=for_time))
+        self.assertFalse(self.engine.verify_totp(self.key, totp.at(for_time + 60), 6, 30, 1, for_time))
+
+    def test_it_computes_a_window_once(self):
+        for_time = time.time()
+        code = pyotp.TOTP(self.key, interval=30).at(for_time)
+        with mock.patch.object(pyotp.HOTP, 'at', autospec=True, side_effect=pyotp.HOTP.at) as at:
+            for _ in range(5):
+                self.engine.verify_totp(self.key, code, 6, 30, valid_window=1, for_time=for_time)
+        self.assertEquals(at.call_count, 3)
+
+    def test_it_recomputes_the_codes_of_a_new_time_step(self):
+        for_time = time.time()
+        self.engine.get_totp_codes(self.key, 6, 30, for_time=for_time)
+        self.engine.get_totp_codes(self.key, 6, 30, for_time=for_time + 30)
+        self.assertEquals(len(self.engine.windows), 2)
+
+    @override_settings(OTP_ENGINE_CACHE_SIZE=2)
+    def test_it_keeps_the_most_recently_used_windows(self):
+        keys = [pyotp.random_base32() for _ in range(3)]
+        for key in keys:
+            self.engine.get_hotp_codes(key, 6, 0)
+        self.engine.get_hotp_codes(keys[1], 6, 0)
+        self.assertEquals(len(self.engine.windows), 2)
+        with mock.patch.object(pyotp.HOTP, 'at', autospec=True, side_effect=pyotp.HOTP.at) as at:
+            self.engine.get_hotp_codes(keys[2], 6, 0)
+            self.engine.get_hotp_codes(keys[0], 6, 0)
+        self.assertEquals(at.call_count, 1)
+
+    def test_it_finds_the_hotp_counter_of_a_code(self):
+        code = pyotp.HOTP(self.key).at(12)
+        self.assertEquals(self.engine.find_hotp_counter(self.key, code, 6, 10, look_ahead=3), 12)
+        self.assertIsNone(self.engine.find_hotp_counter(self.key, code, 6, 13, look_ahead=3))
+
+    def test_it_verifies_many_pairs_in_order(self):
+        keys = [pyotp.random_base32() for _ in range(3)]
+        for_time = time.time()
+        pairs = [(keys[0], pyotp.TOTP(keys[0]).at(for_time)), (keys[1], '000000'),
+                 (keys[2], pyotp.TOTP(keys[2]).at(for_time)), (keys[0], pyotp.TOTP(keys[1]).at(for_time))]
+        self.assertEquals(self.engine.verify_totp_many(pairs, 6, 30, for_time=for_time), [True, False, True, False])
+
+
+class AuthenticateManyTestCase(TestCase):
+    def setUp(self):
+        otp_engine.clear()
+        self.users = [UserFactory(), UserFactory()]
+
+    def test_it_checks_totp_codes_of_many_users(self):
+        codes = [OTP(user).get() for user in self.users]
+        self.assertEquals(OTP.authenticate_many([(self.users[0], codes[0]), (self.users[1], codes[0])]),
+                          [True, codes[0] == codes[1]])
+
+    @override_settings(OTP_VERIFICATION_TYPE='HOTP')
+    def test_it_checks_hotp_codes_of_many_users(self):
+        stale = [type(user).objects.get(pk=user.pk) for user in self.users]
+        codes = [OTP(user).get() for user in self.users]
+        self.assertEquals(OTP.authenticate_many(zip(stale, codes)), [True, True])
+        self.assertEquals(OTP.authenticate_many([]), [])
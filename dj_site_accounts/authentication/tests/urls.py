@@ -0,0 +1,13 @@
+from django.http import HttpResponse
+from django.urls import path
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from .views import current_user
+from ..serializers import ThrottledTokenObtainPairSerializer
+
+urlpatterns = [
+    path('verify-email/<uidb64>/<token>/', lambda request, uidb64, token: HttpResponse(), name='verify-email'),
+    path('api/me/', current_user, name='current-user'),
+    path('api/token/', TokenObtainPairView.as_view(serializer_class=ThrottledTokenObtainPairSerializer),
+         name='token-obtain-pair'),
+]
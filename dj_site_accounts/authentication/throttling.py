@@ -0,0 +1,157 @@
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from rest_framework.throttling import BaseThrottle
+
+from ..common.utils import get_settings_value
+
+
+class LoginThrottled(PermissionDenied):
+    """Raised when a login attempt is made while its identifier or client ip is locked out"""
+
+    def __init__(self, wait):
+        self.wait = wait
+        super(LoginThrottled, self).__init__("Too many login attempts, retry in {} seconds".format(wait))
+
+
+class LoginThrottle:
+    """
+    Sliding window login failure counters kept in Django's cache.
+
+    Failures are counted per normalized identifier and per client ip, once a scope spends
+    its budget of failures within the window it is locked out; every further lockout of
+    the same scope doubles, up to the maximum lockout.
+
+    LOGIN_THROTTLE_IDENTIFIER_BUDGET and LOGIN_THROTTLE_IP_BUDGET are (failures, window seconds),
+    LOGIN_THROTTLE_LOCKOUT is (first lockout seconds, maximum lockout seconds).
+    """
+    key_prefix = 'dj_site_accounts:login-throttle'
+
+    @property
+    def enabled(self):
+        return get_settings_value('LOGIN_THROTTLE_ENABLED', False)
+
+    @property
+    def cache(self):
+        return caches[get_settings_value('LOGIN_THROTTLE_CACHE_ALIAS', 'default')]
+
+    def get_budgets(self):
+        return {
+            'identifier': get_settings_value('LOGIN_THROTTLE_IDENTIFIER_BUDGET', (5, 300)),
+            'ip': get_settings_value('LOGIN_THROTTLE_IP_BUDGET', (20, 300)),
+        }
+
+    def get_lockout(self):
+        return get_settings_value('LOGIN_THROTTLE_LOCKOUT', (60, 3600))
+
+    def get_client_ip(self, request):
+        """
+        returns REMOTE_ADDR, or with LOGIN_THROTTLE_IP_HEADER the address appended to that header
+        by the outermost of the LOGIN_THROTTLE_PROXY_COUNT trusted proxies; the entries before it
+        are sent by the client and can not be trusted
+        """
+        if request is None:
+            return None
+        header = get_settings_value('LOGIN_THROTTLE_IP_HEADER', None)
+        if header and request.META.get(header):
+            addresses = [address.strip() for address in request.META[header].split(',') if address.strip()]
+            proxy_count = get_settings_value('LOGIN_THROTTLE_PROXY_COUNT', 1)
+            if addresses:
+                return addresses[-min(proxy_count, len(addresses))]
+        return request.META.get('REMOTE_ADDR')
+
+    def get_scopes(self, request, identifier):
+        """returns {scope: key} for the identifier and client ip of the attempt"""
+        values = {
+            'identifier': str(identifier).strip().lower() if identifier else None,
+            'ip': self.get_client_ip(request),
+        }
+        return {scope: self.make_key(scope, value) for scope, value in values.items() if value}
+
+    def make_key(self, scope, value):
+        return '{}:{}:{}'.format(self.key_prefix, scope, hashlib.md5(value.encode()).hexdigest())
+
+    def get_wait(self, request, identifier):
+        """returns the seconds left on the longest lockout of the attempt, 0 when not locked out"""
+        keys = ['{}:locked'.format(key) for key in self.get_scopes(request, identifier).values()]
+        now = time.time()
+        return max([int(until - now) + 1 for until in self.cache.get_many(keys).values() if until > now], default=0)
+
+    def check(self, request, identifier):
+        if not self.enabled:
+            return
+        wait = self.get_wait(request, identifier)
+        if wait:
+            raise LoginThrottled(wait)
+
+    def hit(self, key, window):
+        """counts a failure and returns the failures estimated over the last window"""
+        now = time.time()
+        bucket = int(now // window)
+        current_key, previous_key = '{}:{}'.format(key, bucket), '{}:{}'.format(key, bucket - 1)
+
+        self.cache.add(current_key, 0, window * 2)
+        current = self.cache.incr(current_key)
+        previous = self.cache.get(previous_key, 0)
+        return current + previous * (1 - (now % window) / window)
+
+    def lock(self, key):
+        first, maximum = self.get_lockout()
+        strikes_key = '{}:strikes'.format(key)
+        self.cache.add(strikes_key, 0, maximum * 2)
+        strikes = self.cache.incr(strikes_key)
+        duration = min(first * 2 ** (strikes - 1), maximum)
+        self.cache.set('{}:locked'.format(key), time.time() + duration, duration)
+
+    def register_failure(self, request, identifier):
+        if not self.enabled:
+            return
+        budgets = self.get_budgets()
+        for scope, key in self.get_scopes(request, identifier).items():
+            failures, window = budgets[scope]
+            if self.hit(key, window) >= failures:
+                self.lock(key)
+
+    def reset(self, request, identifier):
+        """forgets the failures of the identifier after a successful login"""
+        if not self.enabled:
+            return
+        key = self.get_scopes(None, identifier).get('identifier')
+        if key:
+            window = self.get_budgets()['identifier'][1]
+            bucket = int(time.time() // window)
+            self.cache.delete_many(['{}:{}'.format(key, bucket), '{}:{}'.format(key, bucket - 1),
+                                    '{}:strikes'.format(key), '{}:locked'.format(key)])
+
+
+login_throttle = LoginThrottle()
+
+
+class LoginRateThrottle(BaseThrottle):
+    """
+    Applies the login throttle to API login endpoints, e.g. the JWT token views,
+    before their serializer authenticates. The identifier is read from the
+    LOGIN_THROTTLE_IDENTIFIER_FIELD request field, the user model's USERNAME_FIELD
+    by default like simplejwt's token serializers. Only checks the lockouts, the
+    failures are counted by the backend, e.g. through ThrottledTokenObtainPairSerializer.
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_identifier_field(self):
+        return get_settings_value('LOGIN_THROTTLE_IDENTIFIER_FIELD', None) or get_user_model().USERNAME_FIELD
+
+    def allow_request(self, request, view):
+        try:
+            login_throttle.check(request, request.data.get(self.get_identifier_field()))
+        except LoginThrottled as e:
+            self.wait_seconds = e.wait
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,170 @@
+import time
+
+import jwt
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models import Max, Min
+from django.utils.timezone import now
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .writers import BatchWriter
+from ..common.utils import get_settings_value
+
+
+class JWTTokenService(BatchWriter):
+    """
+    Issues the JWT pair of a user, signing every token once.
+
+    The signing key, read from JWT_SIGNING_KEY_FILE when set (a PEM private key, for the RS,
+    PS and ES algorithms only, whose tokens simplejwt verifies with SIMPLE_JWT's VERIFYING_KEY)
+    or SIMPLE_JWT's SIGNING_KEY otherwise, is loaded and parsed once and reused for every token.
+
+    JWT_OUTSTANDING_TOKEN_MODE selects how refresh tokens are recorded for token_blacklist:
+    - 'immediate' (default) inserts the OutstandingToken row within the request
+    - 'deferred' queues the row for the BatchWriter thread, the row is inserted within the
+      request once JWT_OUTSTANDING_TOKEN_QUEUE_LIMIT rows are waiting
+    - 'disabled' never records them
+    """
+    settings_prefix = 'JWT_OUTSTANDING_TOKEN'
+    noun = 'outstanding tokens'
+    thread_name = 'outstanding-token-writer'
+
+    def __init__(self):
+        super(JWTTokenService, self).__init__()
+        self.signing_key = None
+
+    @property
+    def mode(self):
+        if not apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+            return 'disabled'
+        return super(JWTTokenService, self).mode
+
+    def load_signing_key(self):
+        path = get_settings_value('JWT_SIGNING_KEY_FILE', None)
+        if path:
+            if api_settings.ALGORITHM.startswith('HS'):
+                raise ImproperlyConfigured(
+                    "JWT_SIGNING_KEY_FILE can not be used with {}, simplejwt verifies HMAC signed tokens with "
+                    "SIMPLE_JWT['SIGNING_KEY']".format(api_settings.ALGORITHM))
+            with open(path) as file:
+                key = file.read()
+        else:
+            key = api_settings.SIGNING_KEY
+        return jwt.PyJWS().get_algorithm_by_name(api_settings.ALGORITHM).prepare_key(key)
+
+    def get_signing_key(self):
+        if self.signing_key is None:
+            self.signing_key = self.load_signing_key()
+        return self.signing_key
+
+    def clear(self):
+        self.signing_key = None
+
+    def encode(self, payload):
+        payload = payload.copy()
+        if api_settings.AUDIENCE is not None:
+            payload['aud'] = api_settings.AUDIENCE
+        if api_settings.ISSUER is not None:
+            payload['iss'] = api_settings.ISSUER
+        return jwt.encode(payload, self.get_signing_key(), algorithm=api_settings.ALGORITHM)
+
+    def get_user_tokens(self, user):
+        user_id = getattr(user, api_settings.USER_ID_FIELD)
+        if not isinstance(user_id, int):
+            user_id = str(user_id)
+
+        # built without RefreshToken.for_user, which inserts the outstanding token itself
+        refresh = RefreshToken()
+        refresh[api_settings.USER_ID_CLAIM] = user_id
+        refresh_token = self.encode(refresh.payload)
+        self.record(user, refresh, refresh_token)
+        return {
+            "access_token": self.encode(refresh.access_token.payload),
+            "refresh_token": refresh_token,
+        }
+
+    def record(self, user, refresh, encoded):
+        mode = self.mode
+        if mode == 'disabled':
+            return
+        row = {
+            'user_id': user.pk,
+            'jti': refresh[api_settings.JTI_CLAIM],
+            'token': encoded,
+            'created_at': refresh.current_time,
+            'expires_at': datetime_from_epoch(refresh['exp']),
+        }
+        if mode != 'deferred' or not self.put(row):
+            self.get_model().objects.create(**row)
+
+    def get_model(self):
+        return apps.get_model('token_blacklist', 'OutstandingToken')
+
+    def write_batch(self, batch):
+        """writes the rows of the batch not written yet, returns the number of written rows"""
+        model = self.get_model()
+        # a token blacklisted before its row was written already has one
+        existing = set(model.objects.filter(jti__in=[row['jti'] for row in batch]).values_list('jti', flat=True))
+        rows = [model(**row) for row in batch if row['jti'] not in existing]
+        # conflicts are still ignored for the tokens blacklisted in the meantime
+        model.objects.bulk_create(rows, ignore_conflicts=True)
+        return len(rows)
+
+
+jwt_token_service = JWTTokenService()
+
+
+class ExpiredTokenPruner:
+    """
+    Deletes the expired outstanding tokens and their blacklist entries in batches of
+    JWT_PRUNE_BATCH_SIZE primary keys, one short transaction per batch.
+
+    Every batch deletes a primary key range of rows which expired before the pruning
+    started, so several nodes running it at once only delete the same rows twice.
+    """
+
+    def __init__(self, batch_size=None, pause=None):
+        self.batch_size = batch_size or get_settings_value('JWT_PRUNE_BATCH_SIZE', 1000)
+        self.pause = pause if pause is not None else get_settings_value('JWT_PRUNE_PAUSE', 0)
+
+    def get_range(self, cutoff):
+        """returns the lowest and highest primary keys of the expired outstanding tokens"""
+        outstanding_token = apps.get_model('token_blacklist', 'OutstandingToken')
+        bounds = outstanding_token.objects.filter(expires_at__lte=cutoff).aggregate(low=Min('pk'), high=Max('pk'))
+        return bounds['low'], bounds['high']
+
+    def prune_batch(self, start, end, cutoff):
+        """deletes the expired tokens with start <= pk < end, returns (outstanding, blacklisted)"""
+        from .signals import forget_revocation_post_delete_signal
+
+        outstanding_token = apps.get_model('token_blacklist', 'OutstandingToken')
+        blacklisted_token = apps.get_model('token_blacklist', 'BlacklistedToken')
+        expired = outstanding_token.objects.filter(pk__gte=start, pk__lt=end, expires_at__lte=cutoff)
+        # the revocations of expired tokens have already left the revocation index cache, without
+        # the per row post_delete receiver the blacklist entries are cascaded by a single query
+        disconnected = post_delete.disconnect(forget_revocation_post_delete_signal, sender=blacklisted_token)
+        try:
+            with transaction.atomic():
+                _, deleted = expired.only('pk').delete()
+        finally:
+            if disconnected:
+                post_delete.connect(forget_revocation_post_delete_signal, sender=blacklisted_token)
+        return deleted.get(outstanding_token._meta.label, 0), deleted.get(blacklisted_token._meta.label, 0)
+
+    def prune(self, cutoff=None):
+        """deletes every token expired before cutoff, now by default, returns (outstanding, blacklisted)"""
+        cutoff = cutoff or now()
+        low, high = self.get_range(cutoff)
+        total_outstanding, total_blacklisted = 0, 0
+        if low is None:
+            return total_outstanding, total_blacklisted
+        for start in range(low, high + 1, self.batch_size):
+            outstanding, blacklisted = self.prune_batch(start, start + self.batch_size, cutoff)
+            total_outstanding, total_blacklisted = total_outstanding + outstanding, total_blacklisted + blacklisted
+            if self.pause:
+                time.sleep(self.pause)
+        return total_outstanding, total_blacklisted
@@ -0,0 +1,280 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import pyotp
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from pyotp.utils import strings_equal
+
+from ..common.settings import resolved_settings
+from ..common.utils import get_settings_value
+
+
+class OTPEngine:
+    """
+    Computes the codes a key accepts for a time step or HOTP counter once and keeps them in a
+    small in process cache, so retries and batches of checks against the same key do not
+    repeat the HMAC computations.
+
+    TOTP codes are kept until their time step ends, HOTP codes for OTP_ENGINE_CACHE_TIMEOUT
+    seconds; at most OTP_ENGINE_CACHE_SIZE windows are kept, the least recently used are
+    dropped first. The cache is keyed by a digest of the key, never the key itself, and
+    codes are compared against every code of the window in constant time.
+    """
+
+    def __init__(self):
+        self.windows = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return get_settings_value('OTP_ENGINE_CACHE_SIZE', 1024)
+
+    @property
+    def timeout(self):
+        return get_settings_value('OTP_ENGINE_CACHE_TIMEOUT', 300)
+
+    def get_window(self, key, digits, first, last, expires_at):
+        """returns the codes of the counters first to last, computed once per window"""
+        cache_key = (hashlib.blake2b(key.encode(), digest_size=16).digest(), digits, first, last)
+        with self.lock:
+            cached = self.windows.get(cache_key)
+            if cached is not None and cached[0] > time.time():
+                self.windows.move_to_end(cache_key)
+                return cached[1]
+
+        generator = pyotp.HOTP(key, digits=digits)
+        codes = tuple(generator.at(counter) for counter in range(first, last + 1))
+        with self.lock:
+            self.windows[cache_key] = (expires_at, codes)
+            self.windows.move_to_end(cache_key)
+            while len(self.windows) > self.max_size:
+                self.windows.popitem(last=False)
+        return codes
+
+    def match(self, codes, code):
+        """returns the index of code within codes, None when it matches none of them"""
+        matched = None
+        # every code is compared so the timing does not tell which one matched
+        for index, candidate in enumerate(codes):
+            if strings_equal(str(code), candidate):
+                matched = index
+        return matched
+
+    def get_totp_codes(self, key, digits, interval, valid_window=0, for_time=None):
+        step = int((for_time or time.time()) / interval)
+        return self.get_window(key, digits, step - valid_window, step + valid_window, (step + 1) * interval)
+
+    def get_hotp_codes(self, key, digits, counter, look_ahead=0):
+        return self.get_window(key, digits, counter, counter + look_ahead, time.time() + self.timeout)
+
+    def verify_totp(self, key, code, digits, interval, valid_window=0, for_time=None):
+        return self.match(self.get_totp_codes(key, digits, interval, valid_window, for_time), code) is not None
+
+    def find_hotp_counter(self, key, code, digits, counter, look_ahead=0):
+        """returns the counter of the code within the look ahead window, None when none matches"""
+        index = self.match(self.get_hotp_codes(key, digits, counter, look_ahead), code)
+        return None if index is None else counter + index
+
+    def verify_totp_many(self, pairs, digits, interval, valid_window=0, for_time=None):
+        """checks (key, code) pairs at the same instant, returns a list of booleans in the same order"""
+        for_time = for_time or time.time()
+        return [self.verify_totp(key, code, digits, interval, valid_window, for_time) for key, code in pairs]
+
+    def find_hotp_counters(self, triples, digits, look_ahead=0):
+        """checks (key, counter, code) triples, returns the matched counters, None for the rejected codes"""
+        return [self.find_hotp_counter(key, code, digits, counter, look_ahead) for key, counter, code in triples]
+
+    def clear(self):
+        with self.lock:
+            self.windows.clear()
+
+
+otp_engine = OTPEngine()
+
+
+class OTP:
+    """
+    One time password of a user, TOTP or HOTP based on OTP_VERIFICATION_TYPE.
+
+    HOTP codes are accepted for the stored counter and the OTP_HOTP_LOOK_AHEAD counters
+    after it, so a code sent while the user instance was loaded is still accepted; TOTP
+    codes for the current time step and the OTP_TOTP_VALID_WINDOW steps around it.
+    Codes are checked through otp_engine.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.digits = get_settings_value('PHONE_VERIFICATION_CODE_LENGTH', 6)
+        self.interval = get_settings_value('PHONE_VERIFICATION_CODE_INTERVAL', 300)
+
+    @property
+    def is_hotp(self):
+        return get_settings_value('OTP_VERIFICATION_TYPE') == 'HOTP'
+
+    @property
+    def look_ahead(self):
+        return get_settings_value('OTP_HOTP_LOOK_AHEAD', 3)
+
+    def get_generator(self):
+        if self.is_hotp:
+            return pyotp.HOTP(self.user.key, digits=self.digits)
+        return pyotp.TOTP(self.user.key, digits=self.digits, interval=self.interval)
+
+    def advance_counter(self):
+        """moves the HOTP counter forward in the database, concurrent calls never get the same value"""
+        manager = type(self.user)._default_manager
+        users = manager.filter(pk=self.user.pk)
+        with transaction.atomic(using=manager.db):
+            users.update(otp_counter=F('otp_counter') + 1)
+            self.user.otp_counter = users.values_list('otp_counter', flat=True).get()
+        return self.user.otp_counter
+
+    def get(self):
+        """returns a new code, for HOTP the counter moves forward on every code"""
+        if self.is_hotp:
+            return self.get_generator().at(self.advance_counter())
+        return self.get_generator().now()
+
+    def find_counter(self, code):
+        """returns the HOTP counter of the code within the look ahead window, None when none matches"""
+        return otp_engine.find_hotp_counter(self.user.key, code, self.digits, self.user.otp_counter, self.look_ahead)
+
+    def authenticate(self, code):
+        if self.is_hotp:
+            return self.find_counter(code) is not None
+        return otp_engine.verify_totp(self.user.key, code, self.digits, self.interval,
+                                      get_settings_value('OTP_TOTP_VALID_WINDOW', 0))
+
+    @classmethod
+    def authenticate_many(cls, user_codes):
+        """
+        checks (user, code) pairs, e.g. a batch of SMS replies, returns a list of booleans in
+        the same order; the codes of a user are computed once for the whole batch
+        """
+        user_codes = list(user_codes)
+        if not user_codes:
+            return []
+        otp = cls(user_codes[0][0])
+        if otp.is_hotp:
+            counters = otp_engine.find_hotp_counters(
+                [(user.key, user.otp_counter, code) for user, code in user_codes], otp.digits, otp.look_ahead)
+            return [counter is not None for counter in counters]
+        return otp_engine.verify_totp_many([(user.key, code) for user, code in user_codes], otp.digits,
+                                           otp.interval, get_settings_value('OTP_TOTP_VALID_WINDOW', 0))
+
+
+class BaseVerifyPhoneService:
+    """Sends the otp code to the phone and checks the code sent back by the user"""
+
+    def __init__(self, user, phone):
+        self.user = user
+        self.phone = phone
+        self.otp = OTP(user)
+
+    def send(self):
+        raise NotImplementedError('subclasses of BaseVerifyPhoneService must provide a send() method')
+
+    def check(self, code):
+        raise NotImplementedError('subclasses of BaseVerifyPhoneService must provide a check() method')
+
+
+class OTPStateStore:
+    """
+    The verification state of a (user, phone) pair kept in Django's cache.
+
+    The state holds when the last code was issued and expires and how many codes were sent
+    within OTP_RESEND_WINDOW seconds. Failed attempts are counted with cache incr before a
+    code is verified, once OTP_MAX_ATTEMPTS attempts are spent within OTP_ATTEMPTS_WINDOW
+    seconds (the code interval by default) every further attempt is refused without
+    running the OTP verification.
+    """
+    key_prefix = 'dj_site_accounts:otp'
+
+    @property
+    def cache(self):
+        return caches[get_settings_value('OTP_STATE_CACHE_ALIAS', 'default')]
+
+    @property
+    def max_attempts(self):
+        return get_settings_value('OTP_MAX_ATTEMPTS', 5)
+
+    @property
+    def attempts_window(self):
+        return get_settings_value('OTP_ATTEMPTS_WINDOW', None) or get_settings_value(
+            'PHONE_VERIFICATION_CODE_INTERVAL', 300)
+
+    @property
+    def resend_window(self):
+        return get_settings_value('OTP_RESEND_WINDOW', 3600)
+
+    def make_key(self, user, phone, name):
+        return '{}:{}:{}:{}'.format(self.key_prefix, user.pk, hashlib.md5(str(phone).encode()).hexdigest(), name)
+
+    def get(self, user, phone):
+        """returns the issued_at, expires_at, resends and attempts of the pair, None when unknown"""
+        keys = {name: self.make_key(user, phone, name) for name in ('state', 'resends', 'attempts')}
+        values = self.cache.get_many(keys.values())
+        state = values.get(keys['state']) or {}
+        return {
+            'issued_at': state.get('issued_at'),
+            'expires_at': state.get('expires_at'),
+            'resends': values.get(keys['resends'], 0),
+            'attempts': values.get(keys['attempts'], 0),
+        }
+
+    def issue(self, user, phone, interval):
+        """records a code sent now and valid for interval seconds"""
+        issued_at = int(time.time())
+        self.cache.set(self.make_key(user, phone, 'state'),
+                       {'issued_at': issued_at, 'expires_at': issued_at + interval}, interval)
+        resends_key = self.make_key(user, phone, 'resends')
+        self.cache.add(resends_key, 0, self.resend_window)
+        return self.cache.incr(resends_key)
+
+    def register_attempt(self, user, phone):
+        """counts an attempt, returns False when the attempts are already spent"""
+        attempts_key = self.make_key(user, phone, 'attempts')
+        self.cache.add(attempts_key, 0, self.attempts_window)
+        return self.cache.incr(attempts_key) <= self.max_attempts
+
+    def is_locked(self, user, phone):
+        return self.cache.get(self.make_key(user, phone, 'attempts'), 0) >= self.max_attempts
+
+    def reset_attempts(self, user, phone):
+        self.cache.delete(self.make_key(user, phone, 'attempts'))
+
+    def clear(self, user, phone):
+        self.cache.delete_many([self.make_key(user, phone, name) for name in ('state', 'resends', 'attempts')])
+
+
+otp_state_store = OTPStateStore()
+
+
+class VerifyPhone:
+    def __init__(self, user, phone):
+        self.user = user
+        self.phone = phone
+        self.service = resolved_settings.get_phone_verify_service()(user, phone)
+
+    def get_state(self):
+        return otp_state_store.get(self.user, self.phone)
+
+    def is_locked(self):
+        return otp_state_store.is_locked(self.user, self.phone)
+
+    def send(self):
+        otp_state_store.issue(self.user, self.phone, self.service.otp.interval)
+        return self.service.send()
+
+    def check(self, code):
+        """checks the code unless the attempts are spent, a valid code resets them"""
+        if not otp_state_store.register_attempt(self.user, self.phone):
+            return False
+        success = self.service.check(code)
+        if success:
+            otp_state_store.reset_attempts(self.user, self.phone)
+        return success
@@ -0,0 +1,104 @@
+import atexit
+import logging
+import queue
+import threading
+
+from django.db import close_old_connections
+
+from ..common.utils import get_settings_value
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Writes the rows queued by requests in batches from a background thread.
+
+    <settings_prefix>_MODE selects 'immediate', 'deferred' or 'disabled', the meaning of
+    'immediate' is up to the subclass. Deferred rows wait in a queue of at most
+    <settings_prefix>_QUEUE_LIMIT rows for a daemon thread which writes them in batches of
+    <settings_prefix>_BATCH_SIZE, at least every <settings_prefix>_FLUSH_INTERVAL seconds and
+    once more at exit.
+    """
+    settings_prefix = None
+    noun = 'rows'
+    thread_name = 'batch-writer'
+    default_flush_interval = 2
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+        self.flushes_at_exit = False
+
+    def get_setting(self, name, default):
+        return get_settings_value('{}_{}'.format(self.settings_prefix, name), default)
+
+    @property
+    def mode(self):
+        return self.get_setting('MODE', 'immediate')
+
+    @property
+    def batch_size(self):
+        return self.get_setting('BATCH_SIZE', 500)
+
+    @property
+    def flush_interval(self):
+        return self.get_setting('FLUSH_INTERVAL', self.default_flush_interval)
+
+    @property
+    def queue_limit(self):
+        return self.get_setting('QUEUE_LIMIT', 10000)
+
+    def is_full(self):
+        return self.queue.qsize() >= self.queue_limit
+
+    def put(self, row):
+        """queues the row for the background thread, returns False when the queue is full"""
+        if self.is_full():
+            return False
+        self.queue.put(row)
+        self.start()
+        return True
+
+    def start(self):
+        with self.lock:
+            if not self.flushes_at_exit:
+                atexit.register(self.flush)
+                self.flushes_at_exit = True
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name=self.thread_name, daemon=True)
+                self.worker.start()
+
+    def get_batch(self, timeout=None):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def write_batch(self, batch):
+        """writes the batch, returns the number of written rows"""
+        raise NotImplementedError('subclasses of BatchWriter must provide a write_batch() method')
+
+    def flush(self):
+        """writes everything queued so far, returns the number of written rows"""
+        written = 0
+        batch = self.get_batch(timeout=0)
+        while batch:
+            written += self.write_batch(batch)
+            batch = self.get_batch(timeout=0)
+        return written
+
+    def run(self):
+        while True:
+            batch = self.get_batch(timeout=self.flush_interval)
+            if batch:
+                try:
+                    close_old_connections()
+                    self.write_batch(batch)
+                except Exception:
+                    logger.exception("Failed to write %d %s", len(batch), self.noun)
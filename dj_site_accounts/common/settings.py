@@ -0,0 +1,92 @@
+from django.core.exceptions import ImproperlyConfigured
+
+from .utils import get_settings_value, import_class_or_function
+
+
+class ResolvedSettings:
+    """
+    Resolves the dotted path settings of the package once and keeps the imported
+    classes and functions in memory.
+
+    load() imports and validates every configured dotted path setting the package
+    declares, it runs when the authentication app is ready; other callback settings
+    are only resolved by get_callback(); clear() forgets everything and is called on
+    Django's setting_changed signal so overridden settings in tests are picked up.
+    """
+    class_settings = {
+        'LOGIN_FORM': 'django.contrib.auth.forms.AuthenticationForm',
+        'REGISTER_FORM': 'dj_site_accounts.authentication.forms.UserCreationForm',
+        'USER_PHONE_MODEL': None,
+        'PHONE_VERIFY_SERVICE': None,
+        'PASSWORD_HASHING_POOL_EXECUTOR': 'concurrent.futures.ThreadPoolExecutor',
+    }
+    list_settings = {
+        'SMS_PROVIDERS': [],
+    }
+    callback_settings = ['REGISTER_CALLBACK']
+
+    def __init__(self):
+        self.resolved = {}
+
+    def get_setting_keys(self):
+        """returns the dotted path settings declared by the package, the ones load() validates"""
+        return list(self.class_settings) + self.callback_settings
+
+    def resolve(self, settings_key, default=None):
+        return self.import_value(settings_key, get_settings_value(settings_key, None) or default)
+
+    def import_value(self, settings_key, value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return import_class_or_function(value)
+        except (ImportError, AttributeError, ValueError) as e:
+            raise ImproperlyConfigured("{} = '{}' could not be imported: {}".format(settings_key, value, e))
+
+    def get(self, settings_key, default=None):
+        default = default if default is not None else self.class_settings.get(settings_key)
+        key = (settings_key, default)
+        if key not in self.resolved:
+            self.resolved[key] = self.resolve(settings_key, default)
+        return self.resolved[key]
+
+    def get_list(self, settings_key):
+        """resolves a setting holding a list of dotted paths"""
+        key = (settings_key, list)
+        if key not in self.resolved:
+            paths = get_settings_value(settings_key, None) or self.list_settings.get(settings_key, [])
+            self.resolved[key] = [self.import_value(settings_key, path) for path in paths]
+        return self.resolved[key]
+
+    def load(self):
+        """imports every configured dotted path setting, raises ImproperlyConfigured for broken ones"""
+        for settings_key in self.get_setting_keys():
+            if get_settings_value(settings_key, None):
+                self.get(settings_key)
+        for settings_key in self.list_settings:
+            self.get_list(settings_key)
+
+    def clear(self):
+        self.resolved.clear()
+
+    def get_login_form(self):
+        return self.get('LOGIN_FORM')
+
+    def get_register_form(self):
+        return self.get('REGISTER_FORM')
+
+    def get_user_phone_model(self):
+        return self.get('USER_PHONE_MODEL')
+
+    def get_phone_verify_service(self):
+        return self.get('PHONE_VERIFY_SERVICE')
+
+    def get_sms_providers(self):
+        return self.get_list('SMS_PROVIDERS')
+
+    def get_callback(self, settings_key):
+        """resolves any *_CALLBACK setting on first use, only the declared ones are validated by load()"""
+        return self.get(settings_key)
+
+
+resolved_settings = ResolvedSettings()
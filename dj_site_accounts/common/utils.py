@@ -1,39 +1,140 @@
 import importlib
+import time
 from collections import defaultdict
 
 import pyotp
 from django.conf import settings
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import send_mail
+from django.core import signing
 from django.db.models.signals import *
-from django.template.loader import render_to_string
-from django.utils.encoding import force_bytes
-from django.utils.http import urlsafe_base64_encode
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import base36_to_int
 from django.utils.translation import gettext_lazy as _
-from rest_framework_simplejwt.tokens import RefreshToken
 
 
 class TokenGenerator(PasswordResetTokenGenerator):
+    # the user columns check_token() needs besides the pk
+    user_fields = ('is_active',)
+
     def _make_hash_value(self, user, timestamp):
         return (
                 str(user.pk) + str(timestamp) + str(user.is_active)
         )
 
+    def make_tokens(self, users):
+        """returns the token of every user, all sharing one timestamp"""
+        timestamp = self._num_seconds(self._now())
+        return [self._make_token_with_timestamp(user, timestamp) for user in users]
+
+    def get_timestamp(self, token):
+        """returns the timestamp of a well formed, unexpired token, None otherwise"""
+        try:
+            ts_b36, _hash = str(token).split('-')
+            timestamp = base36_to_int(ts_b36)
+        except ValueError:
+            return None
+        # tokens older than Django 3.1 carry days in a shorter timestamp, they are never issued here
+        if len(ts_b36) < 4 or not 0 <= self._num_seconds(self._now()) - timestamp <= settings.PASSWORD_RESET_TIMEOUT:
+            return None
+        return timestamp
+
+    def check_token(self, user, token):
+        """checks the token against the current algorithm only, without the legacy fallbacks"""
+        if not (user and token):
+            return False
+        timestamp = self.get_timestamp(token)
+        return timestamp is not None and constant_time_compare(self._make_token_with_timestamp(user, timestamp), token)
+
 
 account_activation_token = TokenGenerator()
 
 
+class SignedTokenGenerator:
+    """
+    Stateless tokens signed with django.core.signing, carrying the uid, purpose, issue and
+    expiry times and a keyed hash of the user fields which must not change.
+
+    read() tells whether a token is genuine and unexpired without any database access, and
+    make_token_from_values() mints tokens from column values without loading user rows.
+    """
+    salt = 'dj_site_accounts.common.utils.SignedTokenGenerator'
+
+    def __init__(self, purpose, user_fields=('is_active',), max_age_setting='PASSWORD_RESET_TIMEOUT'):
+        self.purpose = purpose
+        self.user_fields = tuple(user_fields)
+        self.max_age_setting = max_age_setting
+
+    @property
+    def signer(self):
+        return signing.Signer(salt='{}:{}'.format(self.salt, self.purpose))
+
+    def _now(self):
+        return int(time.time())
+
+    def get_max_age(self):
+        return get_settings_value(self.max_age_setting, settings.PASSWORD_RESET_TIMEOUT)
+
+    def make_state_hash(self, values):
+        value = '|'.join(str(values.get(field)) for field in self.user_fields)
+        return salted_hmac(self.salt, value, algorithm='sha256').hexdigest()[:16]
+
+    def make_token_from_values(self, uid, values, issued_at=None):
+        issued_at = issued_at or self._now()
+        payload = [str(uid), self.purpose, issued_at, issued_at + self.get_max_age(), self.make_state_hash(values)]
+        return self.signer.sign_object(payload, compress=True)
+
+    def get_values(self, user):
+        return {field: getattr(user, field) for field in self.user_fields}
+
+    def make_token(self, user):
+        return self.make_token_from_values(user.pk, self.get_values(user))
+
+    def make_tokens(self, users):
+        issued_at = self._now()
+        return [self.make_token_from_values(user.pk, self.get_values(user), issued_at) for user in users]
+
+    def read(self, token):
+        """returns the payload of a genuine, unexpired token of this purpose, None otherwise"""
+        try:
+            uid, purpose, issued_at, expires_at, state_hash = self.signer.unsign_object(str(token))
+        except (signing.BadSignature, ValueError, TypeError):
+            return None
+        if purpose != self.purpose or not issued_at <= self._now() <= expires_at:
+            return None
+        return {'uid': uid, 'issued_at': issued_at, 'expires_at': expires_at, 'state_hash': state_hash}
+
+    def get_timestamp(self, token):
+        payload = self.read(token)
+        return payload['issued_at'] if payload else None
+
+    def check_token(self, user, token):
+        if not (user and token):
+            return False
+        payload = self.read(token)
+        return payload is not None and payload['uid'] == str(user.pk) and constant_time_compare(
+            payload['state_hash'], self.make_state_hash(self.get_values(user)))
+
+
+signed_email_verification_token = SignedTokenGenerator(
+    'email-verification', user_fields=('is_active', 'email'), max_age_setting='EMAIL_VERIFICATION_TOKEN_MAX_AGE')
+
+
+def get_email_verification_token_generator():
+    """returns the generator of EMAIL_VERIFICATION_TOKEN, 'hmac' (default) or 'signed'"""
+    if get_settings_value('EMAIL_VERIFICATION_TOKEN', 'hmac') == 'signed':
+        return signed_email_verification_token
+    return account_activation_token
+
+
 def send_email_verification(request, user):
-    current_site = get_current_site(request)
+    from ..authentication.emails import get_email_delivery
+    from ..authentication.renderers import verification_email_renderer
+
     mail_subject = _('Activate your account.')
-    message = render_to_string('dj_accounts/emails/email_confirmation.html', {
-        'user': user,
-        'domain': current_site.domain,
-        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-        'token': account_activation_token.make_token(user),
-    })
-    send_mail(mail_subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    message = verification_email_renderer.render(user, get_current_site(request),
+                                                 protocol='https' if request.is_secure() else 'http')
+    get_email_delivery().deliver(mail_subject, message, [user.email])
 
 
 def get_settings_value(settings_key, default_value=None):
@@ -48,42 +149,34 @@ def import_class_or_function(name):
 
 
 def get_class_from_settings(settings_key, default_class=None):
-    class_name = get_settings_value(settings_key, None)
-
-    if not class_name:
-        class_name = default_class
-
-    return import_class_or_function(class_name) if type(class_name) is str else class_name
+    from .settings import resolved_settings
+    return resolved_settings.get(settings_key, default_class)
 
 
 def get_user_tokens(user):
-    tokens = RefreshToken.for_user(user)
-    return {
-        "access_token": str(tokens.access_token),
-        "refresh_token": str(tokens)
-    }
+    from ..authentication.tokens import jwt_token_service
+    return jwt_token_service.get_user_tokens(user)
 
 
 def get_errors(errors):
     return {name: error[0] for name, error in errors.items()}
 
 
-def is_unique(key):
+def generate_key():
+    """ User otp key generator, uniqueness is left to the unique constraint on the key column """
+    return pyotp.random_base32()
+
+
+def generate_keys(count):
+    """ Generates count unique otp keys, checking each batch against the database with a single query """
     from django.contrib.auth import get_user_model
     UserModel = get_user_model()
-    try:
-        UserModel.objects.get(key=key)
-    except UserModel.DoesNotExist:
-        return True
-    return False
 
-
-def generate_key():
-    """ User otp key generator """
-    key = pyotp.random_base32()
-    if is_unique(key):
-        return key
-    generate_key()
+    keys = set()
+    while len(keys) < count:
+        candidates = {generate_key() for _ in range(count - len(keys))} - keys
+        keys |= candidates - set(UserModel._default_manager.filter(key__in=candidates).values_list('key', flat=True))
+    return list(keys)
 
 
 class DisableSignals(object):
@@ -114,8 +207,5 @@ class DisableSignals(object):
 
 
 def authenticate_api_user(client, user, ):
-    from rest_framework_simplejwt.tokens import RefreshToken
-
-    refresh = RefreshToken.for_user(user)
-    client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(refresh.access_token))
+    client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(get_user_tokens(user)['access_token']))
     return client
@@ -23,6 +23,10 @@ def create_site_profile_created_site_signal(sender, instance, created, **kwargs)
 
 def create_key_pre_save_signal(sender, instance, **kwargs):
     """This creates the key for users that don't have keys"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'key' not in update_fields:
+        return
+
     if not instance.key:
         from ..common.utils import generate_key
         instance.key = generate_key()